@@ -0,0 +1,368 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Client throughput, latency percentiles and memory of representative API workloads against the fake cloud
+(fjcloud_py.fakeserver), in sync, threaded and async modes and at several response sizes.
+
+    python benchmarks/api_workloads.py --output results.json
+    python benchmarks/api_workloads.py --workloads inventory,show_backups --modes sync,async --sizes 0,16384
+    python benchmarks/api_workloads.py --compare results.json     # ratios against an earlier run
+
+Workloads:
+    inventory        full list_servers_detailed inventory (iter_servers_detailed over every page)
+    show_backups     show_backup_detail of existing backups
+    create_backups   create_backup storm
+    vpn_policy_crud  create/show/update/delete of an IKE policy and an IPsec policy
+
+Every case runs in its own process so that peak RSS and allocations belong to that case only; the fake
+cloud runs in the parent. The JSON written to --output (or stdout) holds one record per case.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from fjcloud_py.aio import (AsyncAuthManager, AsyncBlockstorageAPI, AsyncComputeAPI, AsyncTransport,
+                            AsyncVpnServiceAPI)
+from fjcloud_py.auth import AuthManager
+from fjcloud_py.blockstorage import BlockstorageAPI
+from fjcloud_py.compute import ComputeAPI
+from fjcloud_py.fakeserver import FAKE_PROJECT_ID, FAKE_REGION, FakeCloud, endpoints_of
+from fjcloud_py.schemas import CreateBackupRequest, Credential
+from fjcloud_py.token_cache import TokenCache
+from fjcloud_py.transport import Transport
+from fjcloud_py.version_cache import ApiVersionCache
+from fjcloud_py.vpnservice import VpnServiceAPI
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+
+WORKLOADS = ("inventory", "show_backups", "create_backups", "vpn_policy_crud")
+MODES = ("sync", "threaded", "async")
+
+# inventory は 1 回で全ページを読むので回数を少なくする
+DEFAULT_CALLS = {"inventory": 20, "show_backups": 1000, "create_backups": 500, "vpn_policy_crud": 200}
+
+
+def check(response: dict) -> dict:
+    if response['status'] != 'success':
+        raise RuntimeError(response['message'])
+    return response
+
+
+def percentile(values: list, q: float) -> float:
+    """
+    Nearest-rank percentile of sorted values.
+    """
+    if not values:
+        return None
+    return values[min(len(values) - 1, max(0, math.ceil(q / 100 * len(values)) - 1))]
+
+
+def peak_rss_bytes() -> int:
+    # Linux の ru_maxrss は exec 前の親プロセスの値を引き継ぐので /proc の VmHWM を優先する
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux は KiB、macOS は bytes
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+"""Workloads (one operation each)
+"""
+def sync_operation(workload: str, apis: dict, context: dict):
+    compute, blockstorage, vpnservice = apis["compute"], apis["blockstorage"], apis["vpnservice"]
+    backup_ids, volume_id, page_size = context["backup_ids"], context["volume_id"], context["page_size"]
+
+    def inventory(index):
+        return sum(1 for _ in compute.iter_servers_detailed(limit=page_size))
+
+    def show_backups(index):
+        check(blockstorage.show_backup_detail(backup_ids[index % len(backup_ids)]))
+
+    def create_backups(index):
+        check(blockstorage.create_backup(CreateBackupRequest(volume_id=volume_id, name="bench-{}".format(index))))
+
+    def vpn_policy_crud(index):
+        ike = check(vpnservice.create_ike_policy())['data']['ikepolicy']['id']
+        check(vpnservice.show_ike_policy_details(ike))
+        check(vpnservice.update_ike_policy(ike, {"ikepolicy": {"name": "bench-{}".format(index)}}))
+        check(vpnservice.delete_ike_policy(ike))
+        ipsec = check(vpnservice.create_ipsec_policy())['data']['ipsecpolicy']['id']
+        check(vpnservice.show_ipsec_policy_details(ipsec))
+        check(vpnservice.update_ipsec_policy(ipsec, {"ipsecpolicy": {"name": "bench-{}".format(index)}}))
+        check(vpnservice.delete_ipsec_policy(ipsec))
+
+    return locals()[workload]
+
+
+def async_operation(workload: str, apis: dict, context: dict):
+    compute, blockstorage, vpnservice = apis["compute"], apis["blockstorage"], apis["vpnservice"]
+    backup_ids, volume_id, page_size = context["backup_ids"], context["volume_id"], context["page_size"]
+
+    async def inventory(index):
+        count = 0
+        async for _ in compute.iter_servers_detailed(limit=page_size):
+            count += 1
+        return count
+
+    async def show_backups(index):
+        check(await blockstorage.show_backup_detail(backup_ids[index % len(backup_ids)]))
+
+    async def create_backups(index):
+        check(await blockstorage.create_backup(CreateBackupRequest(volume_id=volume_id, name="bench-{}".format(index))))
+
+    async def vpn_policy_crud(index):
+        ike = check(await vpnservice.create_ike_policy())['data']['ikepolicy']['id']
+        check(await vpnservice.show_ike_policy_details(ike))
+        check(await vpnservice.update_ike_policy(ike, {"ikepolicy": {"name": "bench-{}".format(index)}}))
+        check(await vpnservice.delete_ike_policy(ike))
+        ipsec = check(await vpnservice.create_ipsec_policy())['data']['ipsecpolicy']['id']
+        check(await vpnservice.show_ipsec_policy_details(ipsec))
+        check(await vpnservice.update_ipsec_policy(ipsec, {"ipsecpolicy": {"name": "bench-{}".format(index)}}))
+        check(await vpnservice.delete_ipsec_policy(ipsec))
+
+    return locals()[workload]
+
+
+def requests_per_operation(workload: str, context: dict) -> int:
+    if workload == "inventory":
+        return max(1, math.ceil(context["servers"] / context["page_size"]))
+    return 8 if workload == "vpn_policy_crud" else 1
+
+
+"""Runners
+"""
+def timed(operation, index: int, latencies: list):
+    started = time.perf_counter()
+    operation(index)
+    latencies.append(time.perf_counter() - started)
+
+
+def run_sync(operation, calls: int, concurrency: int, latencies: list):
+    for index in range(calls):
+        timed(operation, index, latencies)
+
+
+def run_threaded(operation, calls: int, concurrency: int, latencies: list):
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for future in [executor.submit(timed, operation, index, latencies) for index in range(calls)]:
+            future.result()
+
+
+async def run_async(operation, calls: int, concurrency: int, latencies: list):
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(index):
+        async with semaphore:
+            started = time.perf_counter()
+            await operation(index)
+            latencies.append(time.perf_counter() - started)
+
+    await asyncio.gather(*[one(index) for index in range(calls)])
+
+
+def measure(run, calls: int, concurrency: int, allocation_calls: int) -> dict:
+    """
+    Args:
+        run: run(calls, concurrency, latencies) executing `calls` operations
+    Returns:
+        dict: timing of a full pass, then the tracemalloc peak of a shorter pass
+    """
+    run(min(calls, 5), concurrency, [])  # 接続とトークンのウォームアップ
+    latencies: list = []
+    cpu_started, started = time.process_time(), time.perf_counter()
+    run(calls, concurrency, latencies)
+    elapsed, cpu = time.perf_counter() - started, time.process_time() - cpu_started
+    tracemalloc.start()
+    run(allocation_calls, concurrency, [])
+    _, allocation_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    latencies.sort()
+    return {
+        "elapsed_s": elapsed,
+        "cpu_s": cpu,
+        "latency_ms": {
+            "p50": percentile(latencies, 50) * 1000,
+            "p95": percentile(latencies, 95) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "mean": sum(latencies) / len(latencies) * 1000,
+            "max": latencies[-1] * 1000,
+        },
+        "allocation_peak_bytes": allocation_peak,
+    }
+
+
+def credential() -> Credential:
+    return Credential(region=FAKE_REGION, domain_name="fake", project_id=FAKE_PROJECT_ID, username="fake",
+                      password="fake")
+
+
+def run_case(spec: dict) -> dict:
+    """
+    Run one (workload, mode, size) case against the fake cloud at spec["url"].
+    """
+    workload, mode, calls, concurrency = spec["workload"], spec["mode"], spec["calls"], spec["concurrency"]
+    endpoints = endpoints_of(spec["url"])
+    context = {"page_size": spec["page_size"], "servers": spec["servers"]}
+    allocation_calls = max(1, min(calls, spec["allocation_calls"]))
+
+    if mode == "async":
+        async def main():
+            transport = AsyncTransport(limit=max(concurrency, 10))
+            client = await AsyncAuthManager.create(credential(), transport=transport, token_cache=TokenCache(),
+                                                   endpoint_overrides=endpoints)
+            apis = {
+                "compute": await AsyncComputeAPI.create(client, version_cache=ApiVersionCache()),
+                "blockstorage": await AsyncBlockstorageAPI.create(client, version_cache=ApiVersionCache()),
+                "vpnservice": await AsyncVpnServiceAPI.create(client),
+            }
+            context["backup_ids"] = [backup["id"] async for backup in apis["blockstorage"].iter_backups_detail()]
+            context["volume_id"] = check(await apis["blockstorage"].list_volumes_detail())['data']['volumes'][0]['id']
+            operation = async_operation(workload, apis, context)
+            loop = asyncio.get_running_loop()
+
+            def run(count, workers, latencies):
+                # measure() は同期関数なので別スレッドからこのループにコルーチンを投げる
+                return asyncio.run_coroutine_threadsafe(run_async(operation, count, workers, latencies), loop).result()
+
+            try:
+                return await loop.run_in_executor(None, measure, run, calls, concurrency, allocation_calls)
+            finally:
+                await transport.close()
+
+        result = asyncio.run(main())
+    else:
+        with Transport(pool_maxsize=max(concurrency, 10)) as transport:
+            client = AuthManager(credential(), transport=transport, token_cache=TokenCache(),
+                                 endpoint_overrides=endpoints)
+            apis = {
+                "compute": ComputeAPI(client, version_cache=ApiVersionCache()),
+                "blockstorage": BlockstorageAPI(client, version_cache=ApiVersionCache()),
+                "vpnservice": VpnServiceAPI(client),
+            }
+            context["backup_ids"] = [backup["id"] for backup in apis["blockstorage"].iter_backups_detail()]
+            context["volume_id"] = check(apis["blockstorage"].list_volumes_detail())['data']['volumes'][0]['id']
+            operation = sync_operation(workload, apis, context)
+            runner = run_sync if mode == "sync" else run_threaded
+            result = measure(lambda count, workers, latencies: runner(operation, count, workers, latencies),
+                             calls, 1 if mode == "sync" else concurrency, allocation_calls)
+
+    requests = calls * requests_per_operation(workload, context)
+    result.update({
+        "workload": workload,
+        "mode": mode,
+        "size": spec["size"],
+        "calls": calls,
+        "concurrency": 1 if mode == "sync" else concurrency,
+        "requests": requests,
+        "operations_per_s": calls / result["elapsed_s"],
+        "requests_per_s": requests / result["elapsed_s"],
+        "cpu_per_request_ms": result["cpu_s"] / requests * 1000,
+        "peak_rss_bytes": peak_rss_bytes(),
+    })
+    return result
+
+
+def run_isolated(spec: dict) -> dict:
+    completed = subprocess.run([sys.executable, os.path.abspath(__file__), "--case", json.dumps(spec)],
+                               stdout=subprocess.PIPE, check=True, text=True)
+    return json.loads(completed.stdout)
+
+
+def compare(results: list, baseline_path: str):
+    with open(baseline_path) as file:
+        baseline = {(item["workload"], item["mode"], item["size"]): item for item in json.load(file)["results"]}
+    print("{:<16} {:<9} {:>7} {:>10} {:>10}".format("workload", "mode", "size", "req/s", "p99"), file=sys.stderr)
+    for item in results:
+        before = baseline.get((item["workload"], item["mode"], item["size"]))
+        if before is None:
+            continue
+        print("{:<16} {:<9} {:>7} {:>9.2f}x {:>9.2f}x".format(
+            item["workload"], item["mode"], item["size"], item["requests_per_s"] / before["requests_per_s"],
+            item["latency_ms"]["p99"] / before["latency_ms"]["p99"]), file=sys.stderr)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workloads", default=",".join(WORKLOADS))
+    parser.add_argument("--modes", default=",".join(MODES))
+    parser.add_argument("--sizes", default="0,4096,32768", help="bytes of padding per listed/shown resource")
+    parser.add_argument("--calls", type=int, default=None, help="operations per case (default: per workload)")
+    parser.add_argument("--concurrency", type=int, default=16, help="workers/tasks in threaded and async modes")
+    parser.add_argument("--servers", type=int, default=2000, help="servers in the inventory")
+    parser.add_argument("--backups", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added by the fake cloud per response")
+    parser.add_argument("--allocation-calls", type=int, default=50, help="operations traced by tracemalloc")
+    parser.add_argument("--in-process", action="store_true", help="do not isolate cases (RSS is then shared)")
+    parser.add_argument("--output", help="JSON file (default: stdout)")
+    parser.add_argument("--compare", help="JSON file of an earlier run")
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(json.loads(args.case))))
+        return
+
+    results = []
+    with FakeCloud(latency=args.latency, page_size=args.page_size) as cloud:
+        for size in [int(size) for size in args.sizes.split(",")]:
+            cloud.reset()
+            padding = "x" * size
+            cloud.seed("servers", args.servers, description=padding)
+            volume = cloud.seed("volumes", 1)[0]
+            cloud.seed("backups", args.backups, volume_id=volume["id"], description=padding)
+            for workload in args.workloads.split(","):
+                for mode in args.modes.split(","):
+                    spec = {"url": cloud.url, "workload": workload, "mode": mode, "size": size,
+                            "calls": args.calls or DEFAULT_CALLS[workload], "concurrency": args.concurrency,
+                            "servers": args.servers, "page_size": args.page_size,
+                            "allocation_calls": args.allocation_calls}
+                    result = run_case(spec) if args.in_process else run_isolated(spec)
+                    results.append(result)
+                    print("{:<16} {:<9} {:>7}B {:>9.1f} req/s  p50 {:>8.2f} ms  p95 {:>8.2f} ms  p99 {:>8.2f} ms"
+                          "  rss {:>7.1f} MiB".format(
+                              workload, mode, size, result["requests_per_s"], result["latency_ms"]["p50"],
+                              result["latency_ms"]["p95"], result["latency_ms"]["p99"],
+                              (result["peak_rss_bytes"] or 0) / 2 ** 20), file=sys.stderr)
+
+    document = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("case", "output", "compare")},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(document, file, indent=2)
+    else:
+        print(json.dumps(document, indent=2))
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Calls/sec of Utilities.get against a local stub server, comparing one-shot
+requests.get (new connection per call) with the pooled Transport.
+
+    python benchmarks/transport_pool.py --calls 2000
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import requests
+from fjcloud_py.transport import Transport
+from fjcloud_py.utils import Utilities
+
+
+BODY = json.dumps({"servers": [{"id": "0" * 32, "name": "stub"}]}).encode()
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # keep-alive にはHTTP/1.1が必要
+    protocol_version = "HTTP/1.1"
+    # ヘッダーとボディが別々に書き込まれるのでNagleによる遅延を避ける
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(BODY)))
+        self.end_headers()
+        self.wfile.write(BODY)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def run(label: str, func, calls: int) -> float:
+    start = time.perf_counter()
+    for _ in range(calls):
+        response = func()
+        assert response['status'] == 'success', response
+    elapsed = time.perf_counter() - start
+    rate = calls / elapsed
+    print("{:<28} {:>8d} calls  {:>8.2f} s  {:>10.1f} calls/s".format(label, calls, elapsed, rate))
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=1000)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = "http://127.0.0.1:{}/v2.1/project/servers".format(server.server_address[1])
+    headers = {"Accept": "application/json", "X-Auth-Token": "stub"}
+
+    def unpooled():
+        response = requests.get(url, headers=headers, timeout=10)
+        response.raise_for_status()
+        return {'status': 'success', 'data': response.json(), 'message': None}
+
+    with Transport(pool_maxsize=4) as transport:
+        before = run("requests.get (per call)", unpooled, args.calls)
+        after = run("Utilities.get (Transport)", lambda: Utilities.get(url, headers=headers, transport=transport), args.calls)
+    print("speedup: {:.2f}x".format(after / before))
+
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -11,6 +11,11 @@ setup(
     install_requires=[
         'requests>=2.0.0',
     ],
+    extras_require={
+        'async': ['aiohttp>=3.9'],
+        'fast': ['orjson>=3.9'],
+        'otel': ['opentelemetry-api>=1.20'],
+    },
     classifiers=[
         'Programming Language :: Python :: 3.11',
         'License :: OSI Approved :: MIT License',
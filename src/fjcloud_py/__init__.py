@@ -1,9 +1,26 @@
+from .circuitbreaker import *
+from .cache import *
+from .inventory import *
+from .jsonstream import *
+from .metrics import *
+from .tracing import *
+from .ratelimit import *
+from .result import *
+from .schemas import *
+from .retry import *
+from .singleflight import *
+from .waiters import *
+from .transport import *
+from .journal import *
 from .utils import *
+from .token_cache import *
+from .version_cache import *
 from .auth import *
 from .networking import *
 from .compute import *
 from .blockstorage import *
 from .vpnservice import *
+from .aio import *
 
 def hello() -> str:
     return "Hello from fjcloud-py!"
@@ -0,0 +1,746 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+asyncio variants of AuthManager and the API classes.
+
+Requires aiohttp (pip install "fjcloud-py[async]").
+
+    transport = AsyncTransport(limit=200)
+    client = await AsyncAuthManager.create(credential, transport=transport)
+    compute = await AsyncComputeAPI.create(client)
+    response = await compute.list_servers()
+    await transport.close()
+"""
+
+from .auth import DEFAULT_AUTH_TIMEOUT, AuthenticationError, AuthManager
+from .cache import ResponseCache, hit as cache_hit
+from .circuitbreaker import CircuitBreaker
+from .blockstorage import BlockstorageAPI
+from .compute import ComputeAPI
+from .networking import NetworkingAPI
+from .schemas import Credential
+from .token_cache import TokenCache
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy, remaining
+from .singleflight import AsyncSingleFlight, flight_key
+from .journal import Journal, JournalMiss, JournalWriter, entry_body, replay_delay
+from .result import Result, decode_body
+from .utils import APIError, DiscoveryError, _bulk_failure, _circuit_open_envelope, _error_envelope, _first_page, _instrument, _record, _next_page, get_current_api_version
+from typing import AsyncIterator, Awaitable, Callable, Dict, Iterable, List, Tuple, Union
+from .version_cache import ApiVersionCache, default_version_cache
+from .vpnservice import VpnServiceAPI
+from .waiters import WaitPolicy, WaitState, _is_not_found
+from requests.structures import CaseInsensitiveDict
+import asyncio
+import time
+
+try:
+    import aiohttp
+except ImportError:  # aiohttp は async を使う場合のみ必要
+    aiohttp = None
+
+
+class AsyncTransport:
+    """
+    aiohttp connection pool shared by AsyncAuthManager and the Async*API classes.
+
+    Args:
+        limit: [optional] Max connections in the pool (all hosts)
+        limit_per_host: [optional] Max connections per host (0: unlimited)
+        keepalive_timeout: [optional] Seconds an idle connection is kept alive
+        retry: [optional] RetryPolicy applied by AsyncUtilities (default: RetryPolicy(), 120 s deadline)
+        rate_limiter: [optional] RateLimiter applied before every attempt (may be shared with a Transport)
+        circuit_breaker: [optional] CircuitBreaker (may be shared with a Transport)
+        single_flight: [optional] Share one request among identical concurrent GETs
+        cache: [optional] ResponseCache (may be shared with a Transport)
+        hooks: [optional] Callables receiving a RequestEvent after every request (e.g. a MetricsCollector)
+        tracer: [optional] Tracer or OpenTelemetryTracer opening a span per request
+        journal: [optional] JournalWriter recording every request and response (see AsyncReplayTransport)
+    """
+    def __init__(self, limit: int = 100, limit_per_host: int = 0, keepalive_timeout: float = 30,
+                 retry: RetryPolicy = None, rate_limiter: RateLimiter = None, circuit_breaker: CircuitBreaker = None,
+                 single_flight: bool = False, cache: ResponseCache = None, hooks: Iterable[Callable] = None,
+                 tracer=None, journal: JournalWriter = None):
+        if aiohttp is None:
+            raise ImportError('aiohttp is required for the async API: pip install "fjcloud-py[async]"')
+        self.limit: int = limit
+        self.limit_per_host: int = limit_per_host
+        self.keepalive_timeout: float = keepalive_timeout
+        self.retry: RetryPolicy = retry if retry is not None else RetryPolicy()
+        self.rate_limiter: RateLimiter = rate_limiter
+        self.circuit_breaker: CircuitBreaker = circuit_breaker
+        self.single_flight: AsyncSingleFlight = AsyncSingleFlight() if single_flight else None
+        self.cache: ResponseCache = cache
+        self.hooks: List[Callable] = list(hooks or [])
+        self.tracer = tracer
+        self.journal: JournalWriter = journal
+        self._session = None
+
+
+    @property
+    def session(self):
+        # ClientSession はイベントループ上で作る必要があるので初回リクエスト時に生成する
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.limit,
+                limit_per_host=self.limit_per_host,
+                keepalive_timeout=self.keepalive_timeout
+            )
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+
+
+    def request(self, method: str, url: str, **kwargs):
+        if self.journal is None:
+            return self.session.request(method, url, **kwargs)
+        return _RecordingResponse(self.session.request(method, url, **kwargs), self.journal, method, url, kwargs)
+
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+    async def __aenter__(self):
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.close()
+
+
+class _RecordingResponse:
+    """
+    Wraps the context manager of an aiohttp request; the exchange is written to the journal when the body is read,
+    or as an error entry when the request or the read raises.
+    """
+    def __init__(self, context, journal: JournalWriter, method: str, url: str, kwargs: dict):
+        self._context = context
+        self._journal: JournalWriter = journal
+        self._method: str = method
+        self._url: str = url
+        self._kwargs: dict = kwargs
+        self._started: float = journal.now()
+        self._response = None
+
+
+    def _record_error(self, err: BaseException):
+        self._journal.record(self._method, self._url, self._kwargs.get("params"), self._kwargs.get("headers"),
+                             self._kwargs.get("json"), started=self._started,
+                             elapsed=self._journal.now() - self._started, error=err)
+
+
+    async def __aenter__(self):
+        try:
+            self._response = await self._context.__aenter__()
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            self._record_error(err)
+            raise
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        return await self._context.__aexit__(exc_type, exc_value, traceback)
+
+
+    @property
+    def status(self) -> int:
+        return self._response.status
+
+
+    @property
+    def headers(self):
+        return self._response.headers
+
+
+    async def read(self) -> bytes:
+        try:
+            content = await self._response.read()
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            self._record_error(err)
+            raise
+        self._journal.record(self._method, self._url, self._kwargs.get("params"), self._kwargs.get("headers"),
+                             self._kwargs.get("json"), self._response.status, self._response.headers, content,
+                             self._started, self._journal.now() - self._started)
+        return content
+
+
+class AsyncReplayTransport(AsyncTransport):
+    """
+    AsyncTransport answering from a journal without any network I/O (see ReplayTransport).
+
+    Args:
+        journal: [require] Journal, journal file path or entries
+        timing: [optional] original (sleep for the recorded response time) | fast (answer immediately)
+        time_scale: [optional] Factor applied to the recorded response times with timing="original"
+        others: same as AsyncTransport
+    """
+    def __init__(self, journal, timing: str = "original", time_scale: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        if timing not in ("original", "fast"):
+            raise ValueError("timing must be 'original' or 'fast'")
+        self.replay: Journal = journal if isinstance(journal, Journal) else Journal(journal)
+        self.timing: str = timing
+        self.time_scale: float = time_scale
+
+
+    def request(self, method: str, url: str, **kwargs):
+        return _ReplayedResponse(self, method, url, kwargs.get("params"))
+
+
+class _ReplayedResponse:
+    def __init__(self, transport: AsyncReplayTransport, method: str, url: str, params):
+        self._transport: AsyncReplayTransport = transport
+        self._method: str = method
+        self._url: str = url
+        self._params = params
+        self.status: int = None
+        self.headers = None
+        self._content: bytes = b""
+
+
+    async def __aenter__(self):
+        try:
+            entry = self._transport.replay.next(self._method, self._url, self._params)
+        except JournalMiss as miss:
+            # AsyncUtilities がエラーの envelope にできるよう aiohttp の例外にする
+            raise aiohttp.ClientError(str(miss)) from miss
+        delay = replay_delay(entry, self._transport.timing, self._transport.time_scale)
+        if delay:
+            await asyncio.sleep(delay)
+        error = entry.get("error")
+        if error is not None:
+            # 記録時と同じ種類の例外(タイムアウト/接続エラー)を投げる
+            if error.get("kind") == "timeout":
+                raise asyncio.TimeoutError(error.get("message"))
+            if error.get("kind") == "connection":
+                raise aiohttp.ClientConnectionError(error.get("message"))
+            raise aiohttp.ClientError(error.get("message"))
+        self.status = entry["status"]
+        self.headers = CaseInsensitiveDict(entry.get("headers") or {})
+        self._content = entry_body(entry)
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+    async def read(self) -> bytes:
+        return self._content
+
+
+async def _read_json(response):
+    return decode_body(await response.read())
+
+
+async def _acquire(rate_limiter: RateLimiter, method: str, url: str, timeout: float = None) -> bool:
+    # RateLimiter.acquire と同じだが、待ち時間はイベントループを止めずに sleep する
+    wait = rate_limiter.reserve(method, url)
+    if timeout is not None and wait > timeout:
+        rate_limiter.refund(method, url)
+        return False
+    if wait > 0:
+        await asyncio.sleep(wait)
+    return True
+
+
+async def _wait_for_retry(policy: RetryPolicy, method: str, retries: int, deadline: float, headers=None) -> bool:
+    if not policy.allows(method, retries):
+        return False
+    delay = policy.delay(retries, headers)
+    left = remaining(deadline)
+    if left is not None and delay >= left:
+        return False
+    await asyncio.sleep(delay)
+    return True
+
+
+class AsyncUtilities:
+    """
+    Same signatures and envelope as Utilities, as coroutines.
+    """
+    @staticmethod
+    async def _send(transport: AsyncTransport, method: str, url: str, headers: dict = None,
+                    auth: 'AsyncAuthManager' = None, **kwargs):
+        """
+        Returns:
+            tuple: (status, headers, body bytes); on 401 re-authenticates once through `auth` and replays.
+        """
+        for attempt in range(2):
+            async with transport.request(method, url, headers=headers, **kwargs) as response:
+                if response.status == 401 and attempt == 0 and auth is not None and headers and "X-Auth-Token" in headers:
+                    headers = dict(headers, **{"X-Auth-Token": await auth.reauthenticate(headers["X-Auth-Token"])})
+                    continue
+                return response.status, response.headers, await response.read()
+
+
+    @staticmethod
+    async def request(method: str, url: str, headers: dict = None, params: dict = None, json_data: dict = None,
+                      timeout: int = 10, transport: AsyncTransport = None, auth: 'AsyncAuthManager' = None,
+                      read_body: bool = True) -> dict:
+        """
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None], 'retries': int}
+        """
+        if transport is None:
+            raise ValueError("transport must be provided")
+        response = await AsyncUtilities._request(method, url, headers=headers, params=params, json_data=json_data,
+                                                 timeout=timeout, transport=transport, auth=auth, read_body=read_body)
+        if transport.cache is not None and method.upper() != "GET" and response['status'] == 'success':
+            transport.cache.invalidate(method, url)
+        return response
+
+
+    @staticmethod
+    async def _request(method: str, url: str, headers: dict = None, params: dict = None, json_data: dict = None,
+                       timeout: int = 10, transport: AsyncTransport = None, auth: 'AsyncAuthManager' = None,
+                       read_body: bool = True, cache_state: str = None):
+        """
+        Returns:
+            Result
+        """
+        started = time.monotonic()
+        if transport.tracer is None:
+            response = await AsyncUtilities._retry_loop(method, url, headers, params, json_data, timeout, transport,
+                                                        auth, read_body)
+        else:
+            span, headers = transport.tracer.start_request(method, url, headers)
+            try:
+                response = await AsyncUtilities._retry_loop(method, url, headers, params, json_data, timeout,
+                                                            transport, auth, read_body)
+            except BaseException as err:
+                transport.tracer.end_request(span, error=err)
+                raise
+            transport.tracer.end_request(span, response)
+        response.elapsed = time.monotonic() - started
+        if transport.hooks:
+            _instrument(transport, method, url, json_data, response, cache_state)
+        return response
+
+
+    @staticmethod
+    async def _retry_loop(method: str, url: str, headers: dict, params: dict, json_data: dict, timeout: int,
+                          transport: AsyncTransport, auth: 'AsyncAuthManager', read_body: bool) -> Result:
+        if params:
+            # aiohttp は list 値を受け付けないので繰り返しパラメータに展開する
+            params = [(key, str(v)) for key, value in params.items()
+                      for v in (value if isinstance(value, list) else [value])]
+        if auth is not None and headers and "X-Auth-Token" in headers and auth._needs_refresh():
+            headers = dict(headers, **{"X-Auth-Token": await auth.refresh()})
+        policy: RetryPolicy = transport.retry
+        breaker: CircuitBreaker = transport.circuit_breaker
+        deadline = policy.start()
+        retries = 0
+        while True:
+            if breaker is not None and not breaker.allow(url):
+                return _circuit_open_envelope(breaker, url, retries)
+            if transport.rate_limiter is not None and \
+                    not await _acquire(transport.rate_limiter, method, url, remaining(deadline)):
+                _record(breaker, url, None)
+                return _error_envelope('Rate limit wait exceeds the deadline', retries)
+            left = remaining(deadline)
+            attempt_timeout = timeout if left is None else max(min(timeout, left), 0.001)
+            started = time.monotonic()
+            try:
+                status, response_headers, content = await AsyncUtilities._send(
+                    transport, method, url, headers=headers, params=params, json=json_data,
+                    timeout=aiohttp.ClientTimeout(total=attempt_timeout), auth=auth
+                )
+            except asyncio.TimeoutError as timeout_err:
+                _record(breaker, url, False)
+                if policy.retry_on_timeout and await _wait_for_retry(policy, method, retries, deadline):
+                    retries += 1
+                    continue
+                message = 'Timeout: {}'.format(timeout_err) if str(timeout_err) else 'Timeout'
+                return _error_envelope(message, retries)
+            except aiohttp.ClientConnectionError as conn_err:
+                _record(breaker, url, False)
+                if policy.retry_on_connection_error and await _wait_for_retry(policy, method, retries, deadline):
+                    retries += 1
+                    continue
+                return _error_envelope(str(conn_err), retries)
+            except aiohttp.ClientError as req_err:
+                _record(breaker, url, None)
+                return _error_envelope(str(req_err), retries)
+            except BaseException:
+                # キャンセル等でもハーフオープンの試行枠を返す
+                _record(breaker, url, None)
+                raise
+
+            _record(breaker, url, status < 500, time.monotonic() - started)
+            if status in policy.retry_statuses and \
+                    await _wait_for_retry(policy, method, retries, deadline, response_headers):
+                retries += 1
+                continue
+            if status >= 400:
+                return Result('error', content=content, status_code=status, headers=response_headers, retries=retries)
+            return Result('success', content=content, status_code=status, headers=response_headers, retries=retries,
+                          read_body=read_body)
+
+
+    @staticmethod
+    async def get(url: str, headers: dict = None, params: dict = None, timeout: int = 120,
+                  transport: AsyncTransport = None, auth: 'AsyncAuthManager' = None) -> dict:
+        cache = transport.cache if transport is not None else None
+        key, entry = cache.lookup(url, params, headers, auth) if cache is not None else (None, None)
+        if entry is not None and entry.fresh:
+            response = cache_hit(entry)
+            if transport.hooks:
+                _instrument(transport, "GET", url, None, response, "hit")
+            return response
+
+        async def send():
+            if key is None:
+                return await AsyncUtilities.request("GET", url, headers=headers, params=params, timeout=timeout,
+                                                    transport=transport, auth=auth)
+            response = await AsyncUtilities._request(
+                "GET", url, headers=dict(headers or {}, **cache.conditional_headers(entry)), params=params,
+                timeout=timeout, transport=transport, auth=auth, cache_state="miss"
+            )
+            return cache.store(key, entry, url, response)
+
+        if transport is not None and transport.single_flight is not None:
+            return await transport.single_flight.do(flight_key(url, params, headers), send)
+        return await send()
+
+
+    @staticmethod
+    async def post(url: str, headers: dict = None, params: dict = None, json_data: dict = None, timeout: int = 10,
+                   transport: AsyncTransport = None, auth: 'AsyncAuthManager' = None) -> dict:
+        return await AsyncUtilities.request("POST", url, headers=headers, params=params, json_data=json_data,
+                                            timeout=timeout, transport=transport, auth=auth)
+
+
+    @staticmethod
+    async def put(url: str, headers: dict = None, params: dict = None, json_data: dict = None, timeout: int = 10,
+                  transport: AsyncTransport = None, auth: 'AsyncAuthManager' = None) -> dict:
+        return await AsyncUtilities.request("PUT", url, headers=headers, params=params, json_data=json_data,
+                                            timeout=timeout, transport=transport, auth=auth)
+
+
+    @staticmethod
+    async def delete(url: str, headers: dict = None, params: dict = None, timeout: int = 10,
+                     transport: AsyncTransport = None, auth: 'AsyncAuthManager' = None) -> dict:
+        return await AsyncUtilities.request("DELETE", url, headers=headers, params=params, timeout=timeout,
+                                            transport=transport, auth=auth, read_body=False)
+
+
+    @staticmethod
+    async def paginate(url: str, resource_key: str, headers: dict = None, params: dict = None, limit: int = None,
+                       prefetch: bool = False, timeout: int = 120, transport: AsyncTransport = None,
+                       auth: 'AsyncAuthManager' = None, stream: bool = False) -> AsyncIterator[dict]:
+        """
+        Async generator counterpart of Utilities.paginate (`async for server in compute.iter_servers_detailed()`).
+
+        `stream` is accepted for signature compatibility; aiohttp pages are decoded whole.
+        """
+        async def fetch(page_url, page_params):
+            page_headers = headers
+            if auth is not None and headers and "X-Auth-Token" in headers:
+                page_headers = dict(headers, **{"X-Auth-Token": auth.token})
+            return await AsyncUtilities.get(page_url, headers=page_headers, params=page_params, timeout=timeout,
+                                            transport=transport, auth=auth)
+
+        page = _first_page(url, params, limit)
+        response = await fetch(*page)
+        pending = None
+        try:
+            while True:
+                if response['status'] != 'success':
+                    raise APIError(response)
+                items = response['data'].get(resource_key, [])
+                page = _next_page(response['data'], resource_key, len(items), items[-1] if items else None, page, limit)
+                pending = asyncio.ensure_future(fetch(*page)) if page and prefetch else None
+                for item in items:
+                    yield item
+                if page is None:
+                    return
+                response = await pending if pending else await fetch(*page)
+        finally:
+            if pending is not None and not pending.done():
+                pending.cancel()
+
+
+    @staticmethod
+    async def fan_out(func: Callable[[str], Awaitable[dict]], ids: Iterable[str],
+                      max_workers: int = 8) -> AsyncIterator[Tuple[str, dict]]:
+        """
+        Async generator counterpart of Utilities.fan_out: at most `max_workers` coroutines in flight,
+        (id, envelope) yielded in completion order.
+        """
+        ids = list(dict.fromkeys(ids))
+        semaphore = asyncio.Semaphore(max_workers)
+
+        async def call(resource_id):
+            async with semaphore:
+                try:
+                    return resource_id, await func(resource_id)
+                except Exception as err:
+                    return resource_id, _error_envelope(str(err), 0)
+
+        tasks = [asyncio.ensure_future(call(resource_id)) for resource_id in ids]
+        try:
+            for task in asyncio.as_completed(tasks):
+                yield await task
+        finally:
+            for task in tasks:
+                task.cancel()
+
+
+    @staticmethod
+    async def gather(func: Callable[[str], Awaitable[dict]], ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        return {resource_id: response async for resource_id, response in
+                AsyncUtilities.fan_out(func, ids, max_workers=max_workers)}
+
+
+    @staticmethod
+    async def bulk_create(create: Callable[[List[dict]], Awaitable[dict]], delete: Callable[[str], Awaitable[dict]],
+                          items: Iterable[dict], list_key: str, chunk_size: int = 100, rollback: bool = True,
+                          max_workers: int = 8) -> dict:
+        """
+        Coroutine counterpart of Utilities.bulk_create.
+        """
+        items = list(items)
+        created: List[dict] = []
+        retries = 0
+        response = None
+        for start in range(0, len(items), chunk_size):
+            response = await create(items[start:start + chunk_size])
+            retries += response.get('retries', 0)
+            if response['status'] != 'success':
+                deleted = {}
+                if rollback and created:
+                    deleted = await AsyncUtilities.gather(delete, [resource["id"] for resource in created],
+                                                          max_workers=max_workers)
+                return _bulk_failure(list_key, items, start, chunk_size, created, response, deleted, retries)
+            created.extend(response['data'][list_key])
+        return Result('success', status_code=getattr(response, 'status_code', None), retries=retries,
+                      data={list_key: created})
+
+
+    @staticmethod
+    async def poll_many(iterate: Callable[[], AsyncIterator[dict]], show: Callable[[str], Awaitable[dict]],
+                        resource_ids: List[str], single_key: str, list_key: str, max_workers: int = 8) -> dict:
+        """
+        Coroutine counterpart of Utilities.poll_many.
+        """
+        wanted = set(resource_ids)
+        try:
+            found = [resource async for resource in iterate() if resource.get('id') in wanted]
+        except APIError as err:
+            return err.response
+        seen = {resource['id'] for resource in found}
+        missing = [resource_id for resource_id in resource_ids if resource_id not in seen]
+        async for resource_id, response in AsyncUtilities.fan_out(show, missing, max_workers=max_workers):
+            if response['status'] == 'success':
+                found.append(response['data'][single_key])
+            elif not _is_not_found(response):
+                return response
+        return Result('success', data={list_key: found})
+
+
+    @staticmethod
+    async def wait(fetch: Callable[[List[str]], Awaitable[dict]], resource_ids: Union[str, Iterable[str]],
+                   target: Iterable[str], failure: Iterable[str], single_key: str, list_key: str,
+                   status_key: str = "status", policy: WaitPolicy = None):
+        """
+        Coroutine counterpart of Utilities.wait.
+        """
+        policy = policy or WaitPolicy()
+        state = WaitState([resource_ids] if isinstance(resource_ids, str) else resource_ids, target, failure, status_key)
+        deadline = time.monotonic() + policy.timeout
+        delay = policy.delay
+        while state.pending:
+            pending = state.pending
+            progressed = state.poll(await fetch(pending), pending, single_key, list_key)
+            if not state.pending:
+                break
+            if time.monotonic() >= deadline:
+                raise state.timeout()
+            await asyncio.sleep(policy.sleep_time(delay, deadline))
+            delay = policy.next_delay(delay, progressed)
+        return state.result(resource_ids)
+
+
+class AsyncAuthManager(AuthManager):
+    """
+    AuthManager whose token is obtained with `await AsyncAuthManager.create(...)`.
+
+    The token cache is shared with the sync AuthManager; refresh it with `await client.refresh()`.
+    """
+    def __init__(self, credential: Credential, transport: AsyncTransport = None, token_cache: TokenCache = None,
+                 refresh_margin: int = 300, endpoint_overrides: dict = None,
+                 auth_timeout: float = DEFAULT_AUTH_TIMEOUT):
+        super().__init__(credential, transport=transport or AsyncTransport(), token_cache=token_cache,
+                         refresh_margin=refresh_margin, background_refresh=False,
+                         endpoint_overrides=endpoint_overrides, auth_timeout=auth_timeout)
+        self._refresh_lock = asyncio.Lock()
+
+
+    def _authenticate_on_init(self):
+        # トークンは create() で await して取得する
+        pass
+
+
+    @property
+    def token(self) -> str:
+        # 同期的な再認証はイベントループを止めるので、ここでは保持しているトークンを返すだけ
+        return self._token
+
+
+    @token.setter
+    def token(self, token: str):
+        self._token = token
+
+
+    @classmethod
+    async def create(cls, credential: Credential, transport: AsyncTransport = None, token_cache: TokenCache = None,
+                     refresh_margin: int = 300, endpoint_overrides: dict = None,
+                     auth_timeout: float = DEFAULT_AUTH_TIMEOUT):
+        client = cls(credential, transport=transport, token_cache=token_cache, refresh_margin=refresh_margin,
+                     endpoint_overrides=endpoint_overrides, auth_timeout=auth_timeout)
+        await client.refresh()
+        return client
+
+
+    async def refresh(self, force: bool = False, stale_token: str = None) -> str:
+        async with self._refresh_lock:
+            if stale_token is not None and self._token != stale_token:
+                return self._token
+            # 認証が終わるまでキャッシュのロックを保持し、ロック取得後にキャッシュを読み直す
+            async with self.token_cache.async_locked():
+                entry = None if force else self.token_cache.reload(self.cache_key)
+                if not self._is_fresh(entry) or entry["token"] == stale_token:
+                    token: str = await self.get_token()
+                    entry = {"token": token, "expires_at": self.expires_at, "endpoints": self.endpoints}
+                    self.token_cache.put(self.cache_key, entry)
+            self._token = entry["token"]
+            self.expires_at = entry["expires_at"]
+            self.endpoints = entry.get("endpoints") or {}
+            return self._token
+
+
+    async def reauthenticate(self, stale_token: str) -> str:
+        return await self.refresh(stale_token=stale_token)
+
+
+    async def get_token(self):
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        data = self._password_auth_body()
+
+        try:
+            async with self.transport.request("POST", self.identity_url, headers=headers, json=data,
+                                              timeout=aiohttp.ClientTimeout(total=self.auth_timeout)) as response:
+                status, token = response.status, response.headers.get("X-Subject-Token")
+                body = await _read_json(response)
+        except (asyncio.TimeoutError, aiohttp.ClientError) as err:
+            raise AuthenticationError("Authentication request failed: {}".format(str(err) or "Timeout")) from err
+
+        if status == 201:
+            self._read_token_response(body)
+            return token
+        else:
+            raise AuthenticationError("Authentication failed ({}): {}".format(status, body), status, body)
+
+
+    async def validate_token(self):
+        headers = {"X-Auth-Token": self.token}
+        return await AsyncUtilities.get(self.identity_url, headers=headers, transport=self.transport)
+
+
+class AsyncComputeAPI(ComputeAPI):
+    utilities = AsyncUtilities
+
+    def __init__(self, client: AsyncAuthManager, api_version: str = None, version_cache: ApiVersionCache = None):
+        self.client: AsyncAuthManager = client
+        self.region: str = client.region
+        self.project_id: str = client.project_id
+        self.transport: AsyncTransport = client.transport
+        self.base_url: str = client.endpoint_for(
+            "compute", "https://compute.{region}.cloud.global.fujitsu.com"
+        )
+
+        self.version_cache: ApiVersionCache = version_cache or default_version_cache()
+        self.current_api_version = api_version
+
+
+    @classmethod
+    async def create(cls, client: AsyncAuthManager, api_version: str = None, version_cache: ApiVersionCache = None):
+        api = cls(client, api_version, version_cache=version_cache)
+        if api.current_api_version is None:
+            api.current_api_version = api.version_cache.get("compute", api.region, api.base_url)
+        if api.current_api_version is None:
+            api.current_api_version = get_current_api_version(await api.list_api_versions())
+            api.version_cache.put("compute", api.region, api.current_api_version, api.base_url)
+        return api
+
+
+    async def list_api_versions(self):
+        uri: str = "/"
+        endpoint = self.base_url + uri
+        response = await self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
+
+        if response['status'] == 'success':
+            return response['data']
+        else:
+            raise DiscoveryError("compute", response)
+
+
+    async def get_decrypted_password(self, server_id, private_key):
+        password_data = await self.show_server_password(server_id)
+        return self._decrypt_password(password_data, private_key)
+
+
+class AsyncBlockstorageAPI(BlockstorageAPI):
+    utilities = AsyncUtilities
+
+    def __init__(self, client: AsyncAuthManager, api_version: str = None, version_cache: ApiVersionCache = None):
+        self.client: AsyncAuthManager = client
+        self.region: str = client.region
+        self.project_id: str = client.project_id
+        self.transport: AsyncTransport = client.transport
+        self.base_url: str = client.endpoint_for(
+            "blockstorage", "https://blockstorage.{region}.cloud.global.fujitsu.com"
+        )
+
+        self.version_cache: ApiVersionCache = version_cache or default_version_cache()
+        self.current_api_version = api_version
+
+
+    @classmethod
+    async def create(cls, client: AsyncAuthManager, api_version: str = None, version_cache: ApiVersionCache = None):
+        api = cls(client, api_version, version_cache=version_cache)
+        if api.current_api_version is None:
+            api.current_api_version = api.version_cache.get("blockstorage", api.region, api.base_url)
+        if api.current_api_version is None:
+            api.current_api_version = get_current_api_version(await api._get_current_api_version())
+            api.version_cache.put("blockstorage", api.region, api.current_api_version, api.base_url)
+        return api
+
+
+    async def _get_current_api_version(self):
+        uri: str = "/"
+        endpoint = self.base_url + uri
+        response = await self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
+        if response['status'] == 'success':
+            return response['data']
+        else:
+            raise DiscoveryError("blockstorage", response)
+
+
+class AsyncNetworkingAPI(NetworkingAPI):
+    utilities = AsyncUtilities
+
+    @classmethod
+    async def create(cls, client: AsyncAuthManager):
+        return cls(client)
+
+
+class AsyncVpnServiceAPI(VpnServiceAPI):
+    utilities = AsyncUtilities
+
+    @classmethod
+    async def create(cls, client: AsyncAuthManager):
+        return cls(client)
@@ -2,26 +2,239 @@
 # -*- coding: utf-8 -*-
 
 from .schemas import Credential
-import requests
-import sys
+from .token_cache import TokenCache, default_token_cache
+from .transport import Transport, default_transport
+from datetime import datetime
+from requests.exceptions import RequestException
+import logging
+import re
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+# expires_at が応答に含まれない場合に仮定するトークンの有効期間(秒)
+DEFAULT_TOKEN_LIFETIME: int = 3600
+# 認証リクエストのタイムアウト(秒)。認証中はトークンキャッシュのロックを保持する
+DEFAULT_AUTH_TIMEOUT: float = 30
+
+
+# サービス名 -> カタログ上で使われうる type の候補
+SERVICE_TYPES: dict = {
+    "identity": ("identity",),
+    "compute": ("compute",),
+    "blockstorage": ("volumev3", "block-storage", "blockstorage", "volumev2", "volume"),
+    "networking": ("network", "networking"),
+    "nfv": ("nfv", "network-nfv", "vpnservice"),
+}
+
+
+def parse_catalog(catalog: list, region: str, interface: str = "public") -> dict:
+    """
+    Args:
+        catalog: token.catalog of the identity response
+        region: region to pick endpoints for
+        interface: [optional] endpoint interface
+    Returns:
+        dict: {service type: base url}. Version/project suffixes (/v2.1/{project_id} etc.) are stripped
+            because the API classes append them to the base url themselves.
+    """
+    endpoints: dict = {}
+    for service in catalog or []:
+        for endpoint in service.get("endpoints", []):
+            if endpoint.get("interface") != interface:
+                continue
+            if region not in (endpoint.get("region"), endpoint.get("region_id")):
+                continue
+            url = re.sub(r"/v\d+(\.\d+)?(/.*)?$", "", endpoint["url"].rstrip("/"))
+            endpoints.setdefault(service.get("type"), url)
+    return endpoints
+
+
+def parse_expires_at(expires_at: str) -> float:
+    """
+    Args:
+        expires_at: token.expires_at of the identity response (e.g. 2024-09-10T12:00:00.000000Z)
+    Returns:
+        float: epoch seconds
+    """
+    return datetime.fromisoformat(expires_at.replace("Z", "+00:00")).timestamp()
+
+
+class AuthenticationError(Exception):
+    """
+    Raised when the identity service does not issue a token.
+
+    Attributes:
+        status_code (Optional[int]): HTTP status of the identity response
+        body: decoded body of the identity response
+    """
+    def __init__(self, message: str, status_code: int = None, body=None):
+        self.status_code = status_code
+        self.body = body
+        super().__init__(message)
 
 
 class AuthManager:
-    def __init__(self, credential: Credential):
+    def __init__(self, credential: Credential, transport: Transport = None, token_cache: TokenCache = None,
+                 refresh_margin: int = 300, background_refresh: bool = False, endpoint_overrides: dict = None,
+                 auth_timeout: float = DEFAULT_AUTH_TIMEOUT):
+        """
+        Args:
+            credential: [require] Credential
+            transport: [optional] Pooled transport shared with the API classes (default: process wide transport)
+            token_cache: [optional] Token cache (default: process wide in-memory cache).
+                Use TokenCache(path=...) to share tokens between processes
+            refresh_margin: [optional] Seconds before expires_at at which the token is refreshed
+            background_refresh: [optional] Refresh the token from a daemon timer thread before it expires
+            endpoint_overrides: [optional] {service: base url} taking precedence over the service catalog,
+                e.g. {"identity": "http://127.0.0.1:8080/identity", "compute": "http://127.0.0.1:8080/compute"}
+            auth_timeout: [optional] Timeout of the identity request in seconds
+        Raises:
+            AuthenticationError: no token was issued
+        """
+        self.transport: Transport = transport or default_transport()
         self.region: str = credential.region
         self.domain_name: str = credential.domain_name
         self.project_id: str = credential.project_id
         self.username: str = credential.username
         self.password: str = credential.password
-        self.identity_url: str = "https://identity.{region}.cloud.global.fujitsu.com/v3/auth/tokens".format(
-            region=self.region
-        )
-        self.token: str = self.get_token()
+        self.endpoint_overrides: dict = dict(endpoint_overrides or {})
+        self.endpoints: dict = {}
+        self.identity_url: str = self.endpoint_for(
+            "identity", "https://identity.{region}.cloud.global.fujitsu.com"
+        ) + "/v3/auth/tokens"
+        self.token_cache: TokenCache = token_cache or default_token_cache()
+        self.refresh_margin: int = refresh_margin
+        self.background_refresh: bool = background_refresh
+        self.auth_timeout: float = auth_timeout
+        self.expires_at: float = None
+        self._token: str = None
+        self._lock = threading.RLock()
+        self._timer: threading.Timer = None
+        self._authenticate_on_init()
 
 
-    def get_token(self):
-        headers = {"Content-Type": "application/json", "Accept": "application/json"}
-        data = {
+    def _authenticate_on_init(self):
+        self.refresh()
+
+
+    @property
+    def token(self) -> str:
+        if self._needs_refresh():
+            self.refresh()
+        return self._token
+
+
+    @token.setter
+    def token(self, token: str):
+        self._token = token
+
+
+    def endpoint_for(self, service: str, default: str) -> str:
+        """
+        Resolve the base url of a service: endpoint_overrides, then the service catalog of the token,
+        then `default` (formatted with region).
+
+        Args:
+            service: identity | compute | blockstorage | networking | nfv
+            default: fallback url pattern, e.g. "https://compute.{region}.cloud.global.fujitsu.com"
+        Returns:
+            str: base url without trailing slash
+        """
+        if service in self.endpoint_overrides:
+            return self.endpoint_overrides[service].rstrip("/")
+        for service_type in SERVICE_TYPES.get(service, (service,)):
+            if service_type in self.endpoints:
+                return self.endpoints[service_type]
+        return default.format(region=self.region)
+
+
+    @property
+    def cache_key(self) -> str:
+        return TokenCache.key(self.region, self.domain_name, self.project_id, self.username, self.identity_url)
+
+
+    def _is_fresh(self, entry: dict) -> bool:
+        return entry is not None and entry["expires_at"] - self.refresh_margin > time.time()
+
+
+    def _needs_refresh(self) -> bool:
+        return self._token is None or (self.expires_at is not None and
+                                       self.expires_at - self.refresh_margin <= time.time())
+
+
+    def refresh(self, force: bool = False, stale_token: str = None) -> str:
+        """
+        Adopt a cached token if it is still fresh, otherwise authenticate and store the new token.
+
+        Args:
+            force: [optional] Always authenticate, ignoring the cache
+            stale_token: [optional] Token known to be rejected; a cached entry holding it is not reused
+        Returns:
+            str: token
+        """
+        with self._lock:
+            with self.token_cache.locked():
+                entry = None if force else self.token_cache.reload(self.cache_key)
+                if not self._is_fresh(entry) or entry["token"] == stale_token:
+                    token: str = self.get_token()
+                    entry = {"token": token, "expires_at": self.expires_at, "endpoints": self.endpoints}
+                    self.token_cache.put(self.cache_key, entry)
+            self._token = entry["token"]
+            self.expires_at = entry["expires_at"]
+            self.endpoints = entry.get("endpoints") or {}
+            if self.background_refresh:
+                self._schedule_refresh()
+            return self._token
+
+
+    def reauthenticate(self, stale_token: str) -> str:
+        """
+        Called when a request sent with `stale_token` got 401.
+        Only the first of several concurrent callers authenticates; the others get the token it obtained.
+
+        Returns:
+            str: token to replay the request with
+        """
+        with self._lock:
+            if self._token != stale_token:
+                return self._token
+            return self.refresh(stale_token=stale_token)
+
+
+    def _schedule_refresh(self):
+        if self._timer is not None:
+            self._timer.cancel()
+        delay = max(self.expires_at - self.refresh_margin - time.time(), 1)
+        self._timer = threading.Timer(delay, self._refresh_in_background)
+        self._timer.daemon = True
+        self._timer.start()
+
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as err:
+            logger.warning('Background token refresh failed: %s', err)
+            # 次の試行までの間隔を空けて再スケジュールする
+            self._timer = threading.Timer(30, self._refresh_in_background)
+            self._timer.daemon = True
+            self._timer.start()
+
+
+    def close(self):
+        """
+        Stop the background refresh timer.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+
+    def _password_auth_body(self) -> dict:
+        return {
             "auth": {
                 "identity": {
                     "methods": ["password"],
@@ -37,21 +250,47 @@ class AuthManager:
             }
         }
 
+
+    def _read_token_response(self, body: dict):
+        try:
+            self.endpoints = parse_catalog(body["token"].get("catalog"), self.region)
+        except (KeyError, TypeError, AttributeError):
+            self.endpoints = {}
+        try:
+            self.expires_at = parse_expires_at(body["token"]["expires_at"])
+        except (KeyError, TypeError, ValueError):
+            # expires_at が読めない場合は控えめな有効期間を仮定する
+            self.expires_at = time.time() + DEFAULT_TOKEN_LIFETIME
+
+
+    def get_token(self):
+        headers = {"Content-Type": "application/json", "Accept": "application/json"}
+        data = self._password_auth_body()
+
         #response = Utilities.post(self.identity_url, headers=headers, json_data=data)
-        response = requests.post(self.identity_url, headers=headers, json=data)
+        try:
+            response = self.transport.request("POST", self.identity_url, headers=headers, json=data,
+                                              timeout=self.auth_timeout)
+        except RequestException as err:
+            raise AuthenticationError("Authentication request failed: {}".format(err)) from err
 
+        try:
+            body = response.json()
+        except ValueError:
+            body = None
         if response.status_code == 201:
             token: str = response.headers["X-Subject-Token"]
+            self._read_token_response(body)
             return token
         else:
-            print(response.json())
-            sys.exit(1)
+            raise AuthenticationError("Authentication failed ({}): {}".format(response.status_code, body),
+                                      response.status_code, body)
 
 
 
 
     def validate_token(self):
         headers = {"X-Auth-Token": self.token}
-        response = requests.get(self.identity_url, headers=headers)
+        response = self.transport.request("GET", self.identity_url, headers=headers)
 
-        return response
\ No newline at end of file
+        return response
@@ -2,83 +2,227 @@
 # -*- coding: utf-8 -*-
 
 from .auth import AuthManager
-from .utils import Utilities, to_dict_without_none, get_current_api_version
+from .transport import Transport
+from .version_cache import ApiVersionCache, default_version_cache
+from .utils import DiscoveryError, Utilities, build_query, to_dict_without_none, get_current_api_version
 from .schemas import CreateBackupRequest
-import sys
+from .waiters import WaitPolicy
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 
 class BlockstorageAPI:
-    def __init__(self, client: AuthManager):
-        self.token: str = client.token
+    utilities = Utilities
+
+    def __init__(self, client: AuthManager, api_version: str = None, version_cache: ApiVersionCache = None):
+        """
+        Args:
+            client: [require] AuthManager
+            api_version: [optional] Pin the microversion and skip discovery (no network I/O)
+            version_cache: [optional] Cache of discovered versions (default: process wide in-memory cache)
+        """
+        self.client: AuthManager = client
         self.region: str = client.region
         self.project_id: str = client.project_id
-        self.base_url: str = "https://blockstorage.{region}.cloud.global.fujitsu.com".format(
-            region=self.region
+        self.transport: Transport = client.transport
+        self.base_url: str = client.endpoint_for(
+            "blockstorage", "https://blockstorage.{region}.cloud.global.fujitsu.com"
         )
 
-        self.headers: dict = {"Accept": "application/json", "X-Auth-Token": self.token}
-        self.current_api_version = get_current_api_version(self._get_current_api_version())
-        # microバージョン指定のないAPIもこのヘッダーを付与することで害は無いはずなのでデフォルトで付与しとく
-        self.headers["OpenStack-API-Version"] = "volume {}".format(self.current_api_version)
+        self.version_cache: ApiVersionCache = version_cache or default_version_cache()
+        self.current_api_version = api_version
+        if self.current_api_version is None:
+            self.current_api_version = self.version_cache.get_or_discover(
+                "blockstorage", self.region, lambda: get_current_api_version(self._get_current_api_version()),
+                endpoint=self.base_url
+            )
+
+
+    @property
+    def token(self) -> str:
+        return self.client.token
+
+
+    @property
+    def headers(self) -> dict:
+        headers: dict = {"Accept": "application/json", "X-Auth-Token": self.client.token}
+        if self.current_api_version is not None:
+            # microバージョン指定のないAPIもこのヘッダーを付与することで害は無いはずなのでデフォルトで付与しとく
+            headers["OpenStack-API-Version"] = "volume {}".format(self.current_api_version)
+        return headers
 
 
     def _get_current_api_version(self):
         uri: str = "/"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
         if response['status'] == 'success':
             return response['data']
         else:
-            print("Could not retrieve the Blockstorage API version.")
-            print(response['message'])
-            sys.exit(1)
+            raise DiscoveryError("blockstorage", response)
 
 
     def list_api_versions(self) -> dict:
         uri: str = "/"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
 
-    def list_accessible_volumes(self) -> dict:
+    def list_accessible_volumes(self, status: str = None, name: str = None, sort_key: str = None, sort_dir: str = None,
+                                all_tenants: bool = None, limit: int = None, marker: str = None,
+                                filters: dict = None) -> dict:
         """
+        Args:
+            status: [optional] Volume status (available, in-use, error, ...)
+            name: [optional] Volume name
+            sort_key: [optional] Sort key (e.g. created_at)
+            sort_dir: [optional] asc | desc
+            all_tenants: [optional] Volumes of all projects (admin only)
+            limit: [optional] Max number of volumes
+            marker: [optional] ID of the last volume of the previous page
+            filters: [optional] Other query parameters (e.g. {"updated_at": "gte:2024-09-01T00:00:00"})
         Returns:
             dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
         """
         uri: str = "/v3/{project_id}/volumes".format(project_id=self.project_id)
         endpoint: str = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        params: dict = build_query(filters, status=status, name=name, sort_key=sort_key, sort_dir=sort_dir,
+                                   all_tenants=all_tenants, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def iter_accessible_volumes(self, limit: int = 100, prefetch: bool = False, stream: bool = False,
+                                status: str = None, name: str = None,
+                                sort_key: str = None, sort_dir: str = None, all_tenants: bool = None,
+                                filters: dict = None) -> Iterator[dict]:
+        """
+        Args:
+            limit: [optional] Page size
+            prefetch: [optional] Fetch the next page in the background
+            stream: [optional] Decode each page incrementally instead of holding the whole body (excludes prefetch)
+            others: same as list_accessible_volumes
+        Yields:
+            dict: volume
+        """
+        uri: str = "/v3/{project_id}/volumes".format(project_id=self.project_id)
+        endpoint: str = self.base_url + uri
+        params: dict = build_query(filters, status=status, name=name, sort_key=sort_key, sort_dir=sort_dir,
+                                   all_tenants=all_tenants)
+
+        return self.utilities.paginate(endpoint, "volumes", headers=self.headers, params=params, limit=limit,
+                                       prefetch=prefetch, stream=stream, transport=self.transport,
+                                       auth=self.client)
+
+
+    def list_volumes_detail(self, status: str = None, name: str = None, sort_key: str = None, sort_dir: str = None,
+                            all_tenants: bool = None, limit: int = None, marker: str = None,
+                            filters: dict = None) -> dict:
+        """
+        Args: same as list_accessible_volumes
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
+        uri: str = "/v3/{project_id}/volumes/detail".format(project_id=self.project_id)
+        endpoint: str = self.base_url + uri
+        params: dict = build_query(filters, status=status, name=name, sort_key=sort_key, sort_dir=sort_dir,
+                                   all_tenants=all_tenants, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
 
+    def iter_volumes_detail(self, limit: int = 100, prefetch: bool = False, stream: bool = False,
+                            status: str = None, name: str = None,
+                            sort_key: str = None, sort_dir: str = None, all_tenants: bool = None,
+                            filters: dict = None) -> Iterator[dict]:
+        """
+        Args:
+            limit: [optional] Page size
+            prefetch: [optional] Fetch the next page in the background
+            stream: [optional] Decode each page incrementally instead of holding the whole body (excludes prefetch)
+            others: same as list_accessible_volumes
+        Yields:
+            dict: volume (with status, attachments, updated_at, ...)
+        """
+        uri: str = "/v3/{project_id}/volumes/detail".format(project_id=self.project_id)
+        endpoint: str = self.base_url + uri
+        params: dict = build_query(filters, status=status, name=name, sort_key=sort_key, sort_dir=sort_dir,
+                                   all_tenants=all_tenants)
+
+        return self.utilities.paginate(endpoint, "volumes", headers=self.headers, params=params, limit=limit,
+                                       prefetch=prefetch, stream=stream, transport=self.transport,
+                                       auth=self.client)
 
-    def list_backups(self) -> dict:
+
+    def list_backups(self, status: str = None, name: str = None, volume_id: str = None, sort_key: str = None,
+                     sort_dir: str = None, all_tenants: bool = None, limit: int = None, marker: str = None,
+                     filters: dict = None) -> dict:
         """
+        Args:
+            status: [optional] Backup status (available, creating, error, ...)
+            name: [optional] Backup name
+            volume_id: [optional] Backups of this volume
+            sort_key: [optional] Sort key (e.g. created_at)
+            sort_dir: [optional] asc | desc
+            all_tenants: [optional] Backups of all projects (admin only)
+            limit: [optional] Max number of backups
+            marker: [optional] ID of the last backup of the previous page
+            filters: [optional] Other query parameters
         Returns:
             dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
         """
         uri: str = "/v3/{project_id}/backups".format(project_id=self.project_id)
         endpoint: str = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        params: dict = build_query(filters, status=status, name=name, volume_id=volume_id, sort_key=sort_key,
+                                   sort_dir=sort_dir, all_tenants=all_tenants, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
 
-    def list_backups_detail(self) -> dict:
+    def list_backups_detail(self, status: str = None, name: str = None, volume_id: str = None, sort_key: str = None,
+                            sort_dir: str = None, all_tenants: bool = None, limit: int = None, marker: str = None,
+                            filters: dict = None) -> dict:
         """
+        Args: same as list_backups
         Returns:
             dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
         """
         uri: str = "/v3/{project_id}/backups/detail".format(project_id=self.project_id)
         endpoint: str = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        params: dict = build_query(filters, status=status, name=name, volume_id=volume_id, sort_key=sort_key,
+                                   sort_dir=sort_dir, all_tenants=all_tenants, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
 
+    def iter_backups_detail(self, limit: int = 100, prefetch: bool = False, stream: bool = False,
+                            status: str = None, name: str = None,
+                            volume_id: str = None, sort_key: str = None, sort_dir: str = None,
+                            all_tenants: bool = None, filters: dict = None) -> Iterator[dict]:
+        """
+        Args:
+            limit: [optional] Page size
+            prefetch: [optional] Fetch the next page in the background
+            stream: [optional] Decode each page incrementally instead of holding the whole body (excludes prefetch)
+            others: same as list_backups
+        Yields:
+            dict: backup
+        """
+        uri: str = "/v3/{project_id}/backups/detail".format(project_id=self.project_id)
+        endpoint: str = self.base_url + uri
+        params: dict = build_query(filters, status=status, name=name, volume_id=volume_id, sort_key=sort_key,
+                                   sort_dir=sort_dir, all_tenants=all_tenants)
+
+        return self.utilities.paginate(endpoint, "backups", headers=self.headers, params=params, limit=limit,
+                                       prefetch=prefetch, stream=stream, transport=self.transport,
+                                       auth=self.client)
+
+
     def show_backup_detail(self, backup_id: str) -> dict:
         """
         Returns:
@@ -89,11 +233,70 @@ class BlockstorageAPI:
             backup_id = backup_id
         )
         endpoint: str = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
 
+    def show_backup_details_many(self, backup_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        show_backup_detail for many IDs concurrently over the shared connection pool.
+
+        Args:
+            backup_ids: [require] Backup IDs
+            max_workers: [optional] Max requests in flight (keep <= Transport.pool_maxsize)
+        Returns:
+            dict: {backup id: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}}
+        """
+        return self.utilities.gather(self.show_backup_detail, backup_ids, max_workers=max_workers)
+
+
+    def iter_backup_details_many(self, backup_ids: Iterable[str], max_workers: int = 8) -> Iterator[Tuple[str, dict]]:
+        """
+        Same as show_backup_details_many, yielding (backup id, envelope) as each request completes.
+        """
+        return self.utilities.fan_out(self.show_backup_detail, backup_ids, max_workers=max_workers)
+
+
+    def wait_for_backup(self, backup_id: str, target: Iterable[str] = ("available",), failure: Iterable[str] = ("error",),
+                        policy: WaitPolicy = None) -> dict:
+        """
+        Wait until the backup reaches a target status (e.g. after create_backup).
+
+        Args:
+            backup_id: [require] Backup ID
+            target: [optional] Statuses that end the wait (waiters.DELETED: until the backup is gone, e.g. after delete_backup)
+            failure: [optional] Statuses that raise WaiterError
+            policy: [optional] WaitPolicy (poll interval and deadline)
+        Returns:
+            dict: backup
+        Raises:
+            WaiterError: the backup reached a failure status or disappeared
+            WaitTimeout: policy.timeout passed first
+        """
+        return self.utilities.wait(self._poll_backups, backup_id, target, failure, "backup", "backups", policy=policy)
+
+
+    def wait_for_backups(self, backup_ids: Iterable[str], target: Iterable[str] = ("available",),
+                         failure: Iterable[str] = ("error",), policy: WaitPolicy = None) -> Dict[str, dict]:
+        """
+        Same as wait_for_backup for many backups, polling them with one paged list_backups_detail walk per tick.
+
+        Returns:
+            dict: {backup id: backup}
+        """
+        return self.utilities.wait(self._poll_backups, list(backup_ids), target, failure, "backup", "backups",
+                                   policy=policy)
+
+
+    def _poll_backups(self, backup_ids: List[str]):
+        # 1件なら show、複数なら list_backups_detail の全ページで状態を取る
+        if len(backup_ids) == 1:
+            return self.show_backup_detail(backup_ids[0])
+        return self.utilities.poll_many(self.iter_backups_detail, self.show_backup_detail, backup_ids, "backup",
+                                        "backups")
+
+
     def delete_backup(self, backup_id: str) -> dict:
         """
         Returns:
@@ -104,7 +307,7 @@ class BlockstorageAPI:
             backup_id=backup_id
         )
         endpoint: str = self.base_url + uri
-        response = Utilities.delete(endpoint, headers=self.headers)
+        response = self.utilities.delete(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
@@ -125,6 +328,6 @@ class BlockstorageAPI:
         # Noneを削除したあとのrequest_parametersをbackupキーを含むリクエストに変換
         request_dict: dict = {"backup": to_dict_without_none(request_parameters)}
 
-        response = Utilities.post(endpoint, headers=self.headers, json_data=request_dict)
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_dict, transport=self.transport, auth=self.client)
 
         return response
\ No newline at end of file
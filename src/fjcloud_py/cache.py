@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Response cache for GETs of nearly static resources (Transport(cache=ResponseCache(...))).
+
+    cache = ResponseCache(SqliteCache("~/.fjcloud/responses.sqlite"), ttls={r"/v2.0/networks/[^/]+$": 600})
+    transport = Transport(cache=cache)
+"""
+
+from .result import Result
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import copy
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+
+
+# URL のパスに対する正規表現: TTL(秒)。最初にマッチしたものを使う
+DEFAULT_TTLS: Dict[str, float] = {
+    r"^/?$": 86400.0,                                   # list_api_versions
+    r"/v2\.0/networks/[^/]+$": 300.0,                   # show_network_details
+    r"/vpn/nfv/ikepolicies(/[^/]+)?$": 3600.0,          # list_ike_policies, show_ike_policy_details
+    r"/vpn/nfv/ipsecpolicies(/[^/]+)?$": 3600.0,        # list_ipsec_policies, show_ipsec_policy_details
+}
+
+
+@dataclass
+class CacheEntry:
+    """
+    Attributes:
+        url (str): Request URL (used for invalidation)
+        data: Decoded body
+        expires_at (float): time.time() after which the entry must be revalidated
+        etag (Optional[str]): ETag of the response
+        last_modified (Optional[str]): Last-Modified of the response
+    """
+    url: str
+    data: object
+    expires_at: float
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+    @property
+    def fresh(self) -> bool:
+        return time.time() < self.expires_at
+
+
+    @property
+    def revalidatable(self) -> bool:
+        return self.etag is not None or self.last_modified is not None
+
+
+class MemoryCache:
+    """
+    In-process LRU backend.
+
+    Args:
+        maxsize: [optional] Max number of entries
+    """
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize: int = maxsize
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            # data は hit() でコピーされる
+            return replace(entry)
+
+
+    def put(self, key: str, entry: CacheEntry):
+        with self._lock:
+            self._entries[key] = copy.deepcopy(entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+    def delete_prefix(self, url_prefix: str):
+        with self._lock:
+            for key in [key for key, entry in self._entries.items() if _under(entry.url, url_prefix)]:
+                del self._entries[key]
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class SqliteCache:
+    """
+    On-disk LRU backend shared by processes (sqlite handles the locking).
+
+    Args:
+        path: [require] Database file
+        maxsize: [optional] Max number of entries
+    """
+    def __init__(self, path: str, maxsize: int = 10000):
+        self.path: str = os.path.expanduser(path)
+        self.maxsize: int = maxsize
+        self._lock = threading.Lock()
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, url TEXT, data TEXT, expires_at REAL,"
+                " etag TEXT, last_modified TEXT, accessed_at REAL)"
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT url, data, expires_at, etag, last_modified FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        url, data, expires_at, etag, last_modified = row
+        return CacheEntry(url, json.loads(data), expires_at, etag, last_modified)
+
+
+    def put(self, key: str, entry: CacheEntry):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, entry.url, json.dumps(entry.data), entry.expires_at, entry.etag, entry.last_modified, time.time())
+            )
+            self._conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed_at DESC"
+                " LIMIT -1 OFFSET ?)", (self.maxsize,)
+            )
+
+
+    def delete(self, key: str):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+
+
+    def delete_prefix(self, url_prefix: str):
+        pattern = url_prefix.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        with self._lock, self._conn:
+            self._conn.execute(
+                "DELETE FROM responses WHERE url = ? OR url LIKE ? ESCAPE '\\' OR url LIKE ? ESCAPE '\\'",
+                (url_prefix, pattern + "/%", pattern + "?%")
+            )
+
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM responses")
+
+
+    def close(self):
+        self._conn.close()
+
+
+class ResponseCache:
+    """
+    GET response cache applied by Utilities.get/AsyncUtilities.get.
+
+    Only URLs whose path matches a `ttls` pattern are cached. A fresh entry is returned without a request;
+    an expired entry with an ETag/Last-Modified is revalidated with If-None-Match/If-Modified-Since (304
+    keeps it), one without validators is fetched again. A successful POST/PUT/DELETE through the same
+    transport drops the entries of its resource collection (e.g. update_network drops every cached
+    /v2.0/networks... response).
+
+    Entries are keyed by project, URL, query parameters and headers other than X-Auth-Token (when the call has
+    an AuthManager), so they survive token refreshes but are never shared between projects.
+
+    Args:
+        backend: [optional] MemoryCache (default) or SqliteCache
+        ttls: [optional] {regular expression on the URL path: seconds} (default: DEFAULT_TTLS)
+    """
+    def __init__(self, backend=None, ttls: Dict[str, float] = None):
+        self.backend = backend or MemoryCache()
+        self.ttls: Dict[str, float] = dict(DEFAULT_TTLS if ttls is None else ttls)
+        self._patterns = [(re.compile(pattern), ttl) for pattern, ttl in self.ttls.items()]
+
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        path = urlparse(url).path
+        for pattern, ttl in self._patterns:
+            if pattern.search(path):
+                return ttl
+        return None
+
+
+    @staticmethod
+    def key(url: str, params: dict = None, headers: dict = None, auth=None) -> str:
+        if auth is not None:
+            # プロジェクトで区別できるのでトークン更新後もヒットさせる
+            headers = {name: value for name, value in (headers or {}).items() if name.lower() != "x-auth-token"}
+        params = {name: value if isinstance(value, (list, tuple)) else str(value)
+                  for name, value in (params or {}).items()}
+        return json.dumps([getattr(auth, "project_id", None), url, params, headers], sort_keys=True, default=str)
+
+
+    def lookup(self, url: str, params: dict = None, headers: dict = None, auth=None) -> Tuple[Optional[str], Optional[CacheEntry]]:
+        """
+        Returns:
+            tuple: (key, entry); key is None when the URL is not cached, entry is None on a miss
+        """
+        if self.ttl_for(url) is None:
+            return None, None
+        key = self.key(url, params, headers, auth)
+        entry = self.backend.get(key)
+        if entry is not None and not entry.fresh and not entry.revalidatable:
+            self.backend.delete(key)
+            entry = None
+        return key, entry
+
+
+    @staticmethod
+    def conditional_headers(entry: Optional[CacheEntry]) -> dict:
+        headers = {}
+        if entry is not None:
+            if entry.etag is not None:
+                headers["If-None-Match"] = entry.etag
+            if entry.last_modified is not None:
+                headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+
+    def store(self, key: str, entry: Optional[CacheEntry], url: str, response: Result) -> Result:
+        """
+        Update the cache from the response of a (conditional) GET.
+
+        Returns:
+            Result: envelope to hand to the caller (the cached data on 304)
+        """
+        ttl = self.ttl_for(url)
+        if response.status_code == 304 and entry is not None:
+            entry.expires_at = time.time() + ttl
+            self.backend.put(key, entry)
+            return hit(entry, response)
+        if response.ok and response.status_code == 200:
+            self.backend.put(key, CacheEntry(
+                url=url,
+                data=response['data'],
+                expires_at=time.time() + ttl,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified")
+            ))
+        return response
+
+
+    def invalidate(self, method: str, url: str):
+        """
+        Drop the entries of the collection a successful POST/PUT/PATCH/DELETE to `url` touched.
+        """
+        self.backend.delete_prefix(collection_of(method, url))
+
+
+    def clear(self):
+        self.backend.clear()
+
+
+def hit(entry: CacheEntry, revalidation: Result = None) -> Result:
+    """
+    Returns:
+        Result: the cached data (with the status/headers of the 304 when it was revalidated)
+    """
+    if revalidation is None:
+        return Result('success', data=copy.deepcopy(entry.data))
+    return Result('success', status_code=revalidation.status_code, headers=revalidation.headers,
+                  elapsed=revalidation.elapsed, retries=revalidation.retries, data=copy.deepcopy(entry.data))
+
+
+def collection_of(method: str, url: str) -> str:
+    """
+    POST /networks -> /networks, PUT|DELETE /networks/{id} -> /networks, POST /servers/{id}/action -> /servers
+
+    Returns:
+        str: URL (without query) of the resource collection
+    """
+    url = url.split("?", 1)[0].rstrip("/")
+    if method.upper() != "POST":
+        url = url.rsplit("/", 1)[0]
+    elif url.endswith("/action"):
+        url = url.rsplit("/", 2)[0]
+    return url
+
+
+def _under(url: str, url_prefix: str) -> bool:
+    return url == url_prefix or url.startswith(url_prefix + "/") or url.startswith(url_prefix + "?")
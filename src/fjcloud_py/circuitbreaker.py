@@ -0,0 +1,159 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from .ratelimit import SERVICES
+from typing import Callable, Dict
+from urllib.parse import urlparse
+import logging
+import threading
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+CLOSED: str = "closed"
+OPEN: str = "open"
+HALF_OPEN: str = "half_open"
+
+
+class _Circuit:
+    __slots__ = ("state", "failures", "opened_at", "probes")
+
+    def __init__(self):
+        self.state: str = CLOSED
+        self.failures: int = 0
+        self.opened_at: float = 0.0
+        self.probes: int = 0
+
+
+class CircuitBreaker:
+    """
+    Per service host circuit breaker applied by Utilities and AsyncUtilities.
+
+    After `failure_threshold` consecutive failures (connection errors, timeouts, 5xx, or calls slower
+    than `slow_call_threshold`) the circuit of that host opens and requests fail immediately with an
+    error envelope. After `recovery_timeout` seconds up to `half_open_max_calls` probe requests are let
+    through; a successful probe closes the circuit, a failed one opens it again.
+
+    Args:
+        failure_threshold: [optional] Consecutive failures that open the circuit
+        slow_call_threshold: [optional] Seconds after which a successful call still counts as a failure
+        recovery_timeout: [optional] Seconds the circuit stays open before probing
+        half_open_max_calls: [optional] Concurrent probe requests while half open
+        on_state_change: [optional] Called as on_state_change(host, old_state, new_state)
+    """
+    def __init__(self, failure_threshold: int = 5, slow_call_threshold: float = None, recovery_timeout: float = 30.0,
+                 half_open_max_calls: int = 1, on_state_change: Callable[[str, str, str], None] = None):
+        self.failure_threshold: int = failure_threshold
+        self.slow_call_threshold: float = slow_call_threshold
+        self.recovery_timeout: float = recovery_timeout
+        self.half_open_max_calls: int = half_open_max_calls
+        self.on_state_change: Callable[[str, str, str], None] = on_state_change
+        self._circuits: Dict[str, _Circuit] = {}
+        self._lock = threading.Lock()
+
+
+    @staticmethod
+    def key(url: str) -> str:
+        """
+        Returns:
+            str: host of the URL (plus the service segment for a stand-in server, e.g. 127.0.0.1:8080/nfv)
+        """
+        parsed = urlparse(url)
+        segment = parsed.path.lstrip("/").split("/")[0]
+        if segment in SERVICES:
+            return "{}/{}".format(parsed.netloc, segment)
+        return parsed.netloc
+
+
+    def state(self, url: str) -> str:
+        """
+        Returns:
+            str: closed | open | half_open
+        """
+        with self._lock:
+            circuit = self._circuits.get(self.key(url))
+            return circuit.state if circuit else CLOSED
+
+
+    def allow(self, url: str) -> bool:
+        """
+        Returns:
+            bool: False when the request must fail fast
+        """
+        key = self.key(url)
+        with self._lock:
+            circuit = self._circuits.setdefault(key, _Circuit())
+            if circuit.state == OPEN:
+                if time.monotonic() - circuit.opened_at < self.recovery_timeout:
+                    return False
+                self._transition(key, circuit, HALF_OPEN)
+            if circuit.state == HALF_OPEN:
+                if circuit.probes >= self.half_open_max_calls:
+                    return False
+                circuit.probes += 1
+            return True
+
+
+    def record(self, url: str, success: bool, latency: float = None):
+        """
+        Args:
+            success: the request got a response that is not a server error
+            latency: [optional] seconds the request took
+        """
+        if success and self.slow_call_threshold is not None and latency is not None and \
+                latency > self.slow_call_threshold:
+            success = False
+        key = self.key(url)
+        with self._lock:
+            circuit = self._circuits.setdefault(key, _Circuit())
+            if circuit.state == HALF_OPEN:
+                circuit.probes = max(circuit.probes - 1, 0)
+            if success:
+                circuit.failures = 0
+                if circuit.state != CLOSED:
+                    self._transition(key, circuit, CLOSED)
+                return
+            circuit.failures += 1
+            if circuit.state == HALF_OPEN or circuit.failures >= self.failure_threshold:
+                circuit.opened_at = time.monotonic()
+                if circuit.state != OPEN:
+                    self._transition(key, circuit, OPEN)
+
+
+    def release(self, url: str):
+        """
+        Give back a half-open probe slot taken by allow() for a request that was not sent or whose
+        outcome says nothing about the service.
+        """
+        with self._lock:
+            circuit = self._circuits.get(self.key(url))
+            if circuit is not None and circuit.state == HALF_OPEN:
+                circuit.probes = max(circuit.probes - 1, 0)
+
+
+    def reset(self, url: str = None):
+        """
+        Close one circuit (or all of them).
+        """
+        with self._lock:
+            keys = [self.key(url)] if url else list(self._circuits)
+            for key in keys:
+                circuit = self._circuits.get(key)
+                if circuit is not None and circuit.state != CLOSED:
+                    self._transition(key, circuit, CLOSED)
+                self._circuits.pop(key, None)
+
+
+    def _transition(self, key: str, circuit: _Circuit, state: str):
+        old_state = circuit.state
+        circuit.state = state
+        circuit.probes = 0
+        if state == CLOSED:
+            circuit.failures = 0
+        if self.on_state_change is not None:
+            try:
+                self.on_state_change(key, old_state, state)
+            except Exception as err:
+                logger.warning('on_state_change hook failed: %s', err, exc_info=True)
@@ -3,74 +3,206 @@
 from Crypto.PublicKey.RSA import RsaKey
 
 from .auth import AuthManager
-from .utils import Utilities, get_current_api_version
-import sys
+from .transport import Transport
+from .version_cache import ApiVersionCache, default_version_cache
+from .utils import DiscoveryError, Utilities, build_query, get_current_api_version
+from .waiters import WaitPolicy
+from datetime import datetime
+from typing import Dict, Iterable, Iterator, List, Union
 import base64
 from Crypto.PublicKey import RSA
 from Crypto.Cipher import PKCS1_v1_5
 
 
 class ComputeAPI:
-    def __init__(self, client: AuthManager):
-        self.token: str = client.token
+    # aio.py の Async* クラスはここを AsyncUtilities に差し替えて各メソッドをそのまま再利用する
+    utilities = Utilities
+
+    def __init__(self, client: AuthManager, api_version: str = None, version_cache: ApiVersionCache = None):
+        """
+        Args:
+            client: [require] AuthManager
+            api_version: [optional] Pin the microversion and skip discovery (no network I/O)
+            version_cache: [optional] Cache of discovered versions (default: process wide in-memory cache)
+        """
+        self.client: AuthManager = client
         self.region: str = client.region
         self.project_id: str = client.project_id
-        self.base_url: str = "https://compute.{region}.cloud.global.fujitsu.com".format(
-            region=self.region
+        self.transport: Transport = client.transport
+        self.base_url: str = client.endpoint_for(
+            "compute", "https://compute.{region}.cloud.global.fujitsu.com"
         )
 
-        self.headers: dict = {"Accept": "application/json", "X-Auth-Token": self.token}
-        self.current_api_version = get_current_api_version(self.list_api_versions())
-        # microバージョン指定のないAPIもこのヘッダーを付与することで害は無いはずなのでデフォルトで付与しとく
-        self.headers["OpenStack-API-Version"] = "compute {}".format(self.current_api_version)
+        self.version_cache: ApiVersionCache = version_cache or default_version_cache()
+        self.current_api_version = api_version
+        if self.current_api_version is None:
+            self.current_api_version = self.version_cache.get_or_discover(
+                "compute", self.region, lambda: get_current_api_version(self.list_api_versions()), endpoint=self.base_url
+            )
+
+
+    @property
+    def token(self) -> str:
+        return self.client.token
+
+
+    @property
+    def headers(self) -> dict:
+        # トークンは送信のたびに AuthManager から読む(更新されたトークンがそのまま使われる)
+        headers: dict = {"Accept": "application/json", "X-Auth-Token": self.client.token}
+        if self.current_api_version is not None:
+            # microバージョン指定のないAPIもこのヘッダーを付与することで害は無いはずなのでデフォルトで付与しとく
+            headers["OpenStack-API-Version"] = "compute {}".format(self.current_api_version)
+        return headers
 
 
     def list_api_versions(self):
         uri: str = "/"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         if response['status'] == 'success':
             #return response['data'].json()
             return response['data']
         else:
-            print("Could not retrieve the Blockstorage API version.")
-            print(response['message'])
-            sys.exit(1)
+            raise DiscoveryError("compute", response)
+
+
+    def list_servers(self, status: str = None, name: str = None, changes_since: Union[str, datetime] = None,
+                     sort_key: str = None, sort_dir: str = None, all_tenants: bool = None, limit: int = None,
+                     marker: str = None, filters: dict = None):
+        """
+        Args:
+            status: [optional] Server status (ACTIVE, ERROR, SHUTOFF, ...)
+            name: [optional] Server name (regular expression)
+            changes_since: [optional] Only servers changed since this time (ISO 8601 string or datetime)
+            sort_key: [optional] Sort key (e.g. created_at)
+            sort_dir: [optional] asc | desc
+            all_tenants: [optional] Servers of all projects (admin only)
+            limit: [optional] Max number of servers
+            marker: [optional] ID of the last server of the previous page
+            filters: [optional] Other query parameters
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
+        uri = "/v2.1/{project_id}/servers".format(project_id=self.project_id)
+        endpoint = self.base_url + uri
+        params = build_query(filters, status=status, name=name, changes_since=changes_since, sort_key=sort_key,
+                             sort_dir=sort_dir, all_tenants=all_tenants, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
+        return response
 
-    def list_servers(self):
-        uri = "/v2.1/{project_id}/servers".format(project_id=self.project_id)
+
+    def list_servers_detailed(self, status: str = None, name: str = None, changes_since: Union[str, datetime] = None,
+                              sort_key: str = None, sort_dir: str = None, all_tenants: bool = None, limit: int = None,
+                              marker: str = None, filters: dict = None):
+        """
+        Args: same as list_servers
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
+        uri = "/v2.1/{project_id}/servers/detail".format(project_id=self.project_id)
         endpoint = self.base_url + uri
-        headers = {"Accept": "application/json", "X-Auth-Token": self.token, "OpenStack-API-Version": "compute {}".format(self.current_api_version)}
-        response = Utilities.get(endpoint, headers=headers)
+        params = build_query(filters, status=status, name=name, changes_since=changes_since, sort_key=sort_key,
+                             sort_dir=sort_dir, all_tenants=all_tenants, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
 
-    def list_servers_detailed(self):
+    def iter_servers_detailed(self, limit: int = 100, prefetch: bool = False, stream: bool = False,
+                              status: str = None, name: str = None,
+                              changes_since: Union[str, datetime] = None, sort_key: str = None, sort_dir: str = None,
+                              all_tenants: bool = None, filters: dict = None) -> Iterator[dict]:
+        """
+        Args:
+            limit: [optional] Page size
+            prefetch: [optional] Fetch the next page in the background
+            stream: [optional] Decode each page incrementally instead of holding the whole body (excludes prefetch)
+            others: same as list_servers
+        Yields:
+            dict: server
+        """
         uri = "/v2.1/{project_id}/servers/detail".format(project_id=self.project_id)
         endpoint = self.base_url + uri
-        headers = {"Accept": "application/json", "X-Auth-Token": self.token, "OpenStack-API-Version": "compute {}".format(self.current_api_version)}
-        response = Utilities.get(endpoint, headers=headers)
+        params = build_query(filters, status=status, name=name, changes_since=changes_since, sort_key=sort_key,
+                             sort_dir=sort_dir, all_tenants=all_tenants)
+
+        return self.utilities.paginate(endpoint, "servers", headers=self.headers, params=params, limit=limit,
+                                       prefetch=prefetch, stream=stream, transport=self.transport,
+                                       auth=self.client)
+
+
+    def show_server_details(self, server_id: str) -> dict:
+        """
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
+        uri = "/v2.1/{project_id}/servers/{server_id}".format(project_id=self.project_id, server_id=server_id)
+        endpoint = self.base_url + uri
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
 
+    def wait_for_server(self, server_id: str, target: Iterable[str] = ("ACTIVE",), failure: Iterable[str] = ("ERROR",),
+                        policy: WaitPolicy = None) -> dict:
+        """
+        Wait until the server reaches a target status (e.g. ACTIVE after boot, SHUTOFF after stop).
+
+        Args:
+            server_id: [require] Server ID
+            target: [optional] Statuses that end the wait (waiters.DELETED: until the server is gone)
+            failure: [optional] Statuses that raise WaiterError
+            policy: [optional] WaitPolicy (poll interval and deadline)
+        Returns:
+            dict: server
+        Raises:
+            WaiterError: the server reached a failure status or disappeared
+            WaitTimeout: policy.timeout passed first
+        """
+        return self.utilities.wait(self._poll_servers, server_id, target, failure, "server", "servers", policy=policy)
+
+
+    def wait_for_servers(self, server_ids: Iterable[str], target: Iterable[str] = ("ACTIVE",),
+                         failure: Iterable[str] = ("ERROR",), policy: WaitPolicy = None) -> Dict[str, dict]:
+        """
+        Same as wait_for_server for many servers, polling them with one paged list_servers_detailed walk per tick.
+
+        Returns:
+            dict: {server id: server}
+        """
+        return self.utilities.wait(self._poll_servers, list(server_ids), target, failure, "server", "servers",
+                                   policy=policy)
+
+
+    def _poll_servers(self, server_ids: List[str]):
+        if len(server_ids) == 1:
+            return self.show_server_details(server_ids[0])
+        return self.utilities.poll_many(self.iter_servers_detailed, self.show_server_details, server_ids, "server",
+                                        "servers")
+
+
     def show_server_password(self, server_id):
         uri: str = "/v2.1/{project_id}/servers/{server_id}/os-server-password".format(
             project_id=self.project_id,
             server_id=server_id
         )
         endpoint = self.base_url + uri
-        headers = {"Accept": "application/json", "X-Auth-Token": self.token}
-        response = Utilities.get(endpoint, headers=headers)
+        headers = {"Accept": "application/json", "X-Auth-Token": self.client.token}
+        response = self.utilities.get(endpoint, headers=headers, transport=self.transport, auth=self.client)
 
         return response
 
 
     def get_decrypted_password(self, server_id, private_key):
         password_data = self.show_server_password(server_id)
+        return self._decrypt_password(password_data, private_key)
+
+
+    @staticmethod
+    def _decrypt_password(password_data: dict, private_key):
         private_key = RSA.import_key(private_key)
         if password_data['status'] == 'success':
             encrypted_password_bytes = password_data['data']['password']
@@ -0,0 +1,286 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Local sqlite index of servers, volumes, backups, networks and VPN objects.
+
+    inventory = Inventory("~/.fjcloud/inventory.sqlite", compute=compute, blockstorage=blockstorage,
+                          networking=networking, vpnservice=vpnservice)
+    inventory.refresh()                   # first call lists everything, later calls only fetch the changes
+    inventory.volumes_without_backup(timedelta(hours=24))
+    inventory.servers_on_network("my-network")
+"""
+
+from .utils import APIError
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+import json
+import os
+import sqlite3
+import threading
+
+
+# kind: (API の属性名, 一覧メソッド, 差分取得の方式)
+#   changes_since: Nova の changes-since(削除されたサーバーも status=DELETED で返る)
+#   updated_at:    Cinder の updated_at=gte:... フィルター
+#   changed_since: Neutron の changed_since フィルター
+#   None:          差分取得なし(毎回全件)
+KINDS: Dict[str, Tuple[str, str, Optional[str]]] = {
+    "servers": ("compute", "iter_servers_detailed", "changes_since"),
+    "volumes": ("blockstorage", "iter_volumes_detail", "updated_at"),
+    "backups": ("blockstorage", "iter_backups_detail", "updated_at"),
+    "networks": ("networking", "iter_networks", "changed_since"),
+    "vpnservices": ("vpnservice", "list_vpn_services", None),
+    "ipsec_site_connections": ("vpnservice", "list_ipsec_site_connections", None),
+}
+
+# サーバー側との時計のずれと一覧取得中の更新を取りこぼさないための余裕
+SYNC_MARGIN: timedelta = timedelta(minutes=1)
+
+
+def links_of(kind: str, resource: dict) -> List[Tuple[str, str]]:
+    """
+    Returns:
+        list: [(rel, target)] indexed for the resource, e.g. [("network", "net-name"), ("volume", volume id)]
+    """
+    links: List[Tuple[str, str]] = []
+    if kind == "servers":
+        # addresses のキーはネットワーク名
+        links += [("network", name) for name in (resource.get("addresses") or {})]
+        links += [("volume", volume["id"]) for volume in resource.get("os-extended-volumes:volumes_attached") or []]
+    elif kind == "volumes":
+        links += [("server", attachment["server_id"]) for attachment in resource.get("attachments") or []
+                  if attachment.get("server_id")]
+    elif kind == "backups":
+        links.append(("volume", resource.get("volume_id")))
+    elif kind == "networks":
+        links += [("subnet", subnet_id) for subnet_id in resource.get("subnets") or []]
+    elif kind == "vpnservices":
+        links += [("router", resource.get("router_id")), ("subnet", resource.get("subnet_id"))]
+    elif kind == "ipsec_site_connections":
+        links += [("vpnservice", resource.get("vpnservice_id")), ("ikepolicy", resource.get("ikepolicy_id")),
+                  ("ipsecpolicy", resource.get("ipsecpolicy_id"))]
+    return [(rel, target) for rel, target in links if target]
+
+
+class Inventory:
+    """
+    Args:
+        path: [require] sqlite database file (":memory:" for a throwaway index)
+        compute: [optional] ComputeAPI (servers)
+        blockstorage: [optional] BlockstorageAPI (volumes, backups)
+        networking: [optional] NetworkingAPI (networks)
+        vpnservice: [optional] VpnServiceAPI (VPN services, IPsec site connections)
+    """
+    def __init__(self, path: str, compute=None, blockstorage=None, networking=None, vpnservice=None):
+        self.path: str = path if path == ":memory:" else os.path.expanduser(path)
+        self.compute = compute
+        self.blockstorage = blockstorage
+        self.networking = networking
+        self.vpnservice = vpnservice
+        self._lock = threading.RLock()
+        directory = os.path.dirname(self.path) if path != ":memory:" else ""
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS resources (
+                    kind TEXT, id TEXT, name TEXT, status TEXT, created_at TEXT, updated_at TEXT, data TEXT,
+                    PRIMARY KEY (kind, id)
+                );
+                CREATE INDEX IF NOT EXISTS resources_name ON resources (kind, name);
+                CREATE INDEX IF NOT EXISTS resources_status ON resources (kind, status);
+                CREATE TABLE IF NOT EXISTS links (kind TEXT, id TEXT, rel TEXT, target TEXT);
+                CREATE INDEX IF NOT EXISTS links_source ON links (kind, id);
+                CREATE INDEX IF NOT EXISTS links_target ON links (rel, target);
+                CREATE TABLE IF NOT EXISTS sync_state (kind TEXT PRIMARY KEY, synced_at TEXT);
+            """)
+
+
+    def close(self):
+        self._conn.close()
+
+
+    """Refresh
+    """
+    def refresh(self, kinds: Iterable[str] = None, full: bool = False) -> Dict[str, int]:
+        """
+        Bring the index up to date. Kinds whose API was not given are skipped.
+
+        The first refresh of a kind lists everything. Later refreshes only fetch resources changed since the
+        previous one (changes-since/updated_at/changed_since); if the service rejects the filter a full listing
+        is done instead. Incremental refreshes of volumes, backups and networks cannot see deletions:
+        run refresh(full=True) from time to time to drop them.
+
+        Args:
+            kinds: [optional] Subset of KINDS (default: all)
+            full: [optional] List everything and drop resources that no longer exist
+        Returns:
+            dict: {kind: number of resources written or deleted}
+        Raises:
+            APIError: a listing failed
+        """
+        changed: Dict[str, int] = {}
+        for kind in kinds or KINDS:
+            api_name, _, _ = KINDS[kind]
+            if getattr(self, api_name) is None:
+                continue
+            changed[kind] = self._refresh_kind(kind, full)
+        return changed
+
+
+    def _refresh_kind(self, kind: str, full: bool) -> int:
+        started = datetime.now(timezone.utc)
+        since = None if full else self.synced_at(kind)
+        resources = None
+        if since is not None and KINDS[kind][2] is not None:
+            try:
+                resources = list(self._list(kind, since - SYNC_MARGIN))
+            except APIError:
+                resources = None
+        if resources is not None:
+            count = self._apply(kind, resources, complete=False)
+        else:
+            count = self._apply(kind, list(self._list(kind, None)), complete=True)
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?)", (kind, started.isoformat()))
+        return count
+
+
+    def _list(self, kind: str, since: Optional[datetime]) -> Iterator[dict]:
+        api_name, method_name, incremental = KINDS[kind]
+        method = getattr(getattr(self, api_name), method_name)
+        if incremental is None:
+            response = method()
+            if response['status'] != 'success':
+                raise APIError(response)
+            return iter(response['data'].get(kind, []))
+        if since is None:
+            return method()
+        timestamp = since.strftime("%Y-%m-%dT%H:%M:%S")
+        if incremental == "changes_since":
+            return method(changes_since=timestamp)
+        if incremental == "updated_at":
+            return method(filters={"updated_at": "gte:" + timestamp})
+        return method(filters={"changed_since": timestamp})
+
+
+    def _apply(self, kind: str, resources: List[dict], complete: bool) -> int:
+        count = 0
+        with self._lock, self._conn:
+            for resource in resources:
+                if resource.get("status") == "DELETED":
+                    count += self._delete(kind, resource["id"])
+                    continue
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (kind, resource["id"], resource.get("name"), resource.get("status"),
+                     resource.get("created_at") or resource.get("created"),
+                     resource.get("updated_at") or resource.get("updated"), json.dumps(resource))
+                )
+                self._conn.execute("DELETE FROM links WHERE kind = ? AND id = ?", (kind, resource["id"]))
+                self._conn.executemany(
+                    "INSERT INTO links VALUES (?, ?, ?, ?)",
+                    [(kind, resource["id"], rel, target) for rel, target in links_of(kind, resource)]
+                )
+                count += 1
+            if complete:
+                seen = {resource["id"] for resource in resources}
+                stale = [row[0] for row in self._conn.execute("SELECT id FROM resources WHERE kind = ?", (kind,))
+                         if row[0] not in seen]
+                for resource_id in stale:
+                    count += self._delete(kind, resource_id)
+        return count
+
+
+    def _delete(self, kind: str, resource_id: str) -> int:
+        self._conn.execute("DELETE FROM links WHERE kind = ? AND id = ?", (kind, resource_id))
+        return self._conn.execute("DELETE FROM resources WHERE kind = ? AND id = ?", (kind, resource_id)).rowcount
+
+
+    def synced_at(self, kind: str) -> Optional[datetime]:
+        """
+        Returns:
+            datetime: start of the last refresh of `kind` (UTC), or None if it was never refreshed
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT synced_at FROM sync_state WHERE kind = ?", (kind,)).fetchone()
+        return datetime.fromisoformat(row[0]) if row else None
+
+
+    """Queries
+    """
+    def get(self, kind: str, resource_id: str) -> Optional[dict]:
+        rows = self._query("SELECT data FROM resources WHERE kind = ? AND id = ?", (kind, resource_id))
+        return rows[0] if rows else None
+
+
+    def find(self, kind: str, name: str = None, status: str = None) -> List[dict]:
+        """
+        Args:
+            kind: [require] servers | volumes | backups | networks | vpnservices | ipsec_site_connections
+            name: [optional] Exact name
+            status: [optional] Exact status
+        Returns:
+            list: resources
+        """
+        sql = "SELECT data FROM resources WHERE kind = ?"
+        args: list = [kind]
+        if name is not None:
+            sql += " AND name = ?"
+            args.append(name)
+        if status is not None:
+            sql += " AND status = ?"
+            args.append(status)
+        return self._query(sql, args)
+
+
+    def linked(self, kind: str, rel: str, target: str) -> List[dict]:
+        """
+        Resources of `kind` linked to `target`, e.g. linked("backups", "volume", volume_id) or
+        linked("ipsec_site_connections", "vpnservice", vpnservice_id). See links_of for the indexed links.
+        """
+        return self._query(
+            "SELECT r.data FROM resources r JOIN links l ON l.kind = r.kind AND l.id = r.id "
+            "WHERE r.kind = ? AND l.rel = ? AND l.target = ?", (kind, rel, target)
+        )
+
+
+    def servers_on_network(self, network: str) -> List[dict]:
+        """
+        Args:
+            network: [require] Network ID or name
+        Returns:
+            list: servers with an address on the network
+        """
+        names = {network}
+        named = self.get("networks", network)
+        if named is not None and named.get("name"):
+            names.add(named["name"])
+        servers: Dict[str, dict] = {}
+        for name in names:
+            for server in self.linked("servers", "network", name):
+                servers[server["id"]] = server
+        return list(servers.values())
+
+
+    def volumes_of_server(self, server_id: str) -> List[dict]:
+        return self.linked("volumes", "server", server_id)
+
+
+    def volumes_without_backup(self, within: timedelta = timedelta(hours=24)) -> List[dict]:
+        """
+        Returns:
+            list: volumes with no backup created in the last `within`
+        """
+        cutoff = (datetime.now(timezone.utc) - within).strftime("%Y-%m-%dT%H:%M:%S")
+        return self._query(
+            "SELECT v.data FROM resources v WHERE v.kind = 'volumes' AND NOT EXISTS ("
+            " SELECT 1 FROM links l JOIN resources b ON b.kind = l.kind AND b.id = l.id"
+            " WHERE l.kind = 'backups' AND l.rel = 'volume' AND l.target = v.id AND b.created_at >= ?)", (cutoff,)
+        )
+
+
+    def _query(self, sql: str, args) -> List[dict]:
+        with self._lock:
+            return [json.loads(row[0]) for row in self._conn.execute(sql, args)]
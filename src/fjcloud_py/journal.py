@@ -0,0 +1,402 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+HTTP journal: record every request/response of a transport to a gzip JSON Lines file and serve them back
+without network.
+
+    # 本番で記録
+    transport = Transport(journal=JournalWriter("traffic.jsonl.gz"))
+    ...
+    transport.journal.close()
+
+    # 手元で再生(as fast as possible)
+    transport = ReplayTransport("traffic.jsonl.gz", timing="fast")
+    client = AuthManager(credential, transport=transport)
+
+Entry (one JSON object per line):
+    t, elapsed: seconds since the journal was opened when the request started, seconds the response took
+    method, url (query included), request_headers, request_body
+    status, headers, body (text) or body_b64 (binary)
+    error: {type, kind (timeout | connection | other), message} instead of status/body when the request raised
+        (timeouts, connection errors); replay raises the same kind of exception
+
+A response requested with stream=True is not read ahead: it is recorded once the caller has read its body (or closed
+the response), with the bytes the caller read and `elapsed` up to that point. Bound the memory this takes with
+max_body.
+
+Secrets (X-Auth-Token, X-Subject-Token, passwords, pre-shared keys, ...) are replaced with "***" in headers and
+JSON bodies before they are written.
+"""
+
+from requests.exceptions import ConnectionError, RequestException, Timeout
+from requests.models import PreparedRequest
+from requests.structures import CaseInsensitiveDict
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from .transport import Transport
+import asyncio
+import base64
+import gzip
+import json
+import os
+import requests
+import threading
+import time
+
+try:
+    from aiohttp import ClientConnectionError as AioConnectionError
+except ImportError:  # aiohttp は async を使う場合のみ必要
+    AioConnectionError = ()
+
+
+REDACTED: str = "***"
+REDACT_HEADERS: Tuple[str, ...] = ("X-Auth-Token", "X-Subject-Token", "Authorization", "Cookie", "Set-Cookie")
+# JSON ボディ中で値を伏せるキー(大文字小文字を区別しない)
+REDACT_KEYS: Tuple[str, ...] = ("password", "adminPass", "psk", "private_key", "secret", "token_id")
+
+
+class JournalMiss(RequestException):
+    """
+    The replayed journal has no response for a request (reported as an error envelope by Utilities).
+    """
+
+
+def canonical_url(url: str, params=None) -> str:
+    """
+    Returns:
+        str: `url` with `params` merged into the query and the query sorted, as used to match requests
+    """
+    if params:
+        prepared = PreparedRequest()
+        prepared.prepare_url(url, params)
+        url = prepared.url
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, query, ""))
+
+
+def redact(value, keys: Iterable[str] = REDACT_KEYS):
+    """
+    Returns:
+        a copy of the JSON value with the values of `keys` replaced by "***"
+    """
+    keys = {key.lower() for key in keys}
+
+    def walk(item):
+        if isinstance(item, dict):
+            return {key: REDACTED if key.lower() in keys and item[key] is not None else walk(child)
+                    for key, child in item.items()}
+        if isinstance(item, list):
+            return [walk(child) for child in item]
+        return item
+
+    return walk(value)
+
+
+def redact_headers(headers, names: Iterable[str] = REDACT_HEADERS) -> Dict[str, str]:
+    names = {name.lower() for name in names}
+    return {name: REDACTED if name.lower() in names else value for name, value in (headers or {}).items()}
+
+
+def error_kind(error: BaseException) -> str:
+    """
+    Returns:
+        str: timeout | connection | other
+    """
+    if isinstance(error, (Timeout, asyncio.TimeoutError)):
+        return "timeout"
+    if isinstance(error, (ConnectionError, AioConnectionError)):
+        return "connection"
+    return "other"
+
+
+def _redact_body(content: Optional[bytes], keys: Iterable[str]) -> Optional[bytes]:
+    if not content:
+        return content
+    try:
+        decoded = json.loads(content)
+    except ValueError:
+        return content
+    redacted = redact(decoded, keys)
+    return content if redacted == decoded else json.dumps(redacted, separators=(",", ":")).encode()
+
+
+class JournalWriter:
+    """
+    Appends entries to a gzip JSON Lines file (thread safe). Pass it as Transport(journal=...) or
+    AsyncTransport(journal=...).
+
+    Args:
+        path: [require] Journal file (.jsonl.gz)
+        redact_headers: [optional] Header names whose values are replaced with "***"
+        redact_keys: [optional] JSON keys (request and response bodies) whose values are replaced with "***"
+        max_body: [optional] Bytes of a response body kept (longer bodies are truncated, None: all)
+    """
+    def __init__(self, path: str, redact_headers: Iterable[str] = REDACT_HEADERS,
+                 redact_keys: Iterable[str] = REDACT_KEYS, max_body: int = None):
+        self.path: str = os.path.expanduser(path)
+        self.redact_headers: Tuple[str, ...] = tuple(redact_headers)
+        self.redact_keys: Tuple[str, ...] = tuple(redact_keys)
+        self.max_body: Optional[int] = max_body
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._file = gzip.open(self.path, "at", encoding="utf-8")
+        self._opened: float = time.monotonic()
+        self._lock = threading.Lock()
+
+
+    def now(self) -> float:
+        """
+        Returns:
+            float: seconds since the journal was opened (pass it as `started` to record)
+        """
+        return time.monotonic() - self._opened
+
+
+    def record(self, method: str, url: str, params=None, request_headers=None, json_data=None, status: int = None,
+               headers=None, content: bytes = None, started: float = None, elapsed: float = None,
+               error: BaseException = None):
+        """
+        Args:
+            error: [optional] Exception raised instead of a response (status, headers and content are then None)
+        """
+        entry = {
+            "t": started,
+            "elapsed": elapsed,
+            "method": method.upper(),
+            "url": canonical_url(url, params),
+            "request_headers": redact_headers(request_headers, self.redact_headers),
+            "request_body": redact(json_data, self.redact_keys) if json_data is not None else None,
+            "status": status,
+            "headers": redact_headers(headers, self.redact_headers),
+        }
+        if error is not None:
+            entry["error"] = {"type": type(error).__name__, "kind": error_kind(error), "message": str(error)}
+        content = _redact_body(content, self.redact_keys)
+        if self.max_body is not None and content:
+            content = content[:self.max_body]
+        try:
+            entry["body"] = content.decode("utf-8") if content is not None else None
+        except UnicodeDecodeError:
+            entry["body_b64"] = base64.b64encode(content).decode("ascii")
+        line = json.dumps(entry, separators=(",", ":"))
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+    def record_stream(self, response: requests.Response, method: str, url: str, params=None, request_headers=None,
+                      json_data=None, started: float = None):
+        """
+        Record a stream=True response once its body has been read or the response closed, without reading ahead.
+        """
+        def finish(content: bytes):
+            self.record(method, url, params, request_headers, json_data, response.status_code, response.headers,
+                        content, started, self.now() - started)
+
+        response.raw = _RecordingStream(response.raw, finish, self.max_body)
+
+
+    def flush(self):
+        with self._lock:
+            self._file.flush()
+
+
+    def close(self):
+        with self._lock:
+            if not self._file.closed:
+                self._file.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _RecordingStream:
+    """
+    Wraps response.raw; keeps the chunks the caller reads (up to max_body bytes) and hands them to `finish` once,
+    at the end of the body or on close.
+    """
+    def __init__(self, raw, finish: Callable[[bytes], None], max_body: int = None):
+        self._raw = raw
+        self._finish: Optional[Callable[[bytes], None]] = finish
+        self._max_body: Optional[int] = max_body
+        self._chunks: List[bytes] = []
+        self._size: int = 0
+
+
+    def __getattr__(self, name: str):
+        return getattr(self._raw, name)
+
+
+    def _keep(self, chunk: bytes):
+        if self._max_body is None or self._size < self._max_body:
+            self._chunks.append(chunk)
+            self._size += len(chunk)
+
+
+    def _done(self):
+        if self._finish is not None:
+            finish, self._finish = self._finish, None
+            finish(b"".join(self._chunks))
+
+
+    def read(self, *args, **kwargs) -> bytes:
+        chunk = self._raw.read(*args, **kwargs)
+        if chunk:
+            self._keep(chunk)
+        else:
+            self._done()
+        return chunk
+
+
+    def stream(self, *args, **kwargs) -> Iterator[bytes]:
+        for chunk in self._raw.stream(*args, **kwargs):
+            self._keep(chunk)
+            yield chunk
+        self._done()
+
+
+    def close(self):
+        try:
+            self._raw.close()
+        finally:
+            self._done()
+
+
+def read_journal(path: str) -> Iterator[dict]:
+    """
+    Yields:
+        dict: entries in recorded order
+    """
+    with gzip.open(os.path.expanduser(path), "rt", encoding="utf-8") as file:
+        for line in file:
+            if line.strip():
+                yield json.loads(line)
+
+
+def entry_body(entry: dict) -> bytes:
+    if entry.get("body_b64") is not None:
+        return base64.b64decode(entry["body_b64"])
+    return (entry.get("body") or "").encode("utf-8")
+
+
+class Journal:
+    """
+    Responses of a journal indexed by (method, canonical URL). Identical requests get the recorded responses
+    in order; once they are used up the last one is repeated (repeat=True) or JournalMiss is raised.
+
+    Args:
+        entries: [require] Journal file path or entries
+        repeat: [optional] Reuse the last response of a request after its recorded ones are used up
+    """
+    def __init__(self, entries, repeat: bool = True):
+        if isinstance(entries, str):
+            entries = read_journal(entries)
+        self.repeat: bool = repeat
+        self._responses: Dict[Tuple[str, str], List[dict]] = {}
+        self._positions: Dict[Tuple[str, str], int] = {}
+        self._lock = threading.Lock()
+        for entry in entries:
+            self._responses.setdefault((entry["method"], entry["url"]), []).append(entry)
+
+
+    def __len__(self) -> int:
+        return sum(len(responses) for responses in self._responses.values())
+
+
+    def next(self, method: str, url: str, params=None) -> dict:
+        """
+        Returns:
+            dict: the entry answering the request
+        Raises:
+            JournalMiss: no (more) recorded response
+        """
+        key = (method.upper(), canonical_url(url, params))
+        with self._lock:
+            responses = self._responses.get(key)
+            if not responses:
+                raise JournalMiss("No recorded response for {} {}".format(*key))
+            position = self._positions.get(key, 0)
+            if position >= len(responses):
+                if not self.repeat:
+                    raise JournalMiss("Recorded responses for {} {} are used up".format(*key))
+                position = len(responses) - 1
+            self._positions[key] = position + 1
+        return responses[position]
+
+
+    def rewind(self):
+        with self._lock:
+            self._positions.clear()
+
+
+def replay_delay(entry: dict, timing: str, time_scale: float) -> float:
+    if timing == "fast" or not entry.get("elapsed"):
+        return 0.0
+    return entry["elapsed"] * time_scale
+
+
+def replay_error(entry: dict) -> Optional[RequestException]:
+    """
+    Returns:
+        RequestException: the recorded exception of an entry (same requests type when it has one), or None
+    """
+    error = entry.get("error")
+    if error is None:
+        return None
+    error_type = getattr(requests.exceptions, error.get("type") or "", None)
+    if not (isinstance(error_type, type) and issubclass(error_type, RequestException)):
+        error_type = {"timeout": Timeout, "connection": ConnectionError}.get(error.get("kind"), RequestException)
+    return error_type(error.get("message"))
+
+
+def build_response(entry: dict, method: str, url: str) -> requests.Response:
+    """
+    Returns:
+        requests.Response: the recorded response (body already read, so stream=True and iter_content work)
+    """
+    response = requests.Response()
+    response.status_code = entry["status"]
+    response.headers = CaseInsensitiveDict(entry.get("headers") or {})
+    response._content = entry_body(entry)
+    response._content_consumed = True
+    response.url = url
+    response.encoding = "utf-8"
+    response.request = requests.Request(method, url).prepare()
+    return response
+
+
+class ReplayTransport(Transport):
+    """
+    Transport answering from a journal without any network I/O; retry, rate limiting, caching, hooks and
+    tracing configured on it still apply.
+
+    Args:
+        journal: [require] Journal, journal file path or entries
+        timing: [optional] original (sleep for the recorded response time) | fast (answer immediately)
+        time_scale: [optional] Factor applied to the recorded response times with timing="original"
+        others: same as Transport
+    """
+    def __init__(self, journal, timing: str = "original", time_scale: float = 1.0, **kwargs):
+        super().__init__(**kwargs)
+        if timing not in ("original", "fast"):
+            raise ValueError("timing must be 'original' or 'fast'")
+        self.replay: Journal = journal if isinstance(journal, Journal) else Journal(journal)
+        self.timing: str = timing
+        self.time_scale: float = time_scale
+
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        entry = self.replay.next(method, url, kwargs.get("params"))
+        delay = replay_delay(entry, self.timing, self.time_scale)
+        if delay:
+            time.sleep(delay)
+        error = replay_error(entry)
+        if error is not None:
+            raise error
+        return build_response(entry, method, canonical_url(url, kwargs.get("params")))
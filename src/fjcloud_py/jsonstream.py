@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+JSON decoding helpers: a fast full-body decoder (orjson when installed) and an incremental parser that
+yields the elements of the top-level array of a list response without holding the whole body.
+"""
+
+from typing import Iterable, Iterator
+import codecs
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson は任意(pip install "fjcloud-py[fast]")
+    orjson = None
+
+
+CHUNK_SIZE: int = 64 * 1024
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_DECODER = json.JSONDecoder()
+
+
+def loads(content):
+    """
+    json.loads, or orjson.loads when orjson is installed.
+
+    Raises:
+        ValueError: not JSON
+    """
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+
+class _Reader:
+    """
+    Text buffer over a stream of byte chunks. Consumed text is dropped whenever more is read,
+    so only the current element (plus one chunk) is kept in memory.
+    """
+    def __init__(self, chunks: Iterable[bytes]):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self.buffer: str = ""
+        self.pos: int = 0
+        self.eof: bool = False
+
+
+    def fill(self, size: int = 1):
+        """
+        Read until at least `size` unconsumed characters are buffered (or the stream ends).
+        """
+        if self.pos:
+            self.buffer = self.buffer[self.pos:]
+            self.pos = 0
+        while not self.eof and len(self.buffer) < size:
+            try:
+                chunk = next(self._chunks)
+            except StopIteration:
+                self.buffer += self._decoder.decode(b"", final=True)
+                self.eof = True
+            else:
+                self.buffer += self._decoder.decode(chunk)
+
+
+    def peek(self) -> str:
+        """
+        Returns:
+            str: next non-whitespace character, "" at the end of the stream
+        """
+        while True:
+            self.pos = _WHITESPACE.match(self.buffer, self.pos).end()
+            if self.pos < len(self.buffer) or self.eof:
+                return self.buffer[self.pos:self.pos + 1]
+            self.fill()
+
+
+    def expect(self, char: str):
+        found = self.peek()
+        if found != char:
+            raise ValueError("Expected {!r} but found {!r}".format(char, found or "end of data"))
+        self.pos += 1
+
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = _DECODER.raw_decode(self.buffer, self.pos)
+                # バッファ末尾で終わった値(数値など)は続きがあるかもしれないので読み足してから確定する
+                if end < len(self.buffer) or self.eof:
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            # 要素が大きい場合に何度も decode し直さないようバッファを倍々で読み足す
+            self.fill(max(2 * (len(self.buffer) - self.pos), CHUNK_SIZE))
+
+
+def iter_array(chunks: Iterable[bytes], key: str, rest: dict = None) -> Iterator:
+    """
+    Yield the elements of the array `key` of a top-level JSON object read from byte chunks,
+    e.g. the servers of {"servers": [...], "servers_links": [...]}.
+
+    Args:
+        chunks: [require] Byte chunks (e.g. requests.Response.iter_content(CHUNK_SIZE))
+        key: [require] Member holding the array
+        rest: [optional] Receives the other members of the object (e.g. servers_links) once they are read
+    Yields:
+        element of the array
+    Raises:
+        ValueError: malformed JSON
+    """
+    reader = _Reader(chunks)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            reader.pos += 1
+            if reader.peek() == "]":
+                reader.pos += 1
+            else:
+                while True:
+                    yield reader.value()
+                    separator = reader.peek()
+                    reader.pos += 1
+                    if separator == "]":
+                        break
+                    if separator != ",":
+                        raise ValueError("Expected ',' or ']' but found {!r}".format(separator or "end of data"))
+        else:
+            value = reader.value()
+            if rest is not None:
+                rest[name] = value
+        separator = reader.peek()
+        reader.pos += 1
+        if separator == "}":
+            return
+        if separator != ",":
+            raise ValueError("Expected ',' or '}}' but found {!r}".format(separator or "end of data"))
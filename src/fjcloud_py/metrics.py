@@ -0,0 +1,284 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Request instrumentation.
+
+Every request sent by Utilities/AsyncUtilities through a transport with hooks produces a RequestEvent
+that is passed to each hook (any callable). MetricsCollector is a built-in hook that keeps latency
+histograms per endpoint:
+
+    metrics = MetricsCollector()
+    transport = Transport(hooks=[metrics])
+    ...
+    print(metrics.prometheus())
+"""
+
+from .ratelimit import service_of
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
+import bisect
+import json
+import logging
+import re
+import threading
+
+
+logger = logging.getLogger(__name__)
+
+
+_ID = re.compile(r"^(?:[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}|[0-9a-fA-F]{32}|\d+)$")
+_VERSION = re.compile(r"^v\d+(?:\.\d+)?$")
+
+
+@dataclass
+class RequestEvent:
+    """
+    Attributes:
+        method (str): HTTP method
+        url (str): Request URL
+        template (str): URL path with IDs replaced, e.g. /v3/{project_id}/backups/{backup_id}
+        service (str): compute | blockstorage | networking | nfv | identity (or the host)
+        status (str): success | error
+        status_code (Optional[int]): HTTP status (None when no response was received)
+        latency (float): Seconds, retries and waits included (0 for a cache hit)
+        bytes_in (Optional[int]): Response body size
+        bytes_out (int): Request body size
+        retries (int): Retries done
+        cache (Optional[str]): hit | revalidated | miss, None when the response cache does not apply
+    """
+    method: str
+    url: str
+    template: str
+    service: str
+    status: str
+    status_code: Optional[int]
+    latency: float
+    bytes_in: Optional[int]
+    bytes_out: int
+    retries: int
+    cache: Optional[str] = None
+
+
+@lru_cache(maxsize=4096)
+def url_template(url: str) -> str:
+    """
+    /v3/0123...cdef/backups/4f1c... -> /v3/{project_id}/backups/{backup_id}
+
+    Returns:
+        str: path of `url` with the IDs replaced by placeholders named after the preceding collection
+    """
+    segments = urlparse(url).path.split("/")
+    for index, segment in enumerate(segments):
+        if index == 0 or not _ID.match(segment):
+            continue
+        previous = segments[index - 1]
+        if _VERSION.match(previous):
+            segments[index] = "{project_id}"
+        elif previous:
+            name = previous.replace("-", "_")
+            name = name[:-3] + "y" if name.endswith("ies") else name[:-1] if name.endswith("s") else name
+            segments[index] = "{%s_id}" % name
+        else:
+            segments[index] = "{id}"
+    return "/".join(segments) or "/"
+
+
+def build_event(method: str, url: str, result, json_data=None, cache: str = None) -> RequestEvent:
+    """
+    Args:
+        result: [require] Result of the request
+    """
+    content = result.content
+    bytes_in = len(content) if content is not None else None
+    if bytes_in is None and result.headers is not None and result.headers.get("Content-Length"):
+        bytes_in = int(result.headers["Content-Length"])
+    bytes_out = len(json.dumps(json_data).encode()) if json_data is not None else 0
+    return RequestEvent(
+        method=method.upper(),
+        url=url,
+        template=url_template(url),
+        service=service_of(url),
+        status=result.status,
+        status_code=result.status_code,
+        latency=result.elapsed or 0.0,
+        bytes_in=bytes_in,
+        bytes_out=bytes_out,
+        retries=result.retries,
+        cache=cache
+    )
+
+
+def emit(hooks: Iterable[Callable[[RequestEvent], None]], event: RequestEvent):
+    for hook in hooks:
+        try:
+            hook(event)
+        except Exception as err:
+            logger.warning('Instrumentation hook failed: %s', err, exc_info=True)
+
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self, size: int):
+        self.counts: List[int] = [0] * (size + 1)
+        self.sum: float = 0.0
+        self.count: int = 0
+
+
+class _Endpoint:
+    __slots__ = ("latency", "statuses", "bytes_in", "bytes_out", "retries", "cache")
+
+    def __init__(self, size: int):
+        self.latency = _Histogram(size)
+        self.statuses: Dict[str, int] = {}
+        self.bytes_in: int = 0
+        self.bytes_out: int = 0
+        self.retries: int = 0
+        self.cache: Dict[str, int] = {}
+
+
+class MetricsCollector:
+    """
+    In-process hook keeping, per (method, service, URL template): a latency histogram, request counts by
+    HTTP status, bytes in/out, retries and cache results. Cache hits send no request and are only counted in
+    the cache results, so they do not pull the latency percentiles down.
+
+    Args:
+        buckets: [optional] Upper bounds of the latency buckets in seconds
+    """
+    def __init__(self, buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.buckets: Tuple[float, ...] = tuple(sorted(buckets))
+        self._endpoints: Dict[Tuple[str, str, str], _Endpoint] = {}
+        self._lock = threading.Lock()
+
+
+    def __call__(self, event: RequestEvent):
+        key = (event.method, event.service, event.template)
+        status = str(event.status_code) if event.status_code is not None else event.status
+        with self._lock:
+            endpoint = self._endpoints.get(key)
+            if endpoint is None:
+                endpoint = self._endpoints[key] = _Endpoint(len(self.buckets))
+            if event.cache == "hit":
+                endpoint.cache["hit"] = endpoint.cache.get("hit", 0) + 1
+                return
+            histogram = endpoint.latency
+            histogram.counts[bisect.bisect_left(self.buckets, event.latency)] += 1
+            histogram.sum += event.latency
+            histogram.count += 1
+            endpoint.statuses[status] = endpoint.statuses.get(status, 0) + 1
+            endpoint.bytes_in += event.bytes_in or 0
+            endpoint.bytes_out += event.bytes_out
+            endpoint.retries += event.retries
+            if event.cache is not None:
+                endpoint.cache[event.cache] = endpoint.cache.get(event.cache, 0) + 1
+
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+
+    def quantile(self, counts: List[int], q: float) -> Optional[float]:
+        """
+        Returns:
+            float: upper bound of the bucket holding the q-quantile (None when empty, inf above the last bucket)
+        """
+        total = sum(counts)
+        if not total:
+            return None
+        rank = q * total
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return self.buckets[index] if index < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+    def snapshot(self) -> List[dict]:
+        """
+        Returns:
+            list: one dict per endpoint (method, service, template, count, sum, p50/p90/p99, statuses, ...)
+        """
+        with self._lock:
+            items = [(key, endpoint.latency.counts[:], endpoint.latency.sum, endpoint.latency.count,
+                      dict(endpoint.statuses), endpoint.bytes_in, endpoint.bytes_out, endpoint.retries,
+                      dict(endpoint.cache)) for key, endpoint in self._endpoints.items()]
+        return [{
+            "method": method,
+            "service": service,
+            "template": template,
+            "count": count,
+            "latency_sum": latency_sum,
+            "latency_mean": latency_sum / count if count else None,
+            "p50": self.quantile(counts, 0.5),
+            "p90": self.quantile(counts, 0.9),
+            "p99": self.quantile(counts, 0.99),
+            "buckets": dict(zip([str(bound) for bound in self.buckets] + ["+Inf"], counts)),
+            "statuses": statuses,
+            "bytes_in": bytes_in,
+            "bytes_out": bytes_out,
+            "retries": retries,
+            "cache": cache,
+        } for (method, service, template), counts, latency_sum, count, statuses, bytes_in, bytes_out, retries, cache
+            in sorted(items)]
+
+
+    def to_json(self, **kwargs) -> str:
+        return json.dumps(self.snapshot(), **kwargs)
+
+
+    def prometheus(self, prefix: str = "fjcloud") -> str:
+        """
+        Returns:
+            str: Prometheus text exposition format
+        """
+        lines = [
+            "# HELP {}_request_duration_seconds Request latency including retries.".format(prefix),
+            "# TYPE {}_request_duration_seconds histogram".format(prefix),
+        ]
+        snapshot = self.snapshot()
+        for endpoint in snapshot:
+            labels = _labels(endpoint)
+            cumulative = 0
+            for bound, count in endpoint["buckets"].items():
+                cumulative += count
+                lines.append('{}_request_duration_seconds_bucket{{{},le="{}"}} {}'.format(prefix, labels, bound, cumulative))
+            lines.append("{}_request_duration_seconds_sum{{{}}} {}".format(prefix, labels, endpoint["latency_sum"]))
+            lines.append("{}_request_duration_seconds_count{{{}}} {}".format(prefix, labels, endpoint["count"]))
+        for name, kind, help_text in (("requests_total", "counter", "Requests by HTTP status."),
+                                      ("response_bytes_total", "counter", "Response body bytes."),
+                                      ("request_bytes_total", "counter", "Request body bytes."),
+                                      ("retries_total", "counter", "Retries."),
+                                      ("cache_total", "counter", "Response cache results.")):
+            lines.append("# HELP {}_{} {}".format(prefix, name, help_text))
+            lines.append("# TYPE {}_{} {}".format(prefix, name, kind))
+            for endpoint in snapshot:
+                labels = _labels(endpoint)
+                if name == "requests_total":
+                    for status, count in sorted(endpoint["statuses"].items()):
+                        lines.append('{}_{}{{{},status="{}"}} {}'.format(prefix, name, labels, status, count))
+                elif name == "cache_total":
+                    for result, count in sorted(endpoint["cache"].items()):
+                        lines.append('{}_{}{{{},result="{}"}} {}'.format(prefix, name, labels, result, count))
+                else:
+                    value = {"response_bytes_total": endpoint["bytes_in"], "request_bytes_total": endpoint["bytes_out"],
+                             "retries_total": endpoint["retries"]}[name]
+                    lines.append("{}_{}{{{}}} {}".format(prefix, name, labels, value))
+        return "\n".join(lines) + "\n"
+
+
+def _labels(endpoint: dict) -> str:
+    return 'method="{}",service="{}",endpoint="{}"'.format(
+        *(_escape(endpoint[key]) for key in ("method", "service", "template"))
+    )
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
@@ -2,34 +2,107 @@
 # -*- coding: utf-8 -*-
 
 from .auth import AuthManager
-from .utils import Utilities
+from .transport import Transport
+from .utils import Utilities, build_query
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 
 class NetworkingAPI:
+    utilities = Utilities
+
     def __init__(self, client: AuthManager):
         self.client: AuthManager = client
-        self.token = client.token
         self.region = client.region
-        self.base_url: str = "https://networking.{region}.cloud.global.fujitsu.com".format(region=self.region)
-        self.headers: dict = {"Accept": "application/json", "X-Auth-Token": self.token}
+        self.transport: Transport = client.transport
+        self.base_url: str = client.endpoint_for(
+            "networking", "https://networking.{region}.cloud.global.fujitsu.com"
+        )
+
+
+    @property
+    def token(self) -> str:
+        return self.client.token
 
 
-    def list_networks(self):
+    @property
+    def headers(self) -> dict:
+        return {"Accept": "application/json", "X-Auth-Token": self.client.token}
+
+
+    def list_networks(self, status: str = None, name: str = None, fields: List[str] = None, sort_key: str = None,
+                      sort_dir: str = None, limit: int = None, marker: str = None, filters: dict = None):
+        """
+        Args:
+            status: [optional] Network status (ACTIVE, DOWN, ...)
+            name: [optional] Network name
+            fields: [optional] Attributes to return (e.g. ["id", "name", "status"])
+            sort_key: [optional] Sort key (e.g. name)
+            sort_dir: [optional] asc | desc
+            limit: [optional] Max number of networks
+            marker: [optional] ID of the last network of the previous page
+            filters: [optional] Other query parameters (e.g. {"shared": True})
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
         uri = "/v2.0/networks"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        params = build_query(filters, status=status, name=name, fields=fields, sort_key=sort_key, sort_dir=sort_dir,
+                             limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
 
+    def iter_networks(self, limit: int = 100, prefetch: bool = False, stream: bool = False,
+                      status: str = None, name: str = None,
+                      fields: List[str] = None, sort_key: str = None, sort_dir: str = None,
+                      filters: dict = None) -> Iterator[dict]:
+        """
+        Args:
+            limit: [optional] Page size
+            prefetch: [optional] Fetch the next page in the background
+            stream: [optional] Decode each page incrementally instead of holding the whole body (excludes prefetch)
+            others: same as list_networks (include "id" in fields when paging by marker)
+        Yields:
+            dict: network
+        """
+        uri = "/v2.0/networks"
+        endpoint = self.base_url + uri
+        params = build_query(filters, status=status, name=name, fields=fields, sort_key=sort_key, sort_dir=sort_dir)
+
+        return self.utilities.paginate(endpoint, "networks", headers=self.headers, params=params, limit=limit,
+                                       prefetch=prefetch, stream=stream, transport=self.transport,
+                                       auth=self.client)
+
+
     def show_network_details(self, network_id: str):
         uri = "/v2.0/networks/{network_id}".format(network_id=network_id)
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
 
+    def show_network_details_many(self, network_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        show_network_details for many IDs concurrently over the shared connection pool.
+
+        Args:
+            network_ids: [require] Network IDs
+            max_workers: [optional] Max requests in flight (keep <= Transport.pool_maxsize)
+        Returns:
+            dict: {network id: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}}
+        """
+        return self.utilities.gather(self.show_network_details, network_ids, max_workers=max_workers)
+
+
+    def iter_network_details_many(self, network_ids: Iterable[str], max_workers: int = 8) -> Iterator[Tuple[str, dict]]:
+        """
+        Same as show_network_details_many, yielding (network id, envelope) as each request completes.
+        """
+        return self.utilities.fan_out(self.show_network_details, network_ids, max_workers=max_workers)
+
+
     def create_network(self, request_parameters: dict = None):
         uri = "/v2.0/networks"
         endpoint = self.base_url + uri
@@ -38,7 +111,7 @@ class NetworkingAPI:
         else: # 引数にパラメータが与えられたときにチェックする
             request_data = request_parameters
 
-        response = Utilities.post(endpoint, headers=self.headers, json_data=request_data)
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_data, transport=self.transport, auth=self.client)
 
         return response
 
@@ -51,7 +124,7 @@ class NetworkingAPI:
         else:
             request_data = request_parameters
 
-        response = Utilities.put(endpoint, headers=self.headers, json_data=request_data)
+        response = self.utilities.put(endpoint, headers=self.headers, json_data=request_data, transport=self.transport, auth=self.client)
 
         return response
 
@@ -59,17 +132,209 @@ class NetworkingAPI:
     def delete_network(self, network_id: str):
         uri = "/v2.0/networks/{network_id}".format(network_id=network_id)
         endpoint = self.base_url + uri
-        response = Utilities.delete(endpoint, headers=self.headers)
+        response = self.utilities.delete(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
 
-    '''def bulc_create_networks(self, request_parameters: list):
-        uri = "/v2.0/networks"
+    def bulk_create_networks(self, networks: Iterable[dict], chunk_size: int = 100, rollback: bool = True,
+                             max_workers: int = 8) -> dict:
+        """
+        Create many networks with one bulk POST per chunk instead of one POST per network.
+
+        Args:
+            networks: [require] Network attributes (e.g. [{"name": "net-1"}, {"name": "net-2"}])
+            chunk_size: [optional] Networks per POST (each POST is created all-or-nothing by Neutron)
+            rollback: [optional] Delete the networks already created when a POST fails
+            max_workers: [optional] Concurrency cap of the rollback deletes
+        Returns:
+            dict: {'status': 'success', 'data': {'networks': [...]}, ...} or an error envelope whose data lists the
+                  networks still created, the items not created and the rollback result (see Utilities.bulk_create)
+        """
+        return self.utilities.bulk_create(self._bulk_post_networks, self.delete_network, networks, "networks",
+                                          chunk_size=chunk_size, rollback=rollback, max_workers=max_workers)
+
+
+    def bulk_delete_networks(self, network_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        delete_network for many IDs concurrently (delete their ports and subnets first).
+
+        Returns:
+            dict: {network id: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}}
+        """
+        return self.utilities.gather(self.delete_network, network_ids, max_workers=max_workers)
+
+
+    def _bulk_post_networks(self, networks: List[dict]):
+        endpoint = self.base_url + "/v2.0/networks"
+        return self.utilities.post(endpoint, headers=self.headers, json_data={"networks": networks},
+                                   transport=self.transport, auth=self.client)
+
+
+    def list_subnets(self, network_id: str = None, name: str = None, cidr: str = None, fields: List[str] = None,
+                     sort_key: str = None, sort_dir: str = None, limit: int = None, marker: str = None,
+                     filters: dict = None):
+        """
+        Args:
+            network_id: [optional] ID of the network the subnets belong to
+            name: [optional] Subnet name
+            cidr: [optional] CIDR (e.g. 192.168.0.0/24)
+            others: same as list_networks
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
+        uri = "/v2.0/subnets"
+        endpoint = self.base_url + uri
+        params = build_query(filters, network_id=network_id, name=name, cidr=cidr, fields=fields, sort_key=sort_key,
+                             sort_dir=sort_dir, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def show_subnet_details(self, subnet_id: str):
+        uri = "/v2.0/subnets/{subnet_id}".format(subnet_id=subnet_id)
+        endpoint = self.base_url + uri
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def create_subnet(self, request_parameters: dict):
+        """
+        Args:
+            request_parameters: [require] e.g. {"subnet": {"network_id": ..., "cidr": "192.168.0.0/24", "ip_version": 4}}
+        """
+        uri = "/v2.0/subnets"
+        endpoint = self.base_url + uri
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_parameters, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def update_subnet(self, subnet_id: str, request_parameters: dict = None):
+        uri = "/v2.0/subnets/{subnet_id}".format(subnet_id=subnet_id)
+        endpoint = self.base_url + uri
+        if request_parameters is None:
+            request_data = {"subnet": {}}
+        else:
+            request_data = request_parameters
+
+        response = self.utilities.put(endpoint, headers=self.headers, json_data=request_data, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def delete_subnet(self, subnet_id: str):
+        uri = "/v2.0/subnets/{subnet_id}".format(subnet_id=subnet_id)
         endpoint = self.base_url + uri
-        parameters_list = [params for params in request_parameters]
-        request_data = {"networks": parameters_list}
-        response = Utilities.post(endpoint, headers=self.headers, json_data=request_data)
+        response = self.utilities.delete(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def bulk_create_subnets(self, subnets: Iterable[dict], chunk_size: int = 100, rollback: bool = True,
+                            max_workers: int = 8) -> dict:
+        """
+        Same as bulk_create_networks for subnets (e.g. [{"network_id": ..., "cidr": ..., "ip_version": 4}]).
+        """
+        return self.utilities.bulk_create(self._bulk_post_subnets, self.delete_subnet, subnets, "subnets",
+                                          chunk_size=chunk_size, rollback=rollback, max_workers=max_workers)
+
+
+    def bulk_delete_subnets(self, subnet_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        delete_subnet for many IDs concurrently (delete the ports using them first).
+        """
+        return self.utilities.gather(self.delete_subnet, subnet_ids, max_workers=max_workers)
+
+
+    def _bulk_post_subnets(self, subnets: List[dict]):
+        endpoint = self.base_url + "/v2.0/subnets"
+        return self.utilities.post(endpoint, headers=self.headers, json_data={"subnets": subnets},
+                                   transport=self.transport, auth=self.client)
+
+
+    def list_ports(self, network_id: str = None, device_id: str = None, name: str = None, status: str = None,
+                   fields: List[str] = None, sort_key: str = None, sort_dir: str = None, limit: int = None,
+                   marker: str = None, filters: dict = None):
+        """
+        Args:
+            network_id: [optional] ID of the network the ports belong to
+            device_id: [optional] ID of the device (server, router, ...) using the ports
+            name: [optional] Port name
+            status: [optional] Port status (ACTIVE, DOWN, ...)
+            others: same as list_networks
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
+        uri = "/v2.0/ports"
+        endpoint = self.base_url + uri
+        params = build_query(filters, network_id=network_id, device_id=device_id, name=name, status=status,
+                             fields=fields, sort_key=sort_key, sort_dir=sort_dir, limit=limit, marker=marker)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def show_port_details(self, port_id: str):
+        uri = "/v2.0/ports/{port_id}".format(port_id=port_id)
+        endpoint = self.base_url + uri
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def create_port(self, request_parameters: dict):
+        """
+        Args:
+            request_parameters: [require] e.g. {"port": {"network_id": ..., "name": "port-1"}}
+        """
+        uri = "/v2.0/ports"
+        endpoint = self.base_url + uri
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_parameters, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def update_port(self, port_id: str, request_parameters: dict = None):
+        uri = "/v2.0/ports/{port_id}".format(port_id=port_id)
+        endpoint = self.base_url + uri
+        if request_parameters is None:
+            request_data = {"port": {}}
+        else:
+            request_data = request_parameters
+
+        response = self.utilities.put(endpoint, headers=self.headers, json_data=request_data, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def delete_port(self, port_id: str):
+        uri = "/v2.0/ports/{port_id}".format(port_id=port_id)
+        endpoint = self.base_url + uri
+        response = self.utilities.delete(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
+
+        return response
+
+
+    def bulk_create_ports(self, ports: Iterable[dict], chunk_size: int = 100, rollback: bool = True,
+                          max_workers: int = 8) -> dict:
+        """
+        Same as bulk_create_networks for ports (e.g. [{"network_id": ..., "name": "port-1"}]).
+        """
+        return self.utilities.bulk_create(self._bulk_post_ports, self.delete_port, ports, "ports",
+                                          chunk_size=chunk_size, rollback=rollback, max_workers=max_workers)
+
+
+    def bulk_delete_ports(self, port_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        delete_port for many IDs concurrently.
+        """
+        return self.utilities.gather(self.delete_port, port_ids, max_workers=max_workers)
+
 
-        return response.json()
-    '''
+    def _bulk_post_ports(self, ports: List[dict]):
+        endpoint = self.base_url + "/v2.0/ports"
+        return self.utilities.post(endpoint, headers=self.headers, json_data={"ports": ports},
+                                   transport=self.transport, auth=self.client)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間共有なし
+    fcntl = None
+
+
+SERVICES: Tuple[str, ...] = ("identity", "compute", "blockstorage", "networking", "nfv")
+
+
+def service_of(url: str) -> str:
+    """
+    Service name of a request URL: the first label of the host (compute.{region}.cloud.global.fujitsu.com),
+    or the first path segment for a stand-in server (http://127.0.0.1:8080/compute/...).
+
+    Returns:
+        str: service name, or the host when it cannot be told
+    """
+    parsed = urlparse(url)
+    host = parsed.hostname or ""
+    label = host.split(".")[0]
+    if label in SERVICES:
+        return label
+    segment = parsed.path.lstrip("/").split("/")[0]
+    if segment in SERVICES:
+        return segment
+    return host
+
+
+@dataclass
+class RateLimit:
+    """
+    Attributes:
+        rate (float): Requests per second refilled into the bucket.
+        burst (Optional[int]): Bucket capacity (default: max(1, rate)).
+    """
+    rate: float
+    burst: Optional[int] = None
+
+    @property
+    def capacity(self) -> float:
+        return float(self.burst if self.burst is not None else max(1.0, self.rate))
+
+
+class MemoryBucketStore:
+    """
+    Bucket state shared by the threads (and event loops) of one process.
+    """
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+
+    @contextmanager
+    def transaction(self):
+        with self._lock:
+            yield self._buckets
+
+
+    @staticmethod
+    def now() -> float:
+        return time.monotonic()
+
+
+class FileBucketStore:
+    """
+    Bucket state shared between processes through a JSON file guarded by flock,
+    e.g. FileBucketStore("/dev/shm/fjcloud-ratelimit.json").
+
+    Args:
+        path: [require] State file
+    """
+    def __init__(self, path: str):
+        self.path: str = os.path.expanduser(path)
+        self._lock = threading.Lock()
+
+
+    @contextmanager
+    def transaction(self):
+        with self._lock, open(self.path, "a+") as f:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    buckets = {k: tuple(v) for k, v in json.loads(f.read() or "{}").items()}
+                except ValueError:
+                    buckets = {}
+                yield buckets
+                f.seek(0)
+                f.truncate()
+                f.write(json.dumps(buckets))
+                f.flush()
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+    @staticmethod
+    def now() -> float:
+        # プロセス間で共有するため単調時計ではなく壁時計を使う
+        return time.time()
+
+
+class RateLimiter:
+    """
+    Token bucket rate limiter keyed by (service, HTTP method), applied by Utilities and AsyncUtilities
+    before every attempt sent through a Transport/AsyncTransport that has it.
+
+    The most specific rule wins: (service, method), (service, "*"), ("*", method), ("*", "*").
+    Services are identity, compute, blockstorage, networking and nfv. A rule only chooses the limit: every
+    (host, service, method) gets its own bucket, so ("*", "*") limits each endpoint and method separately rather
+    than all requests together, and each region (host) is limited on its own.
+
+        limiter = RateLimiter({
+            ("nfv", "*"): RateLimit(rate=2, burst=5),
+            ("compute", "GET"): RateLimit(rate=20),
+            ("*", "POST"): RateLimit(rate=5),
+        })
+        transport = Transport(rate_limiter=limiter)
+
+    Args:
+        rules: [optional] {(service, method): RateLimit}
+        store: [optional] MemoryBucketStore (default) or FileBucketStore to share the buckets between processes
+    """
+    def __init__(self, rules: Dict[Tuple[str, str], RateLimit] = None, store=None):
+        self.rules: Dict[Tuple[str, str], RateLimit] = dict(rules or {})
+        self.store = store or MemoryBucketStore()
+
+
+    def rule_for(self, method: str, url: str):
+        """
+        Returns:
+            tuple: (bucket key "host|service|method", RateLimit) or (None, None) when no rule applies
+        """
+        service = service_of(url)
+        method = method.upper()
+        for key in ((service, method), (service, "*"), ("*", method), ("*", "*")):
+            if key in self.rules:
+                # ワイルドカードのルールでもバケツは宛先ごとに分ける(service_of はホスト・リージョンを見ない)
+                return "{}|{}|{}".format(urlparse(url).netloc, service, method), self.rules[key]
+        return None, None
+
+
+    def reserve(self, method: str, url: str) -> float:
+        """
+        Take one token, going into debt when the bucket is empty.
+
+        Returns:
+            float: seconds the caller must wait before sending
+        """
+        key, limit = self.rule_for(method, url)
+        if limit is None:
+            return 0.0
+        with self.store.transaction() as buckets:
+            now = self.store.now()
+            tokens, updated_at = buckets.get(key, (limit.capacity, now))
+            tokens = min(limit.capacity, tokens + (now - updated_at) * limit.rate) - 1
+            buckets[key] = (tokens, now)
+        return 0.0 if tokens >= 0 else -tokens / limit.rate
+
+
+    def acquire(self, method: str, url: str, timeout: float = None) -> bool:
+        """
+        Block until a request may be sent.
+
+        Args:
+            timeout: [optional] Give up (without sleeping) when the wait would be longer
+        Returns:
+            bool: False when the wait exceeds timeout
+        """
+        wait = self.reserve(method, url)
+        if timeout is not None and wait > timeout:
+            self.refund(method, url)
+            return False
+        if wait > 0:
+            time.sleep(wait)
+        return True
+
+
+    def refund(self, method: str, url: str):
+        """
+        Give back a token taken by reserve() for a request that was not sent.
+        """
+        key, limit = self.rule_for(method, url)
+        if limit is None:
+            return
+        with self.store.transaction() as buckets:
+            if key in buckets:
+                tokens, updated_at = buckets[key]
+                buckets[key] = (min(limit.capacity, tokens + 1), updated_at)
@@ -0,0 +1,153 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from collections.abc import MutableMapping
+from typing import Optional
+from .jsonstream import loads
+import copy
+
+
+_KEYS = ("status", "data", "message", "retries")
+
+
+def decode_body(content: bytes):
+    """
+    Returns:
+        JSON decoded body, the text when it is not JSON, or None when empty
+    """
+    if not content:
+        return None
+    try:
+        return loads(content)
+    except ValueError:
+        return content.decode("utf-8", "replace")
+
+
+class Result(MutableMapping):
+    """
+    Envelope returned by Utilities/AsyncUtilities.
+
+    Behaves like the dict {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None],
+    'retries': int} (response['status'], response.get('data'), dict(response), ==), but keeps the raw body and
+    decodes it only when 'data' (success) or 'message' (error) is first read, so status-only checks such as
+    deletes and existence probes never decode anything. Use to_dict() where a real dict is required
+    (e.g. json.dumps).
+
+    Attributes:
+        status (str): success | error
+        status_code (Optional[int]): HTTP status (None when no response was received)
+        headers (Optional[Mapping]): Response headers
+        elapsed (Optional[float]): Seconds the call took, retries and waits included
+        retries (int): Retries done
+        content (Optional[bytes]): Raw body
+    """
+    __slots__ = ("status", "status_code", "headers", "elapsed", "retries", "content", "read_body",
+                 "_data", "_data_ready", "_message", "_message_ready", "_extra")
+
+    def __init__(self, status: str, content: bytes = None, status_code: int = None, headers=None,
+                 elapsed: float = None, retries: int = 0, read_body: bool = True, **preset):
+        """
+        Args:
+            preset: data= / message= given directly instead of decoded from content
+        """
+        self.status: str = status
+        self.content: Optional[bytes] = content
+        self.status_code: Optional[int] = status_code
+        self.headers = headers
+        self.elapsed: Optional[float] = elapsed
+        self.retries: int = retries
+        self.read_body: bool = read_body
+        self._data = preset.get("data")
+        self._data_ready: bool = "data" in preset
+        self._message = preset.get("message")
+        self._message_ready: bool = "message" in preset
+        self._extra: dict = {}
+
+
+    @property
+    def ok(self) -> bool:
+        return self.status == 'success'
+
+
+    @property
+    def data(self):
+        if not self._data_ready:
+            self._data = decode_body(self.content) if self.ok and self.read_body else None
+            self._data_ready = True
+        return self._data
+
+
+    @data.setter
+    def data(self, value):
+        self._data = value
+        self._data_ready = True
+
+
+    @property
+    def message(self):
+        if not self._message_ready:
+            self._message = None if self.ok else decode_body(self.content)
+            self._message_ready = True
+        return self._message
+
+
+    @message.setter
+    def message(self, value):
+        self._message = value
+        self._message_ready = True
+
+
+    def __getitem__(self, key):
+        if key in _KEYS:
+            return getattr(self, key)
+        return self._extra[key]
+
+
+    def __setitem__(self, key, value):
+        if key in _KEYS:
+            setattr(self, key, value)
+        else:
+            self._extra[key] = value
+
+
+    def __delitem__(self, key):
+        if key in _KEYS:
+            raise KeyError("{} cannot be removed from a Result".format(key))
+        del self._extra[key]
+
+
+    def __iter__(self):
+        yield from _KEYS
+        yield from self._extra
+
+
+    def __len__(self) -> int:
+        return len(_KEYS) + len(self._extra)
+
+
+    def __contains__(self, key) -> bool:
+        return key in _KEYS or key in self._extra
+
+
+    def to_dict(self) -> dict:
+        return dict(self.items())
+
+
+    def copy(self) -> dict:
+        return self.to_dict()
+
+
+    def __deepcopy__(self, memo):
+        # 生のボディとヘッダーは読み取り専用なので共有し、デコード済みの値だけ複製する
+        clone = Result(self.status, content=self.content, status_code=self.status_code, headers=self.headers,
+                       elapsed=self.elapsed, retries=self.retries, read_body=self.read_body)
+        if self._data_ready:
+            clone.data = copy.deepcopy(self._data, memo)
+        if self._message_ready:
+            clone.message = copy.deepcopy(self._message, memo)
+        clone._extra = copy.deepcopy(self._extra, memo)
+        return clone
+
+
+    def __repr__(self):
+        return repr(self.to_dict())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from typing import FrozenSet, Optional
+import random
+import time
+
+
+@dataclass
+class RetryPolicy:
+    """
+    Retry policy applied by Utilities (and AsyncUtilities) to every request sent through a Transport.
+
+    Attributes:
+        max_retries (int): Retries after the first attempt. 0 disables retrying.
+        backoff_base (float): Backoff of the first retry in seconds (doubled per retry).
+        backoff_max (float): Upper bound of a single backoff in seconds.
+        retry_statuses (FrozenSet[int]): HTTP statuses that are retried.
+        retry_methods (FrozenSet[str]): Methods that are retried. POST is not idempotent and is excluded by default.
+        retry_on_connection_error (bool): Retry connection errors/resets.
+        retry_on_timeout (bool): Retry timeouts.
+        respect_retry_after (bool): Wait for the Retry-After header of 429/503 (capped at backoff_max) instead of
+            the backoff.
+        deadline (Optional[float]): Total seconds per call including retries and waits (the timeout of an attempt
+            is cut to the time left). None: no limit.
+    """
+    max_retries: int = 3
+    backoff_base: float = 0.5
+    backoff_max: float = 30.0
+    retry_statuses: FrozenSet[int] = frozenset({429, 502, 503, 504})
+    retry_methods: FrozenSet[str] = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+    retry_on_connection_error: bool = True
+    retry_on_timeout: bool = True
+    respect_retry_after: bool = True
+    # リトライ込みでも 1 回の呼び出しがリトライなしの GET のタイムアウト(120 秒)を超えないようにする
+    deadline: Optional[float] = 120.0
+
+
+    def allows(self, method: str, retries: int) -> bool:
+        return retries < self.max_retries and method.upper() in self.retry_methods
+
+
+    def backoff(self, retries: int) -> float:
+        """
+        Capped exponential backoff with full jitter.
+
+        Args:
+            retries: number of retries already done
+        Returns:
+            float: seconds to wait
+        """
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** retries)))
+
+
+    def delay(self, retries: int, headers: dict = None) -> float:
+        """
+        Returns:
+            float: seconds to wait before the next attempt (Retry-After if present and respected), at most
+                   backoff_max. Utilities gives up instead of waiting past the deadline.
+        """
+        if self.respect_retry_after and headers:
+            retry_after = parse_retry_after(headers.get("Retry-After"))
+            if retry_after is not None:
+                # サーバが大きな Retry-After を返しても backoff_max 以上は待たない
+                return min(retry_after, self.backoff_max)
+        return self.backoff(retries)
+
+
+    def start(self) -> Optional[float]:
+        """
+        Returns:
+            float: absolute deadline (time.monotonic) of a call starting now, or None
+        """
+        return time.monotonic() + self.deadline if self.deadline is not None else None
+
+
+NO_RETRY = RetryPolicy(max_retries=0)
+
+
+def parse_retry_after(value: str) -> Optional[float]:
+    """
+    Args:
+        value: Retry-After header (delta seconds or HTTP date)
+    Returns:
+        float: seconds to wait, or None when absent/unparsable
+    """
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    """
+    Returns:
+        float: seconds left until `deadline` (time.monotonic based), or None without a deadline
+    """
+    return None if deadline is None else deadline - time.monotonic()
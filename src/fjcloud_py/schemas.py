@@ -1,8 +1,11 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from .jsonstream import loads
 from dataclasses import dataclass
-from typing import Optional, Any
+from typing import Any, Callable, Optional, Tuple
+import json
+import sys
 
 
 @dataclass
@@ -65,3 +68,280 @@ class CreateBackupRequest:
     snapshot_id: Optional[str] = None
     metadata: Optional[dict] = None
     """MicroVersion: > 3.43"""
+
+
+"""Resource models
+"""
+_UNSET = object()
+
+
+def _path(*keys: str, default=None) -> Callable[[dict], Any]:
+    """
+    Returns:
+        function: reads a nested key, e.g. _path("flavor", "id")
+    """
+    def get(data: dict):
+        for key in keys:
+            if not isinstance(data, dict):
+                return default
+            data = data.get(key, default)
+        return data
+    return get
+
+
+def _ids(key: str, id_key: str = "id") -> Callable[[dict], Tuple[str, ...]]:
+    def get(data: dict):
+        return tuple(item[id_key] for item in data.get(key) or () if item.get(id_key))
+    return get
+
+
+class Resource:
+    """
+    Base of the compact resource models (Server, Volume, Backup, ...).
+
+    A model keeps only the fields listed in FIELDS, in __slots__ (no per-instance __dict__), which takes
+    roughly a tenth of the memory of the decoded dict. Models built with from_json() keep the raw bytes and
+    decode them on the first field access; the full payload is available as `raw` when keep_raw=True.
+
+        servers = Server.from_response(compute.list_servers_detailed())
+        backup = Backup.from_response(blockstorage.show_backup_detail(backup_id), keep_raw=True)
+        backup.status, backup.raw["metadata"]
+    """
+    __slots__ = ("_pending", "_raw")
+    KEY: str = ""
+    COLLECTION: str = ""
+    # (属性名, レスポンスのキー または dict を受け取る関数)
+    FIELDS: Tuple[Tuple[str, Any], ...] = ()
+
+
+    def __init__(self, **fields):
+        self._pending = None
+        self._raw = None
+        for name, _ in self.FIELDS:
+            setattr(self, name, fields.get(name))
+
+
+    @classmethod
+    def from_dict(cls, data: dict, keep_raw: bool = False):
+        """
+        Args:
+            data: [require] Resource as decoded from the API (e.g. response['data']['server'])
+            keep_raw: [optional] Keep the whole payload (compact JSON) for `raw`
+        """
+        model = cls.__new__(cls)
+        model._pending = None
+        model._raw = json.dumps(data, separators=(",", ":")).encode() if keep_raw else None
+        model._fill(data)
+        return model
+
+
+    @classmethod
+    def from_json(cls, content: bytes, keep_raw: bool = False):
+        """
+        Args:
+            content: [require] JSON of one resource (not wrapped in {"server": ...})
+            keep_raw: [optional] Keep the bytes for `raw` after the fields were decoded
+        """
+        model = cls.__new__(cls)
+        model._pending = content
+        model._raw = content if keep_raw else None
+        return model
+
+
+    @classmethod
+    def from_response(cls, response: dict, keep_raw: bool = False):
+        """
+        Args:
+            response: [require] Envelope of a show_* call ({KEY: {...}}) or a list_* call ({COLLECTION: [...]})
+        Returns:
+            model, list of models, or None when the request failed
+        """
+        if response['status'] != 'success' or not response['data']:
+            return None
+        data = response['data']
+        if cls.KEY in data:
+            return cls.from_dict(data[cls.KEY], keep_raw=keep_raw)
+        return [cls.from_dict(item, keep_raw=keep_raw) for item in data.get(cls.COLLECTION, [])]
+
+
+    def _fill(self, data: dict):
+        for name, source in self.FIELDS:
+            value = source(data) if callable(source) else data.get(source)
+            if isinstance(value, str):
+                # status/flavor_id/availability_zone など多くのオブジェクトで同じ値の文字列を共有する
+                value = sys.intern(value)
+            elif isinstance(value, tuple):
+                value = tuple(sys.intern(item) if isinstance(item, str) else item for item in value)
+            setattr(self, name, value)
+
+
+    def __getattr__(self, name: str):
+        # from_json() で作られたモデルは最初のフィールド参照でデコードする
+        pending = object.__getattribute__(self, "_pending")
+        if pending is None:
+            raise AttributeError(name)
+        self._pending = None
+        self._fill(loads(pending))
+        return object.__getattribute__(self, name)
+
+
+    @property
+    def raw(self) -> Optional[dict]:
+        """
+        Returns:
+            dict: the whole payload (None unless created with keep_raw=True)
+        """
+        return loads(self._raw) if self._raw is not None else None
+
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name, _ in self.FIELDS}
+
+
+    def __eq__(self, other):
+        return type(self) is type(other) and self.to_dict() == other.to_dict()
+
+
+    def __repr__(self):
+        return "{}(id={!r}, name={!r})".format(type(self).__name__, getattr(self, "id", None), getattr(self, "name", None))
+
+
+def _slots(fields) -> Tuple[str, ...]:
+    return tuple(name for name, _ in fields)
+
+
+class Server(Resource):
+    KEY = "server"
+    COLLECTION = "servers"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("status", "status"),
+        ("flavor_id", _path("flavor", "id")),
+        ("image_id", _path("image", "id")),
+        ("key_name", "key_name"),
+        ("availability_zone", "OS-EXT-AZ:availability_zone"),
+        ("networks", lambda data: tuple(data.get("addresses") or ())),
+        ("volume_ids", _ids("os-extended-volumes:volumes_attached")),
+        ("metadata", lambda data: data.get("metadata") or None),
+        ("created", "created"),
+        ("updated", "updated"),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class Volume(Resource):
+    KEY = "volume"
+    COLLECTION = "volumes"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("status", "status"),
+        ("size", "size"),
+        ("volume_type", "volume_type"),
+        ("bootable", "bootable"),
+        ("availability_zone", "availability_zone"),
+        ("server_ids", _ids("attachments", "server_id")),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class Backup(Resource):
+    KEY = "backup"
+    COLLECTION = "backups"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("status", "status"),
+        ("volume_id", "volume_id"),
+        ("size", "size"),
+        ("is_incremental", "is_incremental"),
+        ("description", "description"),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class Network(Resource):
+    KEY = "network"
+    COLLECTION = "networks"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("status", "status"),
+        ("subnet_ids", lambda data: tuple(data.get("subnets") or ())),
+        ("admin_state_up", "admin_state_up"),
+        ("shared", "shared"),
+        ("external", "router:external"),
+        ("availability_zones", lambda data: tuple(data.get("availability_zones") or ())),
+        ("created_at", "created_at"),
+        ("updated_at", "updated_at"),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class VpnService(Resource):
+    KEY = "vpnservice"
+    COLLECTION = "vpnservices"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("status", "status"),
+        ("router_id", "router_id"),
+        ("subnet_id", "subnet_id"),
+        ("admin_state_up", "admin_state_up"),
+        ("description", "description"),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class IPsecSiteConnection(Resource):
+    KEY = "ipsec_site_connection"
+    COLLECTION = "ipsec_site_connections"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("status", "status"),
+        ("vpnservice_id", "vpnservice_id"),
+        ("ikepolicy_id", "ikepolicy_id"),
+        ("ipsecpolicy_id", "ipsecpolicy_id"),
+        ("peer_address", "peer_address"),
+        ("peer_cidrs", lambda data: tuple(data.get("peer_cidrs") or ())),
+        ("admin_state_up", "admin_state_up"),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class IkePolicy(Resource):
+    KEY = "ikepolicy"
+    COLLECTION = "ikepolicies"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("auth_algorithm", "auth_algorithm"),
+        ("encryption_algorithm", "encryption_algorithm"),
+        ("ike_version", "ike_version"),
+        ("pfs", "pfs"),
+        ("phase1_negotiation_mode", "phase1_negotiation_mode"),
+        ("lifetime", "lifetime"),
+    )
+    __slots__ = _slots(FIELDS)
+
+
+class IpsecPolicy(Resource):
+    KEY = "ipsecpolicy"
+    COLLECTION = "ipsecpolicies"
+    FIELDS = (
+        ("id", "id"),
+        ("name", "name"),
+        ("auth_algorithm", "auth_algorithm"),
+        ("encryption_algorithm", "encryption_algorithm"),
+        ("pfs", "pfs"),
+        ("transform_protocol", "transform_protocol"),
+        ("encapsulation_mode", "encapsulation_mode"),
+        ("lifetime", "lifetime"),
+    )
+    __slots__ = _slots(FIELDS)
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from typing import Awaitable, Callable, Dict, Hashable
+import asyncio
+import copy
+import threading
+
+
+def flight_key(url: str, params: dict = None, headers: dict = None) -> tuple:
+    """
+    Key of a GET: URL, query parameters and headers (token, Accept and microversion change the response).
+
+    Returns:
+        tuple: hashable key
+    """
+    def freeze(mapping):
+        return tuple(sorted(
+            (str(key), tuple(value) if isinstance(value, (list, tuple)) else str(value))
+            for key, value in (mapping or {}).items()
+        ))
+    return url, freeze(params), freeze(headers)
+
+
+class _Call:
+    __slots__ = ("done", "result", "error", "followers")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.followers = 0
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent GETs (Transport(single_flight=True)): while a request for a key is
+    in flight, other threads asking for the same key wait for it instead of sending their own.
+
+    When the result was shared, the leader decodes the body once before waking the waiters and every caller
+    (the leader included) gets its own deep copy of the decoded result, so callers cannot see each other's
+    modifications and nobody decodes the body again. A call nobody joined returns the result as is.
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, _Call] = {}
+        self._lock = threading.Lock()
+
+
+    def do(self, key: Hashable, func: Callable[[], dict]) -> dict:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.followers += 1
+
+        if leader:
+            try:
+                call.result = func()
+            except BaseException as err:
+                call.error = err
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    shared = call.followers > 0
+                if shared:
+                    # 待ち手が起きる前にリーダーが 1 回だけデコードする
+                    _decode(call.result)
+                call.done.set()
+        else:
+            call.done.wait()
+            shared = True
+
+        if call.error is not None:
+            raise call.error
+        return copy.deepcopy(call.result) if shared else call.result
+
+
+class AsyncSingleFlight:
+    """
+    SingleFlight for coroutines (AsyncTransport(single_flight=True)), within one event loop.
+    """
+    def __init__(self):
+        self._calls: Dict[Hashable, list] = {}
+
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[dict]]) -> dict:
+        entry = self._calls.get(key)
+        if entry is None:
+            # [task, followers]; 呼び出し元がキャンセルされても他の待ち手のためにタスクは続行する
+            task = asyncio.ensure_future(func())
+            entry = self._calls[key] = [task, 0]
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+            leader = True
+        else:
+            entry[1] += 1
+            leader = False
+        result = await asyncio.shield(entry[0])
+        shared = not leader or entry[1] > 0
+        if not shared:
+            return result
+        # 最初に戻った呼び出し元が 1 回だけデコードし、全員がその複製を受け取る
+        _decode(result)
+        return copy.deepcopy(result)
+
+
+def _decode(result):
+    if result is None:
+        return
+    try:
+        result['data'], result['message']
+    except KeyError:
+        pass
@@ -0,0 +1,184 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError:  # Windows ではプロセス間ロックなし
+    fcntl = None
+
+
+class TokenCache:
+    """
+    Token cache keyed by (region, domain, project, user).
+
+    Entries are kept in memory and, when `path` is given, in a JSON file shared
+    by every process using the same path. The file is only read/written while
+    holding an exclusive lock on `<path>.lock`, so a fleet of workers starting
+    together authenticates once and the rest pick the stored token up.
+
+    Args:
+        path: [optional] On-disk cache file (created with mode 0600)
+    """
+    def __init__(self, path: str = None):
+        self.path: str = os.path.expanduser(path) if path else None
+        self._entries: dict = {}
+        self._lock = threading.RLock()
+        # 認証中であることを示すロック(スレッドからもコルーチンからも取るので再入不可の Lock)
+        self._refresh_lock = threading.Lock()
+        self._lock_executor: ThreadPoolExecutor = None
+
+
+    @staticmethod
+    def key(region: str, domain_name: str, project_id: str, username: str, identity_url: str = None) -> str:
+        # 同じユーザーでも認証エンドポイント(本番と FakeCloud など)ごとに分ける
+        return "|".join([region, domain_name, project_id, username, (identity_url or "").rstrip("/")])
+
+
+    def get(self, key: str):
+        """
+        Returns:
+            dict: {'token': str, 'expires_at': float(epoch)} or None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.path:
+                entry = self._read_file().get(key)
+                if entry is not None:
+                    self._entries[key] = entry
+            return entry
+
+
+    def put(self, key: str, entry: dict):
+        with self._lock:
+            self._entries[key] = entry
+            if self.path:
+                entries = self._read_file()
+                entries[key] = entry
+                self._write_file(entries)
+
+
+    def invalidate(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+            if self.path:
+                entries = self._read_file()
+                if entries.pop(key, None) is not None:
+                    self._write_file(entries)
+
+
+    def reload(self, key: str):
+        """
+        Drop the in-memory entry and re-read it from the file (another process may have refreshed it).
+        """
+        with self._lock:
+            if self.path:
+                self._entries.pop(key, None)
+            return self.get(key)
+
+
+    @contextmanager
+    def locked(self):
+        """
+        Exclusive lock held while checking and refreshing a token (threads, coroutines using async_locked and,
+        with a path, processes).
+        """
+        lock_file = self._acquire()
+        try:
+            yield
+        finally:
+            self._release(lock_file)
+
+
+    @asynccontextmanager
+    async def async_locked(self):
+        """
+        Same as locked() for coroutines: the lock is waited for in a dedicated thread, so the event loop keeps
+        running while another thread or process authenticates.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            if self._lock_executor is None:
+                self._lock_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="fjcloud-token-lock")
+        acquiring = loop.run_in_executor(self._lock_executor, self._acquire)
+        try:
+            lock_file = await asyncio.shield(acquiring)
+        except asyncio.CancelledError:
+            # 取得待ちの途中でキャンセルされたら、取れた時点で手放す
+            acquiring.add_done_callback(
+                lambda future: None if future.cancelled() or future.exception() else self._release(future.result()))
+            raise
+        try:
+            yield
+        finally:
+            self._release(lock_file)
+
+
+    def _acquire(self):
+        self._refresh_lock.acquire()
+        if not self.path or fcntl is None:
+            return None
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            lock_file = open(self.path + ".lock", "a")
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+            return lock_file
+        except BaseException:
+            self._refresh_lock.release()
+            raise
+
+
+    def _release(self, lock_file):
+        try:
+            if lock_file is not None:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+                lock_file.close()
+        finally:
+            self._refresh_lock.release()
+
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        now = time.time()
+        # 期限切れのエントリは読み込み時に捨てる
+        return {k: v for k, v in entries.items() if v.get("expires_at", 0) > now}
+
+
+    def _write_file(self, entries: dict):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".fjcloud-token-")
+        try:
+            os.chmod(tmp_path, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump(entries, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+
+_default_token_cache = TokenCache()
+
+
+def default_token_cache() -> TokenCache:
+    """
+    Returns:
+        TokenCache: Process wide in-memory token cache
+    """
+    return _default_token_cache
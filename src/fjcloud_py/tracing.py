@@ -0,0 +1,314 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Request tracing.
+
+A transport with a tracer (Transport(tracer=...)/AsyncTransport(tracer=...)) opens a client span for every
+HTTP request, nested under the span current in the calling thread/task, and sends an X-OpenStack-Request-ID
+(req-<uuid>, logged by the provider as the global request ID) of its own with it. The first 16 hex digits of the
+ID are those of the trace, so the provider's logs of all the requests of a trace can still be found together:
+
+    recorder = SpanRecorder()
+    tracer = Tracer(exporters=[recorder])
+    transport = Transport(tracer=tracer)
+    with tracer.span("provision", server="web-1"):
+        compute.create_server(...)
+        networking.create_port(...)
+    print(recorder.render())
+
+OpenTelemetryTracer does the same through the OpenTelemetry API (pip install "fjcloud-py[otel]").
+Nothing is done when the transport has no tracer.
+"""
+
+from .metrics import url_template
+from .ratelimit import service_of
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+import logging
+import threading
+import time
+import uuid
+
+try:
+    from opentelemetry import propagate as otel_propagate
+    from opentelemetry import trace as otel_trace
+except ImportError:  # opentelemetry は任意(pip install "fjcloud-py[otel]")
+    otel_propagate = None
+    otel_trace = None
+
+
+logger = logging.getLogger(__name__)
+
+
+REQUEST_ID_HEADER: str = "X-OpenStack-Request-ID"
+# サービスによってはレスポンスの request ID を別名で返す
+RESPONSE_REQUEST_ID_HEADERS = ("X-OpenStack-Request-ID", "X-Compute-Request-Id", "X-Openstack-Request-Id")
+
+_current = ContextVar("fjcloud_py_span", default=None)
+
+
+def current_span() -> Optional["Span"]:
+    """
+    Returns:
+        Span: span opened by Tracer.span in the current thread/task, or None
+    """
+    return _current.get()
+
+
+def request_attributes(method: str, url: str, headers: dict = None) -> Dict[str, object]:
+    attributes: Dict[str, object] = {
+        "http.request.method": method.upper(),
+        "url.full": url,
+        "url.template": url_template(url),
+        "server.address": urlparse(url).hostname,
+        "fjcloud.service": service_of(url),
+    }
+    for name, value in (headers or {}).items():
+        # "OpenStack-API-Version: compute 2.79" -> 2.79
+        if name.lower() == "openstack-api-version":
+            attributes["fjcloud.microversion"] = value.split()[-1]
+    return attributes
+
+
+def response_attributes(response) -> Dict[str, object]:
+    attributes: Dict[str, object] = {"fjcloud.retries": response.retries}
+    if response.status_code is not None:
+        attributes["http.response.status_code"] = response.status_code
+    if response.headers is not None:
+        for name in RESPONSE_REQUEST_ID_HEADERS:
+            if response.headers.get(name):
+                attributes["openstack.request_id"] = response.headers[name]
+                break
+    if not response.ok and response.status_code is None:
+        attributes["error.message"] = str(response.message)
+    return attributes
+
+
+def global_request_id(trace_id: int, span_id: int) -> str:
+    """
+    Returns:
+        str: req-<uuid> (the format OpenStack accepts as a global request ID) made of the upper 64 bits of the
+            trace ID and the 64 bit span ID, i.e. unique per request span
+    """
+    return "req-" + str(uuid.UUID(int=(trace_id >> 64) << 64 | span_id))
+
+
+class Span:
+    """
+    Attributes:
+        name (str): e.g. "provision" or "GET /v2.0/networks/{network_id}"
+        trace_id (int): 128 bit ID shared by the spans of a trace
+        span_id (int): 64 bit ID
+        parent_id (Optional[int]): span_id of the parent
+        attributes (dict): service, URL template, microversion, status, ...
+        start (float): time.time() at start
+        end (Optional[float]): time.time() at end
+        status (str): ok | error
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attributes", "start", "end", "status", "_tracer",
+                 "_token", "_started")
+
+    def __init__(self, tracer: "Tracer", name: str, parent: "Span" = None, attributes: dict = None):
+        self.name: str = name
+        self.trace_id: int = parent.trace_id if parent is not None else uuid.uuid4().int
+        self.span_id: int = uuid.uuid4().int >> 64
+        self.parent_id: Optional[int] = parent.span_id if parent is not None else None
+        self.attributes: dict = dict(attributes or {})
+        self.start: float = time.time()
+        self.end: Optional[float] = None
+        self.status: str = "ok"
+        self._tracer = tracer
+        self._token = None
+        self._started: float = time.monotonic()
+
+
+    @property
+    def request_id(self) -> str:
+        return global_request_id(self.trace_id, self.span_id)
+
+
+    @property
+    def duration(self) -> Optional[float]:
+        return None if self.end is None else self.end - self.start
+
+
+    def set_attribute(self, name: str, value):
+        self.attributes[name] = value
+
+
+    def finish(self, error: BaseException = None):
+        if self.end is not None:
+            return
+        self.end = self.start + (time.monotonic() - self._started)
+        if error is not None:
+            self.status = "error"
+            self.attributes.setdefault("error.message", str(error) or type(error).__name__)
+        self._tracer._export(self)
+
+
+    def __enter__(self):
+        self._token = _current.set(self)
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        _current.reset(self._token)
+        self.finish(exc_value)
+
+
+    def __repr__(self):
+        return "<Span {} {:.3f}s {}>".format(self.name, self.duration or 0.0, self.status)
+
+
+class Tracer:
+    """
+    Built-in tracer.
+
+    Args:
+        exporters: [optional] Callables receiving every finished Span (e.g. a SpanRecorder)
+        request_id_header: [optional] Header carrying the global request ID (None: not sent)
+    """
+    def __init__(self, exporters: Iterable[Callable[[Span], None]] = None,
+                 request_id_header: Optional[str] = REQUEST_ID_HEADER):
+        self.exporters: List[Callable[[Span], None]] = list(exporters or [])
+        self.request_id_header: Optional[str] = request_id_header
+
+
+    def span(self, name: str, **attributes) -> Span:
+        """
+        Span for a block of calls; use as a context manager (also inside coroutines: the span is current in the
+        thread or task that entered it, and in the fan_out/prefetch workers it starts).
+        """
+        return Span(self, name, current_span(), attributes)
+
+
+    def start_request(self, method: str, url: str, headers: dict = None):
+        """
+        Called by Utilities/AsyncUtilities before a request.
+
+        Returns:
+            tuple: (span, headers to send)
+        """
+        attributes = request_attributes(method, url, headers)
+        span = Span(self, "{} {}".format(attributes["http.request.method"], attributes["url.template"]),
+                    current_span(), attributes)
+        if self.request_id_header is not None:
+            headers = dict(headers or {}, **{self.request_id_header: span.request_id})
+            span.attributes["openstack.global_request_id"] = span.request_id
+        return span, headers
+
+
+    @staticmethod
+    def end_request(span: Span, response=None, error: BaseException = None):
+        if response is not None:
+            span.attributes.update(response_attributes(response))
+            if not response.ok:
+                span.status = "error"
+        span.finish(error)
+
+
+    def _export(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter(span)
+            except Exception as err:
+                logger.warning('Span exporter failed: %s', err, exc_info=True)
+
+
+class SpanRecorder:
+    """
+    Exporter keeping finished spans in memory.
+
+    Args:
+        maxlen: [optional] Max number of spans kept (oldest dropped first)
+    """
+    def __init__(self, maxlen: int = 10000):
+        self.maxlen: int = maxlen
+        self.spans: List[Span] = []
+        self._lock = threading.Lock()
+
+
+    def __call__(self, span: Span):
+        with self._lock:
+            self.spans.append(span)
+            if len(self.spans) > self.maxlen:
+                del self.spans[:len(self.spans) - self.maxlen]
+
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+
+
+    def render(self) -> str:
+        """
+        Returns:
+            str: one line per span, indented under its parent, with the start offset from the root and the
+                 duration, so serial and overlapping calls can be told apart
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        children: Dict[Optional[int], List[Span]] = {}
+        ids = {span.span_id for span in spans}
+        for span in spans:
+            children.setdefault(span.parent_id if span.parent_id in ids else None, []).append(span)
+        lines: List[str] = []
+
+        def walk(span: Span, depth: int, origin: float):
+            status = span.attributes.get("http.response.status_code", span.status)
+            lines.append("{}{} +{:.3f}s {:.3f}s {}".format("  " * depth, span.name, span.start - origin,
+                                                          span.duration or 0.0, status))
+            for child in children.get(span.span_id, []):
+                walk(child, depth + 1, origin)
+
+        for root in children.get(None, []):
+            walk(root, 0, root.start)
+        return "\n".join(lines)
+
+
+class OpenTelemetryTracer:
+    """
+    Tracer backed by the OpenTelemetry API: request spans are CLIENT spans under the current OpenTelemetry
+    span, and the W3C trace context is injected along with the global request ID (derived from the trace and span
+    IDs).
+
+    Args:
+        tracer_provider: [optional] TracerProvider (default: the global one)
+        request_id_header: [optional] Header carrying the global request ID (None: not sent)
+    """
+    def __init__(self, tracer_provider=None, request_id_header: Optional[str] = REQUEST_ID_HEADER):
+        if otel_trace is None:
+            raise ImportError('opentelemetry-api is required for OpenTelemetryTracer: pip install "fjcloud-py[otel]"')
+        self.tracer = otel_trace.get_tracer("fjcloud_py", tracer_provider=tracer_provider)
+        self.request_id_header: Optional[str] = request_id_header
+
+
+    def span(self, name: str, **attributes):
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+
+    def start_request(self, method: str, url: str, headers: dict = None):
+        attributes = request_attributes(method, url, headers)
+        span = self.tracer.start_span("{} {}".format(attributes["http.request.method"], attributes["url.template"]),
+                                      kind=otel_trace.SpanKind.CLIENT, attributes=attributes)
+        headers = dict(headers or {})
+        otel_propagate.inject(headers, context=otel_trace.set_span_in_context(span))
+        if self.request_id_header is not None:
+            span_context = span.get_span_context()
+            request_id = global_request_id(span_context.trace_id, span_context.span_id)
+            headers[self.request_id_header] = request_id
+            span.set_attribute("openstack.global_request_id", request_id)
+        return span, headers
+
+
+    @staticmethod
+    def end_request(span, response=None, error: BaseException = None):
+        if response is not None:
+            span.set_attributes(response_attributes(response))
+            if not response.ok:
+                span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+        if error is not None:
+            span.record_exception(error)
+            span.set_status(otel_trace.Status(otel_trace.StatusCode.ERROR))
+        span.end()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from .cache import ResponseCache
+from .circuitbreaker import CircuitBreaker
+from .ratelimit import RateLimiter
+from .retry import RetryPolicy
+from .singleflight import SingleFlight
+from requests.adapters import HTTPAdapter
+from typing import Callable, Iterable, List
+import requests
+import threading
+
+
+class Transport:
+    """
+    Pooled HTTP transport shared by AuthManager and the API classes.
+
+    One requests.Session is kept per Transport so that TCP/TLS connections to
+    identity/compute/blockstorage/networking/nfv are reused (keep-alive)
+    instead of being opened for every call.
+
+    Args:
+        pool_connections: [optional] Number of per-host pools to cache
+        pool_maxsize: [optional] Max connections kept alive per host
+        pool_block: [optional] Block when the per-host pool is exhausted instead of opening extra connections
+        headers: [optional] Headers added to every request
+        retry: [optional] RetryPolicy applied by Utilities (default: RetryPolicy(), 120 s deadline; NO_RETRY disables it)
+        rate_limiter: [optional] RateLimiter applied before every attempt (may be shared with an AsyncTransport)
+        circuit_breaker: [optional] CircuitBreaker that fails requests to a degraded service host immediately
+        single_flight: [optional] Share one request among identical concurrent GETs (same URL, params and headers)
+        cache: [optional] ResponseCache for GETs of nearly static resources
+        hooks: [optional] Callables receiving a RequestEvent after every request (e.g. a MetricsCollector)
+        tracer: [optional] Tracer or OpenTelemetryTracer opening a span per request
+        journal: [optional] JournalWriter recording every request and response (see ReplayTransport)
+    """
+    def __init__(self, pool_connections: int = 10, pool_maxsize: int = 10, pool_block: bool = False,
+                 headers: dict = None, retry: RetryPolicy = None, rate_limiter: RateLimiter = None,
+                 circuit_breaker: CircuitBreaker = None, single_flight: bool = False, cache: ResponseCache = None,
+                 hooks: Iterable[Callable] = None, tracer=None, journal=None):
+        self.pool_connections: int = pool_connections
+        self.pool_maxsize: int = pool_maxsize
+        self.pool_block: bool = pool_block
+        self.retry: RetryPolicy = retry if retry is not None else RetryPolicy()
+        self.rate_limiter: RateLimiter = rate_limiter
+        self.circuit_breaker: CircuitBreaker = circuit_breaker
+        self.single_flight: SingleFlight = SingleFlight() if single_flight else None
+        self.cache: ResponseCache = cache
+        self.hooks: List[Callable] = list(hooks or [])
+        self.tracer = tracer
+        self.journal = journal
+        self.session: requests.Session = requests.Session()
+        # リトライは urllib3 ではなく Utilities 側で RetryPolicy に従って行う
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            pool_block=pool_block,
+            max_retries=0
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Connection": "keep-alive"})
+        if headers:
+            self.session.headers.update(headers)
+
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if self.journal is None:
+            return self.session.request(method, url, **kwargs)
+        params, headers, json_data = kwargs.get("params"), kwargs.get("headers"), kwargs.get("json")
+        started = self.journal.now()
+        try:
+            response = self.session.request(method, url, **kwargs)
+        except requests.RequestException as err:
+            # タイムアウトや接続エラーも記録し、再生時に同じ種類の例外を投げる
+            self.journal.record(method, url, params, headers, json_data, started=started,
+                                elapsed=self.journal.now() - started, error=err)
+            raise
+        if kwargs.get("stream"):
+            # 本文を先読みすると stream=True の意味がなくなるので、呼び出し側が読み終えた時点で記録する
+            self.journal.record_stream(response, method, url, params, headers, json_data, started)
+            return response
+        self.journal.record(method, url, params, headers, json_data, response.status_code, response.headers,
+                            response.content, started, self.journal.now() - started)
+        return response
+
+
+    def close(self):
+        self.session.close()
+
+
+    def __enter__(self):
+        return self
+
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+_default_transport = None
+_default_transport_lock = threading.Lock()
+
+
+def default_transport() -> Transport:
+    """
+    Returns:
+        Transport: Process wide transport used when none is given explicitly
+    """
+    global _default_transport
+    if _default_transport is None:
+        with _default_transport_lock:
+            if _default_transport is None:
+                _default_transport = Transport()
+    return _default_transport
@@ -1,65 +1,231 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
 
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import asdict
-from requests.exceptions import HTTPError, Timeout, RequestException
-import requests
+from datetime import datetime
+from requests.exceptions import ConnectionError, Timeout, RequestException
+from typing import Callable, Dict, Iterable, Iterator, List, Tuple, Union
+from .cache import hit as cache_hit
+from .circuitbreaker import CircuitBreaker
+from .jsonstream import CHUNK_SIZE, iter_array
+from .metrics import build_event, emit
+from .result import Result
+from .retry import RetryPolicy, remaining
+from .singleflight import flight_key
+from .tracing import current_span
+from .transport import Transport, default_transport
+from .waiters import WaitPolicy, WaitState, _is_not_found
+import contextvars
+import logging
 import sys
+import time
+
+
+logger = logging.getLogger(__name__)
+
+
+class APIError(Exception):
+    """
+    Raised by the iterator style methods (which cannot return an envelope) when a request fails.
+
+    Attributes:
+        response (dict): the error envelope {'status': 'error', 'data': None, 'message': ...}
+    """
+    def __init__(self, response: dict):
+        self.response: dict = response
+        super().__init__(response['message'])
+
+
+class DiscoveryError(APIError):
+    """
+    Raised when the API version of a service cannot be discovered (nothing is stored in the version cache).
+
+    Attributes:
+        service (str): compute | blockstorage
+        response (dict): the error envelope of the version discovery request
+    """
+    def __init__(self, service: str, response: dict):
+        self.service: str = service
+        super().__init__(response)
+        self.args = ("Could not retrieve the {} API version: {}".format(service, response['message']),)
 
 
 
 class Utilities:
     @staticmethod
-    def get(url: str, headers: dict = None, params: dict = None, timeout: int = 120) -> dict:
+    def _send(transport: Transport, method: str, url: str, headers: dict = None, auth=None, **kwargs):
+        """
+        Send a request; on 401 re-authenticate once through `auth` (AuthManager) and replay it.
+        """
+        transport = transport or default_transport()
+        response = transport.request(method, url, headers=headers, **kwargs)
+        if response.status_code == 401 and auth is not None and headers and "X-Auth-Token" in headers:
+            headers = dict(headers)
+            headers["X-Auth-Token"] = auth.reauthenticate(headers["X-Auth-Token"])
+            response = transport.request(method, url, headers=headers, **kwargs)
+        return response
+
+
+    @staticmethod
+    def request(method: str, url: str, headers: dict = None, params: dict = None, json_data: dict = None,
+                timeout: int = 10, transport: Transport = None, auth=None, read_body: bool = True) -> dict:
+        """
+        Send a request applying the RetryPolicy of the transport and wrap the result in the envelope.
+
+        Args:
+            method: [require] HTTP method
+            url: [require] Endpoint (ServiceEndpoint + URI)
+            headers: [require] Headers
+            params: [optional] Query parameters
+            json_data: [optional] Request body
+            timeout: [optional] Timeout per attempt (also bounded by RetryPolicy.deadline)
+            transport: [optional] Pooled transport (default: process wide transport)
+            auth: [optional] AuthManager used to re-authenticate and replay the request once on 401
+            read_body: [optional] Decode the body of a successful response into 'data'
+        Returns:
+            Result: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None], 'retries': int}
+                    (also status_code, headers, elapsed; the body is decoded on first access)
+        """
+        transport = transport or default_transport()
+        response = Utilities._request(method, url, headers=headers, params=params, json_data=json_data,
+                                      timeout=timeout, transport=transport, auth=auth, read_body=read_body)
+        if transport.cache is not None and method.upper() != "GET" and response['status'] == 'success':
+            transport.cache.invalidate(method, url)
+        return response
+
+
+    @staticmethod
+    def _request(method: str, url: str, headers: dict = None, params: dict = None, json_data: dict = None,
+                 timeout: int = 10, transport: Transport = None, auth=None, read_body: bool = True,
+                 stream: bool = False, cache_state: str = None):
+        """
+        Args:
+            stream: [optional] Leave the body of a successful response unread; 'data' is the requests.Response
+                    (the caller must close it)
+            cache_state: [optional] "miss" when the GET goes through the response cache (reported as
+                         "revalidated" on 304)
+        Returns:
+            Result
+        """
+        started = time.monotonic()
+        if transport.tracer is None:
+            response = Utilities._retry_loop(method, url, headers, params, json_data, timeout, transport, auth,
+                                             read_body, stream)
+        else:
+            span, headers = transport.tracer.start_request(method, url, headers)
+            try:
+                response = Utilities._retry_loop(method, url, headers, params, json_data, timeout, transport, auth,
+                                                 read_body, stream)
+            except BaseException as err:
+                transport.tracer.end_request(span, error=err)
+                raise
+            transport.tracer.end_request(span, response)
+        response.elapsed = time.monotonic() - started
+        if transport.hooks:
+            _instrument(transport, method, url, json_data, response, cache_state)
+        return response
+
+
+    @staticmethod
+    def _retry_loop(method: str, url: str, headers: dict, params: dict, json_data: dict, timeout: int,
+                    transport: Transport, auth, read_body: bool, stream: bool) -> Result:
+        policy: RetryPolicy = transport.retry
+        breaker: CircuitBreaker = transport.circuit_breaker
+        deadline = policy.start()
+        retries = 0
+        while True:
+            if breaker is not None and not breaker.allow(url):
+                return _circuit_open_envelope(breaker, url, retries)
+            if transport.rate_limiter is not None and \
+                    not transport.rate_limiter.acquire(method, url, timeout=remaining(deadline)):
+                _record(breaker, url, None)
+                return _error_envelope('Rate limit wait exceeds the deadline', retries)
+            left = remaining(deadline)
+            attempt_timeout = timeout if left is None else max(min(timeout, left), 0.001)
+            started = time.monotonic()
+            try:
+                response = Utilities._send(transport, method, url, headers=headers, params=params, json=json_data,
+                                           timeout=attempt_timeout, auth=auth, stream=stream)
+            except Timeout as timeout_err:
+                _record(breaker, url, False)
+                if policy.retry_on_timeout and _wait_for_retry(policy, method, retries, deadline):
+                    retries += 1
+                    continue
+                return _error_envelope(str(timeout_err), retries)
+            except ConnectionError as conn_err:
+                _record(breaker, url, False)
+                if policy.retry_on_connection_error and _wait_for_retry(policy, method, retries, deadline):
+                    retries += 1
+                    continue
+                return _error_envelope(str(conn_err), retries)
+            except RequestException as req_err:
+                _record(breaker, url, None)
+                return _error_envelope(str(req_err), retries)
+            except Exception as err:
+                _record(breaker, url, None)
+                # その他の予期しないエラー
+                logger.warning('Unexpected error during %s %s: %s', method, url, err, exc_info=True)
+                return _error_envelope(str(err), retries)
+
+            _record(breaker, url, response.status_code < 500, time.monotonic() - started)
+            if response.status_code in policy.retry_statuses and \
+                    _wait_for_retry(policy, method, retries, deadline, response.headers):
+                response.close()
+                retries += 1
+                continue
+            if response.status_code >= 400:
+                return Result('error', content=response.content, status_code=response.status_code,
+                              headers=response.headers, retries=retries)
+            if stream:
+                return Result('success', status_code=response.status_code, headers=response.headers,
+                              retries=retries, data=response)
+            return Result('success', content=response.content, status_code=response.status_code,
+                          headers=response.headers, retries=retries, read_body=read_body)
+
+
+    @staticmethod
+    def get(url: str, headers: dict = None, params: dict = None, timeout: int = 120, transport: Transport = None, auth=None) -> dict:
         """
         Args:
             url: [require] Endpoint (ServiceEndpoint + URI)
             headers: [require] Headers
             params: [optional] Query parameters
             timeout: [optional] Timeout
+            transport: [optional] Pooled transport (default: process wide transport)
+            auth: [optional] AuthManager used to re-authenticate and replay the request once on 401
         Returns:
-            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None], 'retries': int}
         """
-        try:
-            response = requests.get(url, headers=headers, params=params, timeout=timeout)
-            response.raise_for_status()
-            return {
-                'status': 'success',
-                'data': response.json(),
-                'message': None
-            }
-        except HTTPError as http_err:
-            #print(http_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                'message': http_err.response.json()
-            }
-        except Timeout as timeout_err:
-            #print(timeout_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                'message': timeout_err.response.json()
-            }
-        except RequestException as req_err:
-            #print(req_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                'message': req_err.response.json()
-            }
-        except Exception as err:
-            print(f'An error occurred: {err}')  # その他の予期しないエラー
-            return {
-                'status': 'error',
-                'data': None,
-                'message': err
-            }
+        transport = transport or default_transport()
+        cache = transport.cache
+        key, entry = cache.lookup(url, params, headers, auth) if cache is not None else (None, None)
+        if entry is not None and entry.fresh:
+            response = cache_hit(entry)
+            if transport.hooks:
+                _instrument(transport, "GET", url, None, response, "hit")
+            return response
+
+        def send():
+            if key is None:
+                return Utilities.request("GET", url, headers=headers, params=params, timeout=timeout,
+                                         transport=transport, auth=auth)
+            # 期限切れのエントリは ETag/Last-Modified で再検証する
+            response = Utilities._request(
+                "GET", url, headers=dict(headers or {}, **cache.conditional_headers(entry)), params=params,
+                timeout=timeout, transport=transport, auth=auth, cache_state="miss"
+            )
+            return cache.store(key, entry, url, response)
+
+        if transport.single_flight is not None:
+            # 同じ GET が実行中ならその結果を共有する(Transport(single_flight=True) の場合のみ)
+            return transport.single_flight.do(flight_key(url, params, headers), send)
+        return send()
 
 
     @staticmethod
-    def post(url: str, headers: dict = None, params: dict = None, json_data :dict = None, timeout: int = 10) -> dict:
+    def post(url: str, headers: dict = None, params: dict = None, json_data :dict = None, timeout: int = 10,
+             transport: Transport = None, auth=None) -> dict:
         """
         Args:
             url: [require] Endpoint (ServiceEndpoint + URI)
@@ -67,125 +233,406 @@ class Utilities:
             params: [optional] Query parameters
             json_data: [optional] Request body
             timeout: [optional] Timeout
+            transport: [optional] Pooled transport (default: process wide transport)
+            auth: [optional] AuthManager used to re-authenticate and replay the request once on 401
         Returns:
-            dict: "{'status': [success|error], 'data': [data|None], 'message': [message|None]}"
+            dict: "{'status': [success|error], 'data': [data|None], 'message': [message|None], 'retries': int}"
         """
-        try:
-            response = requests.post(url, params=params, headers=headers, json=json_data, timeout=timeout)
-            response.raise_for_status()
-            return {
-                'status': 'success',
-                'data': response.json(),
-                'message': None
-            }
-        except HTTPError as http_err:
-            #print(http_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                'message': http_err.response.json()
-            }
-        except Timeout as timeout_err:
-            #print(timeout_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                'message': timeout_err.response.json()
-            }
-        except RequestException as req_err:
-            #print(req_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                'message': req_err.response.json()
-            }
-        except Exception as err:
-            #print(f'An error occurred: {err}')  # その他の予期しないエラー
-            return {
-                'status': 'error',
-                'data': None,
-                'message': err
-            }
+        return Utilities.request("POST", url, headers=headers, params=params, json_data=json_data, timeout=timeout,
+                                 transport=transport, auth=auth)
+
+
+    @staticmethod
+    def put(url: str, headers: dict = None, params: dict = None, json_data: dict = None, timeout: int = 10,
+            transport: Transport = None, auth=None):
+        return Utilities.request("PUT", url, headers=headers, params=params, json_data=json_data, timeout=timeout,
+                                 transport=transport, auth=auth)
 
 
     @staticmethod
-    def put(url: str, headers: dict = None, params: dict = None, json_data: dict = None, timeout: int = 10):
+    def delete(url: str, headers: dict = None, params: dict = None, timeout: int = 10, transport: Transport = None, auth=None) -> dict:
+        return Utilities.request("DELETE", url, headers=headers, params=params, timeout=timeout, transport=transport,
+                                 auth=auth, read_body=False)
+
+
+    @staticmethod
+    def stream(url: str, resource_key: str, headers: dict = None, params: dict = None, timeout: int = 120,
+               transport: Transport = None, auth=None, rest: dict = None) -> Iterator[dict]:
+        """
+        GET a list API and yield the elements of the top-level `resource_key` array while the body is being
+        received, instead of decoding the whole body at once. The response cache and single-flight are bypassed.
+
+        Args:
+            url: [require] Endpoint of the list API
+            resource_key: [require] Key of the array in the response body (servers, volumes, ...)
+            rest: [optional] Receives the other members of the body (e.g. servers_links)
+            others: same as get
+        Yields:
+            dict: resource
+        Raises:
+            APIError: when the request fails
+        """
+        transport = transport or default_transport()
+        response = Utilities._request("GET", url, headers=headers, params=params, timeout=timeout,
+                                      transport=transport, auth=auth, stream=True)
+        if response['status'] != 'success':
+            raise APIError(response)
+        with response['data'] as raw:
+            yield from iter_array(raw.iter_content(CHUNK_SIZE), resource_key, rest)
+
+
+    @staticmethod
+    def paginate(url: str, resource_key: str, headers: dict = None, params: dict = None, limit: int = None,
+                 prefetch: bool = False, timeout: int = 120, transport: Transport = None, auth=None,
+                 stream: bool = False) -> Iterator[dict]:
+        """
+        Yield resources one at a time, following `<resource_key>_links` "next" links (or limit/marker).
+
+        Args:
+            url: [require] Endpoint of the list API
+            resource_key: [require] Key of the array in the response body (servers, volumes, ...)
+            headers: [require] Headers
+            params: [optional] Query parameters of the first page
+            limit: [optional] Page size
+            prefetch: [optional] Fetch the next page in a background thread while the current one is consumed
+            timeout: [optional] Timeout per page
+            transport: [optional] Pooled transport
+            auth: [optional] AuthManager (the token is re-read for every page)
+            stream: [optional] Decode each page incrementally (Utilities.stream) to bound memory; excludes prefetch
+        Yields:
+            dict: resource
+        Raises:
+            APIError: when a page request fails
+        """
+        def page_headers():
+            if auth is not None and headers and "X-Auth-Token" in headers:
+                return dict(headers, **{"X-Auth-Token": auth.token})
+            return headers
+
+        def fetch(page_url, page_params):
+            return Utilities.get(page_url, headers=page_headers(), params=page_params, timeout=timeout,
+                                 transport=transport, auth=auth)
+
+        page = _first_page(url, params, limit)
+        if stream:
+            if prefetch:
+                raise ValueError("stream and prefetch cannot be combined")
+            while page is not None:
+                rest, count, item = {}, 0, None
+                for item in Utilities.stream(page[0], resource_key, headers=page_headers(), params=page[1],
+                                             timeout=timeout, transport=transport, auth=auth, rest=rest):
+                    count += 1
+                    yield item
+                page = _next_page(rest, resource_key, count, item, page, limit)
+            return
+
+        executor = ThreadPoolExecutor(max_workers=1) if prefetch else None
         try:
-            response = requests.put(url, headers=headers, params=params, json=json_data, timeout=timeout)
-            response.raise_for_status()
-            return {
-                'status': 'success',
-                'data': response.json(),
-                'message': None
-            }
-        except HTTPError as http_err:
-            #print(http_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                #'message': http_err.response.json()
-                'message': http_err.response.json() if http_err.response else str(http_err)
-            }
-        except Timeout as timeout_err:
-            #print(timeout_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                #'message': timeout_err.response.json()
-                'message': timeout_err.response.json() if timeout_err.response else str(timeout_err)
-            }
-        except RequestException as req_err:
-            #print(req_err.response.json())
-            return {
-                'status': 'error',
-                'data': None,
-                #'message': req_err.response
-                'message': req_err.response.json() if req_err.response else str(req_err)
-            }
-        except Exception as err:
-            #print(f'An error occurred: {err}')  # その他の予期しないエラー
-            return {
-                'status': 'error',
-                'data': None,
-                #'message': err
-                'message': str(err)
-            }
+            response = fetch(*page)
+            while True:
+                if response['status'] != 'success':
+                    raise APIError(response)
+                items = response['data'].get(resource_key, [])
+                page = _next_page(response['data'], resource_key, len(items), items[-1] if items else None, page, limit)
+                pending = _submit(executor, fetch, *page) if page and executor else None
+                yield from items
+                if page is None:
+                    return
+                response = pending.result() if pending else fetch(*page)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False)
+
+
+    @staticmethod
+    def fan_out(func: Callable[[str], dict], ids: Iterable[str], max_workers: int = 8) -> Iterator[Tuple[str, dict]]:
+        """
+        Call `func(id)` for many IDs with at most `max_workers` requests in flight.
+
+        Keep max_workers <= Transport.pool_maxsize so that every worker reuses a pooled connection.
+
+        Args:
+            func: [require] e.g. BlockstorageAPI.show_backup_detail
+            ids: [require] Resource IDs (duplicates are requested once)
+            max_workers: [optional] Concurrency cap
+        Yields:
+            tuple: (id, envelope) in completion order
+        """
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(ids))) as executor:
+            futures = {_submit(executor, func, resource_id): resource_id for resource_id in ids}
+            try:
+                for future in as_completed(futures):
+                    yield futures[future], _result_or_error(future)
+            finally:
+                # 途中で打ち切られた場合は未着手のリクエストを取り消す
+                for future in futures:
+                    future.cancel()
+
+
+    @staticmethod
+    def gather(func: Callable[[str], dict], ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        Returns:
+            dict: {id: envelope} (see fan_out)
+        """
+        return dict(Utilities.fan_out(func, ids, max_workers=max_workers))
 
 
     @staticmethod
-    def delete(url: str, headers: dict = None, params: dict = None, timeout: int = 10) -> dict:
+    def bulk_create(create: Callable[[List[dict]], dict], delete: Callable[[str], dict], items: Iterable[dict],
+                    list_key: str, chunk_size: int = 100, rollback: bool = True, max_workers: int = 8) -> dict:
+        """
+        Create many resources with one bulk POST per `chunk_size` items (Neutron creates the items of a POST
+        all-or-nothing). When a chunk fails the following chunks are not sent and, with rollback=True, the
+        resources created by the previous chunks are deleted concurrently (see fan_out).
+
+        Args:
+            create: [require] create(items) -> envelope of the bulk POST {list_key: items}
+            delete: [require] delete(id) -> envelope, used for the rollback
+            items: [require] Attributes of the resources to create
+            list_key: [require] Key of the array in the request and response bodies (e.g. networks)
+            chunk_size: [optional] Items per POST
+            rollback: [optional] Delete the resources already created when a chunk fails
+            max_workers: [optional] Concurrency cap of the rollback deletes
+        Returns:
+            dict: {'status': 'success', 'data': {list_key: [created resources]}, ...} or
+                  {'status': 'error', 'message': ..., 'data': {list_key: [resources still created],
+                  'failed': [items not created], 'rolled_back': [deleted ids], 'rollback_errors': {id: message}}}
+        """
+        items = list(items)
+        created: List[dict] = []
+        retries = 0
+        response = None
+        for start in range(0, len(items), chunk_size):
+            response = create(items[start:start + chunk_size])
+            retries += response.get('retries', 0)
+            if response['status'] != 'success':
+                deleted = {}
+                if rollback and created:
+                    deleted = Utilities.gather(delete, [resource["id"] for resource in created], max_workers=max_workers)
+                return _bulk_failure(list_key, items, start, chunk_size, created, response, deleted, retries)
+            created.extend(response['data'][list_key])
+        return Result('success', status_code=getattr(response, 'status_code', None), retries=retries,
+                      data={list_key: created})
+
+
+    @staticmethod
+    def poll_many(iterate: Callable[[], Iterator[dict]], show: Callable[[str], dict], resource_ids: List[str],
+                  single_key: str, list_key: str, max_workers: int = 8) -> dict:
+        """
+        Poll many resources for Utilities.wait: every page of a list_* call, then show_* for the IDs the list did
+        not return (they count as gone only when show_* answers 404).
+
+        Args:
+            iterate: [require] iterate() -> resources of every page (e.g. ComputeAPI.iter_servers_detailed)
+            show: [require] show(id) -> envelope (e.g. ComputeAPI.show_server_details)
+            resource_ids: [require] IDs waited for
+            single_key: [require] Key of the resource in a show_* response (e.g. server)
+            list_key: [require] Key of the array in a list_* response (e.g. servers)
+            max_workers: [optional] Concurrency cap of the show_* calls
+        Returns:
+            dict: envelope {'status': 'success', 'data': {list_key: [waited resources found]}} (complete list), or
+                  the error envelope of the failed request
+        """
+        wanted = set(resource_ids)
         try:
-            response = requests.delete(url, headers=headers, params=params, timeout=timeout)
-            response.raise_for_status()
-            return {
-                'status': 'success',
-                'data': None,
-                'message': None
-            }
-        except HTTPError as http_err:
-            return {
-                'status': 'error',
-                'data': None,
-                'message': http_err.response.json()
-            }
-        except Timeout as timeout_err:
-            return {
-                'status': 'error',
-                'data': None,
-                'message': timeout_err.response.json()
-            }
-        except RequestException as req_err:
-            return {
-                'status': 'error',
-                'data': None,
-                'message': req_err.response.json()
-            }
-        except Exception as err:
-            return {
-                'status': 'error',
-                'data': None,
-                'message': err
-            }
+            found = [resource for resource in iterate() if resource.get('id') in wanted]
+        except APIError as err:
+            return err.response
+        seen = {resource['id'] for resource in found}
+        missing = [resource_id for resource_id in resource_ids if resource_id not in seen]
+        for resource_id, response in Utilities.fan_out(show, missing, max_workers=max_workers):
+            if response['status'] == 'success':
+                found.append(response['data'][single_key])
+            elif not _is_not_found(response):
+                return response
+        return Result('success', data={list_key: found})
+
+
+    @staticmethod
+    def wait(fetch: Callable[[List[str]], dict], resource_ids: Union[str, Iterable[str]], target: Iterable[str],
+             failure: Iterable[str], single_key: str, list_key: str, status_key: str = "status",
+             policy: WaitPolicy = None):
+        """
+        Poll until every resource reaches a status in `target`.
+
+        The poll interval starts at policy.delay, grows by policy.backoff while nothing changes and goes back to
+        policy.delay when a resource changes status.
+
+        Args:
+            fetch: [require] fetch(pending ids) -> envelope of a show_* call (one ID) or a list_* call (many IDs)
+            resource_ids: [require] ID, or IDs
+            target: [require] Statuses that end the wait (waiters.DELETED: until the resource is gone)
+            failure: [require] Statuses that raise WaiterError
+            single_key: [require] Key of the resource in a show_* response (e.g. backup)
+            list_key: [require] Key of the array in a list_* response (e.g. backups)
+            status_key: [optional] Key of the status in the resource
+            policy: [optional] WaitPolicy
+        Returns:
+            dict: the resource when resource_ids is a str, otherwise {id: resource}
+        Raises:
+            WaiterError: a resource reached a failure status or disappeared
+            WaitTimeout: policy.timeout passed first
+        """
+        policy = policy or WaitPolicy()
+        state = WaitState([resource_ids] if isinstance(resource_ids, str) else resource_ids, target, failure, status_key)
+        deadline = time.monotonic() + policy.timeout
+        delay = policy.delay
+        while state.pending:
+            pending = state.pending
+            progressed = state.poll(fetch(pending), pending, single_key, list_key)
+            if not state.pending:
+                break
+            if time.monotonic() >= deadline:
+                raise state.timeout()
+            time.sleep(policy.sleep_time(delay, deadline))
+            delay = policy.next_delay(delay, progressed)
+        return state.result(resource_ids)
+
+
+
+def _error_envelope(message, retries: int) -> Result:
+    return Result('error', retries=retries, message=message)
+
+
+def _circuit_open_envelope(breaker: CircuitBreaker, url: str, retries: int) -> dict:
+    return _error_envelope('Circuit breaker is open for {}: the service is failing, request not sent'.format(
+        breaker.key(url)), retries)
+
+
+def _record(breaker: CircuitBreaker, url: str, success, latency: float = None):
+    """
+    Report the outcome of an attempt to the circuit breaker (if any).
+    success None: the attempt says nothing about the service; only releases a half-open probe slot.
+    """
+    if breaker is None:
+        return
+    if success is None:
+        breaker.release(url)
+    else:
+        breaker.record(url, success, latency)
+
+
+def _submit(executor: ThreadPoolExecutor, func: Callable, *args):
+    """
+    executor.submit, running `func` under the caller's current span (worker threads do not inherit contextvars).
+    """
+    if current_span() is None:
+        return executor.submit(func, *args)
+    return executor.submit(contextvars.copy_context().run, func, *args)
+
+
+def _instrument(transport, method: str, url: str, json_data, response: Result, cache_state: str = None):
+    """
+    Pass a RequestEvent for the finished request to the hooks of the transport.
+    """
+    if cache_state == "miss" and response.status_code == 304:
+        cache_state = "revalidated"
+    emit(transport.hooks, build_event(method, url, response, json_data, cache_state))
+
+
+def _wait_for_retry(policy: RetryPolicy, method: str, retries: int, deadline: float, headers: dict = None) -> bool:
+    """
+    Sleep before the next attempt if the policy allows one within the deadline.
+
+    Returns:
+        bool: True when the request should be retried
+    """
+    if not policy.allows(method, retries):
+        return False
+    delay = policy.delay(retries, headers)
+    left = remaining(deadline)
+    if left is not None and delay >= left:
+        return False
+    time.sleep(delay)
+    return True
+
+
+def _bulk_failure(list_key: str, items: List[dict], failed_at: int, chunk_size: int, created: List[dict],
+                  response: dict, deleted: Dict[str, dict], retries: int) -> Result:
+    # 404 はすでに削除済みなのでロールバック成功とみなす
+    rolled_back = [resource_id for resource_id, result in deleted.items()
+                   if result['status'] == 'success' or getattr(result, 'status_code', None) == 404]
+    done = set(rolled_back)
+    rollback_errors = {resource_id: result['message'] for resource_id, result in deleted.items()
+                       if resource_id not in done}
+    message = "Bulk create of {} failed for items {}-{} of {}: {}".format(
+        list_key, failed_at + 1, min(failed_at + chunk_size, len(items)), len(items), response['message'])
+    if rollback_errors:
+        message += " (rollback failed for {} of {} created)".format(len(rollback_errors), len(created))
+    data = {
+        list_key: [resource for resource in created if resource["id"] not in done],
+        "failed": items[failed_at:],
+        "rolled_back": rolled_back,
+        "rollback_errors": rollback_errors,
+    }
+    return Result('error', status_code=getattr(response, 'status_code', None), retries=retries, message=message,
+                  data=data)
+
+
+def _result_or_error(future) -> dict:
+    try:
+        return future.result()
+    except Exception as err:
+        return _error_envelope(str(err), 0)
+
+
+def _first_page(url: str, params: dict, limit: int):
+    params = dict(params or {})
+    if limit is not None:
+        params["limit"] = limit
+    return url, params
+
+
+def _next_page(body: dict, resource_key: str, count: int, last: dict, page: tuple, limit: int):
+    """
+    Args:
+        count: number of resources in the page
+        last: last resource of the page
+    Returns:
+        tuple: (url, params) of the next page, or None on the last page
+    """
+    for link in body.get(resource_key + "_links") or []:
+        if link.get("rel") == "next":
+            # next の href には limit/marker を含むクエリが付いている
+            return link["href"], None
+    url, params = page
+    if params is not None and limit is not None and count >= limit and "id" in last:
+        return url, dict(params, marker=last["id"])
+    return None
+
+
+
+def build_query(filters: dict = None, **params) -> dict:
+    """
+    Build query parameters for the list APIs.
+
+    None values are dropped, `changes_since` becomes `changes-since`, bools become "true"/"false",
+    datetimes become ISO 8601 and lists (e.g. fields) are sent as repeated parameters.
+
+    Args:
+        filters: [optional] Extra query parameters passed through as is
+        params: typed keyword parameters of the list method
+    Returns:
+        dict: query parameters
+    """
+    query: dict = {}
+    for key, value in dict(params, **(filters or {})).items():
+        if value is None:
+            continue
+        if key == "changes_since":
+            key = "changes-since"
+        if isinstance(value, bool):
+            value = "true" if value else "false"
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        elif isinstance(value, (list, tuple, set)):
+            value = list(value)
+        query[key] = value
+    return query
 
 
 
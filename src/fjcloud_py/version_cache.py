@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from typing import Callable
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ApiVersionCache:
+    """
+    Cache of the CURRENT microversion discovered per (service, region, endpoint URL).
+
+    Entries live in memory and, when `path` is given, in a JSON file so that
+    new processes can construct ComputeAPI/BlockstorageAPI without the GET /.
+
+    Args:
+        path: [optional] On-disk cache file
+        ttl: [optional] Seconds a discovered version is trusted
+    """
+    def __init__(self, path: str = None, ttl: int = 86400):
+        self.path: str = os.path.expanduser(path) if path else None
+        self.ttl: int = ttl
+        self._entries: dict = {}
+        self._lock = threading.Lock()
+        self._discover_locks: dict = {}
+
+
+    @staticmethod
+    def key(service: str, region: str, endpoint: str = None) -> str:
+        # 同じサービス・リージョンでもエンドポイント(本番と FakeCloud など)ごとに分ける
+        return "{}|{}|{}".format(service, region, (endpoint or "").rstrip("/"))
+
+
+    def get(self, service: str, region: str, endpoint: str = None):
+        """
+        Args:
+            endpoint: [optional] Base URL of the service (API class base_url)
+        Returns:
+            str: version or None when unknown/expired
+        """
+        key = self.key(service, region, endpoint)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and self.path:
+                entry = self._read_file().get(key)
+                if entry is not None:
+                    self._entries[key] = entry
+        if entry is None or entry["stored_at"] + self.ttl <= time.time():
+            return None
+        return entry["version"]
+
+
+    def put(self, service: str, region: str, version: str, endpoint: str = None):
+        key = self.key(service, region, endpoint)
+        entry = {"version": version, "stored_at": time.time()}
+        with self._lock:
+            self._entries[key] = entry
+            if self.path:
+                entries = self._read_file()
+                entries[key] = entry
+                self._write_file(entries)
+
+
+    def get_or_discover(self, service: str, region: str, discover: Callable[[], str], endpoint: str = None) -> str:
+        """
+        Args:
+            discover: Called (once per key even with concurrent callers) when the version is not cached
+            endpoint: [optional] Base URL of the service
+        Returns:
+            str: version
+        """
+        version = self.get(service, region, endpoint)
+        if version is not None:
+            return version
+        with self._lock:
+            discover_lock = self._discover_locks.setdefault(self.key(service, region, endpoint), threading.Lock())
+        with discover_lock:
+            version = self.get(service, region, endpoint)
+            if version is None:
+                version = discover()
+                self.put(service, region, version, endpoint)
+            return version
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            if self.path and os.path.exists(self.path):
+                os.remove(self.path)
+
+
+    def _read_file(self) -> dict:
+        try:
+            with open(self.path, "r") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+
+    def _write_file(self, entries: dict):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".fjcloud-versions-")
+        with os.fdopen(fd, "w") as f:
+            json.dump(entries, f)
+        os.replace(tmp_path, self.path)
+
+
+_default_version_cache = ApiVersionCache()
+
+
+def default_version_cache() -> ApiVersionCache:
+    """
+    Returns:
+        ApiVersionCache: Process wide in-memory version cache
+    """
+    return _default_version_cache
@@ -3,24 +3,53 @@
 from tokenize import endpats
 
 from .auth import AuthManager
-from .utils import Utilities
+from .transport import Transport
+from .utils import Utilities, build_query
+from .waiters import WaitPolicy
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 
 class VpnServiceAPI:
+    utilities = Utilities
+
     def __init__(self, client: AuthManager):
         self.client: AuthManager = client
-        self.token = client.token
         self.region = client.region
-        self.base_url: str = "https://nfv.{region}.cloud.global.fujitsu.com".format(region=self.region)
-        self.headers: dict = {"Accept": "application/json", "X-Auth-Token": self.token}
+        self.transport: Transport = client.transport
+        self.base_url: str = client.endpoint_for(
+            "nfv", "https://nfv.{region}.cloud.global.fujitsu.com"
+        )
+
+
+    @property
+    def token(self) -> str:
+        return self.client.token
+
+
+    @property
+    def headers(self) -> dict:
+        return {"Accept": "application/json", "X-Auth-Token": self.client.token}
 
 
     """VPN Service
     """
-    def list_vpn_services(self):
+    def list_vpn_services(self, status: str = None, name: str = None, fields: List[str] = None, sort_key: str = None,
+                          sort_dir: str = None, filters: dict = None):
+        """
+        Args:
+            status: [optional] VPN service status (ACTIVE, DOWN, PENDING_CREATE, ERROR, ...)
+            name: [optional] Name of the VPN service
+            fields: [optional] Attributes to return (e.g. ["id", "name"])
+            sort_key: [optional] Sort key
+            sort_dir: [optional] asc | desc
+            filters: [optional] Other query parameters
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
         uri = "/vpn/nfv/vpnservices"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers, timeout=120)
+        params = build_query(filters, status=status, name=name, fields=fields, sort_key=sort_key, sort_dir=sort_dir)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, timeout=120, transport=self.transport, auth=self.client)
 
         return response
 
@@ -28,7 +57,7 @@ class VpnServiceAPI:
     def create_vpn_service(self, request_parameters: dict = None):
         uri = "/vpn/nfv/vpnservices"
         endpoint = self.base_url + uri
-        response = Utilities.post(endpoint, headers=self.headers, json_data=request_parameters, timeout=120)
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_parameters, timeout=120, transport=self.transport, auth=self.client)
 
         return response
 
@@ -36,11 +65,70 @@ class VpnServiceAPI:
     def show_vpn_service_details(self, vpnservice_id: str):
         uri = "/vpn/nfv/vpnservices/{vpnservice_id}".format(vpnservice_id=vpnservice_id)
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers, timeout=120)
+        response = self.utilities.get(endpoint, headers=self.headers, timeout=120, transport=self.transport, auth=self.client)
 
         return response
 
 
+    def show_vpn_service_details_many(self, vpnservice_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        show_vpn_service_details for many IDs concurrently over the shared connection pool.
+
+        Args:
+            vpnservice_ids: [require] VPN service IDs
+            max_workers: [optional] Max requests in flight (keep <= Transport.pool_maxsize)
+        Returns:
+            dict: {vpnservice id: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}}
+        """
+        return self.utilities.gather(self.show_vpn_service_details, vpnservice_ids, max_workers=max_workers)
+
+
+    def iter_vpn_service_details_many(self, vpnservice_ids: Iterable[str], max_workers: int = 8) -> Iterator[Tuple[str, dict]]:
+        """
+        Same as show_vpn_service_details_many, yielding (vpnservice id, envelope) as each request completes.
+        """
+        return self.utilities.fan_out(self.show_vpn_service_details, vpnservice_ids, max_workers=max_workers)
+
+
+    def wait_for_vpn_service(self, vpnservice_id: str, target: Iterable[str] = ("ACTIVE",),
+                             failure: Iterable[str] = ("ERROR",), policy: WaitPolicy = None) -> dict:
+        """
+        Wait until the VPN service reaches a target status (e.g. after create_vpn_service/update_vpn_service).
+
+        Args:
+            vpnservice_id: [require] VPN service ID
+            target: [optional] Statuses that end the wait (waiters.DELETED: until the VPN service is gone)
+            failure: [optional] Statuses that raise WaiterError
+            policy: [optional] WaitPolicy (poll interval and deadline)
+        Returns:
+            dict: vpnservice
+        Raises:
+            WaiterError: the VPN service reached a failure status or disappeared
+            WaitTimeout: policy.timeout passed first
+        """
+        return self.utilities.wait(self._poll_vpn_services, vpnservice_id, target, failure, "vpnservice",
+                                   "vpnservices", policy=policy)
+
+
+    def wait_for_vpn_services(self, vpnservice_ids: Iterable[str], target: Iterable[str] = ("ACTIVE",),
+                              failure: Iterable[str] = ("ERROR",), policy: WaitPolicy = None) -> Dict[str, dict]:
+        """
+        Same as wait_for_vpn_service for many VPN services, polling them with one list_vpn_services call per tick.
+
+        Returns:
+            dict: {vpnservice id: vpnservice}
+        """
+        return self.utilities.wait(self._poll_vpn_services, list(vpnservice_ids), target, failure, "vpnservice",
+                                   "vpnservices", policy=policy)
+
+
+    def _poll_vpn_services(self, vpnservice_ids: List[str]):
+        if len(vpnservice_ids) == 1:
+            return self.show_vpn_service_details(vpnservice_ids[0])
+        # id を複数指定して待っているものだけを取得する
+        return self.list_vpn_services(filters={"id": vpnservice_ids})
+
+
     def update_vpn_service(self, vpnservice_id: str, request_parameters: dict = None):
         """
         Args:
@@ -50,13 +138,15 @@ class VpnServiceAPI:
         """
         uri = "/vpn/nfv/vpnservices/{vpnservice_id}".format(vpnservice_id=vpnservice_id)
         endpoint = self.base_url + uri
-        response = Utilities.put(endpoint, headers=self.headers, json_data=request_parameters, timeout=120)
+        response = self.utilities.put(endpoint, headers=self.headers, json_data=request_parameters, timeout=120, transport=self.transport, auth=self.client)
+
+        return response
 
 
     def delete_vpn_service(self, vpnservice_id: str):
         uri = f"/vpn/nfv/vpnservices/{vpnservice_id}".format(vpnservice_id=vpnservice_id)
         endpoint = self.base_url + uri
-        response = Utilities.delete(endpoint, headers=self.headers, timeout=120)
+        response = self.utilities.delete(endpoint, headers=self.headers, timeout=120, transport=self.transport, auth=self.client)
 
         return response
 
@@ -64,10 +154,23 @@ class VpnServiceAPI:
 
     """IPsec Site Connection
     """
-    def list_ipsec_site_connections(self):
+    def list_ipsec_site_connections(self, status: str = None, name: str = None, fields: List[str] = None, sort_key: str = None,
+                                    sort_dir: str = None, filters: dict = None):
+        """
+        Args:
+            status: [optional] Connection status (ACTIVE, DOWN, PENDING_CREATE, ERROR, ...)
+            name: [optional] Name of the connection
+            fields: [optional] Attributes to return (e.g. ["id", "name"])
+            sort_key: [optional] Sort key
+            sort_dir: [optional] asc | desc
+            filters: [optional] Other query parameters
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
         uri = "/vpn/nfv/ipsec-site-connections"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        params = build_query(filters, status=status, name=name, fields=fields, sort_key=sort_key, sort_dir=sort_dir)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
@@ -75,15 +178,65 @@ class VpnServiceAPI:
     def show_ipsec_site_connection_details(self, connection_id: str):
        uri = "/vpn/nfv/ipsec-site-connections/{connection_id}".format(connection_id=connection_id)
        endpoint = self.base_url + uri
-       response = Utilities.get(endpoint, headers=self.headers)
+       response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
        return response
 
 
+    def show_ipsec_site_connection_details_many(self, connection_ids: Iterable[str], max_workers: int = 8) -> Dict[str, dict]:
+        """
+        show_ipsec_site_connection_details for many IDs concurrently over the shared connection pool.
+
+        Args:
+            connection_ids: [require] Connection IDs
+            max_workers: [optional] Max requests in flight (keep <= Transport.pool_maxsize)
+        Returns:
+            dict: {connection id: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}}
+        """
+        return self.utilities.gather(self.show_ipsec_site_connection_details, connection_ids, max_workers=max_workers)
+
+
+    def iter_ipsec_site_connection_details_many(self, connection_ids: Iterable[str], max_workers: int = 8) -> Iterator[Tuple[str, dict]]:
+        """
+        Same as show_ipsec_site_connection_details_many, yielding (connection id, envelope) as each request completes.
+        """
+        return self.utilities.fan_out(self.show_ipsec_site_connection_details, connection_ids, max_workers=max_workers)
+
+
+    def wait_for_ipsec_site_connection(self, connection_id: str, target: Iterable[str] = ("ACTIVE",),
+                                       failure: Iterable[str] = ("ERROR",), policy: WaitPolicy = None) -> dict:
+        """
+        Wait until the IPsec site connection reaches a target status. Args/Raises: same as wait_for_vpn_service.
+
+        Returns:
+            dict: ipsec_site_connection
+        """
+        return self.utilities.wait(self._poll_ipsec_site_connections, connection_id, target, failure,
+                                   "ipsec_site_connection", "ipsec_site_connections", policy=policy)
+
+
+    def wait_for_ipsec_site_connections(self, connection_ids: Iterable[str], target: Iterable[str] = ("ACTIVE",),
+                                        failure: Iterable[str] = ("ERROR",), policy: WaitPolicy = None) -> Dict[str, dict]:
+        """
+        Same as wait_for_ipsec_site_connection for many connections, one list call per tick.
+
+        Returns:
+            dict: {connection id: ipsec_site_connection}
+        """
+        return self.utilities.wait(self._poll_ipsec_site_connections, list(connection_ids), target, failure,
+                                   "ipsec_site_connection", "ipsec_site_connections", policy=policy)
+
+
+    def _poll_ipsec_site_connections(self, connection_ids: List[str]):
+        if len(connection_ids) == 1:
+            return self.show_ipsec_site_connection_details(connection_ids[0])
+        return self.list_ipsec_site_connections(filters={"id": connection_ids})
+
+
     def create_ipsec_site_connection(self, request_parameters: dict = None):
         uri = "/vpn/nfv/ipsec-site-connections"
         endpoint = self.base_url + uri
-        response = Utilities.post(endpoint, headers=self.headers, json_data=request_parameters)
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_parameters, transport=self.transport, auth=self.client)
 
         return response
 
@@ -91,7 +244,7 @@ class VpnServiceAPI:
     def update_ipsec_site_connection(self, connection_id: str, request_parameters: dict):
         uri = "/vpn/nfv/ipsec-site-connections/{connection_id}".format(connection_id=connection_id)
         endpoint = self.base_url + uri
-        response = Utilities.put(endpoint, headers=self.headers, json_data=request_parameters)
+        response = self.utilities.put(endpoint, headers=self.headers, json_data=request_parameters, transport=self.transport, auth=self.client)
 
         return response
 
@@ -99,7 +252,7 @@ class VpnServiceAPI:
     def delete_ipsec_site_connection(self, connection_id: str):
         uri = "/vpn/nfv/ipsec-site-connections/{connection_id}".format(connection_id=connection_id)
         endpoint = self.base_url + uri
-        response = Utilities.delete(endpoint, headers=self.headers)
+        response = self.utilities.delete(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
@@ -107,10 +260,22 @@ class VpnServiceAPI:
 
     """IPsec Policy
     """
-    def list_ipsec_policies(self):
+    def list_ipsec_policies(self, name: str = None, fields: List[str] = None, sort_key: str = None,
+                            sort_dir: str = None, filters: dict = None):
+        """
+        Args:
+            name: [optional] Name of the policy
+            fields: [optional] Attributes to return (e.g. ["id", "name"])
+            sort_key: [optional] Sort key
+            sort_dir: [optional] asc | desc
+            filters: [optional] Other query parameters
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
         uri = "/vpn/nfv/ipsecpolicies"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        params = build_query(filters, name=name, fields=fields, sort_key=sort_key, sort_dir=sort_dir)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
@@ -118,7 +283,7 @@ class VpnServiceAPI:
     def show_ipsec_policy_details(self, policy_id: str):
         uri = "/vpn/nfv/ipsecpolicies/{policy_id}".format(policy_id=policy_id)
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
@@ -146,7 +311,7 @@ class VpnServiceAPI:
         else:
             request_data = request_parameters
 
-        response = Utilities.post(endpoint, headers=self.headers, json_data=request_data)
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_data, transport=self.transport, auth=self.client)
         """TODO
         応答がJSONぽいがJSON形式で取得するとエラーになる
         {"ipsecpolicy": {"id":"1594369",}}
@@ -159,7 +324,7 @@ class VpnServiceAPI:
     def update_ipsec_policy(self, policy_id: str, request_parameters: dict):
         uri = "/vpn/nfv/ipsecpolicies/{policy_id}".format(policy_id=policy_id)
         endpoint = self.base_url + uri
-        response = Utilities.put(endpoint, headers=self.headers, json_data=request_parameters)
+        response = self.utilities.put(endpoint, headers=self.headers, json_data=request_parameters, transport=self.transport, auth=self.client)
 
         return response
 
@@ -167,7 +332,7 @@ class VpnServiceAPI:
     def delete_ipsec_policy(self, ipsecpolicy_id: str):
         uri = "/vpn/nfv/ipsecpolicies/{ipsecpolicy_id}".format(ipsecpolicy_id=ipsecpolicy_id)
         endpoint = self.base_url + uri
-        response = Utilities.delete(endpoint, headers=self.headers)
+        response = self.utilities.delete(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
@@ -175,10 +340,22 @@ class VpnServiceAPI:
 
     """IKE Policy
     """
-    def list_ike_policies(self):
+    def list_ike_policies(self, name: str = None, fields: List[str] = None, sort_key: str = None,
+                          sort_dir: str = None, filters: dict = None):
+        """
+        Args:
+            name: [optional] Name of the policy
+            fields: [optional] Attributes to return (e.g. ["id", "name"])
+            sort_key: [optional] Sort key
+            sort_dir: [optional] asc | desc
+            filters: [optional] Other query parameters
+        Returns:
+            dict: {'status': ['success'|'error'], 'data': [data|None], 'message': [message|None]}
+        """
         uri = "/vpn/nfv/ikepolicies"
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        params = build_query(filters, name=name, fields=fields, sort_key=sort_key, sort_dir=sort_dir)
+        response = self.utilities.get(endpoint, headers=self.headers, params=params, transport=self.transport, auth=self.client)
 
         return response
 
@@ -186,7 +363,7 @@ class VpnServiceAPI:
     def show_ike_policy_details(self, policy_id: str):
         uri = "/vpn/nfv/ikepolicies/{policy_id}".format(policy_id=policy_id)
         endpoint = self.base_url + uri
-        response = Utilities.get(endpoint, headers=self.headers)
+        response = self.utilities.get(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
 
@@ -212,7 +389,7 @@ class VpnServiceAPI:
             request_data = default_policy
         else:
             request_data = request_parameters
-        response = Utilities.post(endpoint, headers=self.headers, json_data=request_data)
+        response = self.utilities.post(endpoint, headers=self.headers, json_data=request_data, transport=self.transport, auth=self.client)
 
         return response
 
@@ -220,7 +397,7 @@ class VpnServiceAPI:
     def update_ike_policy(self, policy_id: str, request_parameters: dict):
         uri = "/vpn/nfv/ikepolicies/{policy_id}".format(policy_id=policy_id)
         endpoint = self.base_url + uri
-        response = Utilities.put(endpoint, headers=self.headers, json_data=request_parameters)
+        response = self.utilities.put(endpoint, headers=self.headers, json_data=request_parameters, transport=self.transport, auth=self.client)
 
         return response
 
@@ -228,6 +405,6 @@ class VpnServiceAPI:
     def delete_ike_policy(self, ikepolicy_id: str):
         uri = "/vpn/nfv/ikepolicies/{ikepolicy_id}".format(ikepolicy_id=ikepolicy_id)
         endpoint = self.base_url + uri
-        response = Utilities.delete(endpoint, headers=self.headers)
+        response = self.utilities.delete(endpoint, headers=self.headers, transport=self.transport, auth=self.client)
 
         return response
@@ -0,0 +1,192 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Waiters for resources that become ready asynchronously (backups, servers, VPN services, ...).
+
+    backup = blockstorage.create_backup(request)['data']['backup']
+    backup = blockstorage.wait_for_backup(backup['id'], target={"available"})
+
+    # many resources: one list call per poll tick instead of one show call per resource
+    backups = blockstorage.wait_for_backups(backup_ids, policy=WaitPolicy(timeout=3600))
+"""
+
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+import random
+import time
+
+
+# 削除待ちの target に指定する(リソースが見つからなくなったら完了)
+DELETED: str = "DELETED"
+
+
+@dataclass
+class WaitPolicy:
+    """
+    Attributes:
+        delay (float): First poll interval in seconds; the interval goes back to it whenever a resource changes status.
+        max_delay (float): Upper bound of the poll interval.
+        backoff (float): Interval multiplier applied after a tick in which nothing changed.
+        timeout (float): Overall deadline of the wait in seconds.
+        jitter (float): Random +/- fraction applied to every interval so that many waiters do not poll in lockstep.
+    """
+    delay: float = 2.0
+    max_delay: float = 30.0
+    backoff: float = 1.5
+    timeout: float = 1800.0
+    jitter: float = 0.1
+
+
+    def next_delay(self, current: float, progressed: bool) -> float:
+        if progressed:
+            return self.delay
+        return min(self.max_delay, current * self.backoff)
+
+
+    def sleep_time(self, current: float, deadline: float) -> float:
+        """
+        Returns:
+            float: jittered interval, bounded by the time left until `deadline` (time.monotonic)
+        """
+        delay = current * random.uniform(1 - self.jitter, 1 + self.jitter)
+        return max(min(delay, deadline - time.monotonic()), 0.0)
+
+
+class WaiterError(Exception):
+    """
+    Raised when a waited resource reaches a failure status or disappears.
+
+    Attributes:
+        resource_id (str): ID of the resource
+        resource (Optional[dict]): last seen resource (None when it disappeared)
+    """
+    def __init__(self, message: str, resource_id: str = None, resource: Optional[dict] = None):
+        self.resource_id: str = resource_id
+        self.resource: Optional[dict] = resource
+        super().__init__(message)
+
+
+class WaitTimeout(WaiterError):
+    """
+    Raised when the deadline passes before every resource reached a target status.
+
+    Attributes:
+        pending (Dict[str, Optional[dict]]): {id: last seen resource} of the resources still not ready
+        done (Dict[str, Optional[dict]]): {id: resource} of the resources that were ready
+        last_error: message of the last failed poll request, if any
+    """
+    def __init__(self, message: str, pending: dict, done: dict, last_error=None):
+        self.pending: dict = pending
+        self.done: dict = done
+        self.last_error = last_error
+        super().__init__(message)
+
+
+class WaitState:
+    """
+    Bookkeeping shared by Utilities.wait and AsyncUtilities.wait.
+
+    Args:
+        resource_ids: [require] IDs to wait for
+        target: [require] Statuses that end the wait (DELETED: until the resource is gone)
+        failure: [require] Statuses that raise WaiterError
+        status_key: [optional] Key of the status in the resource
+    """
+    def __init__(self, resource_ids: Iterable[str], target: Iterable[str], failure: Iterable[str],
+                 status_key: str = "status"):
+        self.target: FrozenSet[str] = frozenset(target)
+        self.failure: FrozenSet[str] = frozenset(failure or ())
+        self.status_key: str = status_key
+        self.last_seen: Dict[str, Optional[dict]] = {resource_id: None for resource_id in resource_ids}
+        self.done: Dict[str, Optional[dict]] = {}
+        self.last_error = None
+
+
+    @property
+    def pending(self) -> List[str]:
+        return [resource_id for resource_id in self.last_seen if resource_id not in self.done]
+
+
+    def update(self, found: Dict[str, dict], gone: Iterable[str]) -> bool:
+        """
+        Args:
+            found: {id: resource} seen in this tick
+            gone: IDs known not to exist any more
+        Returns:
+            bool: True when any pending resource changed status
+        Raises:
+            WaiterError: a resource reached a failure status or disappeared
+        """
+        progressed = False
+        for resource_id in gone:
+            if resource_id in self.done:
+                continue
+            if DELETED not in self.target:
+                raise WaiterError("{} disappeared while waiting".format(resource_id), resource_id,
+                                  self.last_seen.get(resource_id))
+            self.done[resource_id] = None
+            progressed = True
+        for resource_id, resource in found.items():
+            if resource_id not in self.last_seen or resource_id in self.done:
+                continue
+            status = resource.get(self.status_key)
+            previous = self.last_seen[resource_id]
+            if previous is None or previous.get(self.status_key) != status:
+                progressed = True
+            self.last_seen[resource_id] = resource
+            if status in self.failure:
+                raise WaiterError("{} reached status {}".format(resource_id, status), resource_id, resource)
+            if status in self.target:
+                self.done[resource_id] = resource
+        return progressed
+
+
+    def poll(self, response: dict, pending: List[str], single_key: str, list_key: str) -> bool:
+        """
+        update() from the envelope of a show_* or list_* call.
+        """
+        if response['status'] != 'success':
+            self.last_error = response['message']
+        return self.update(*extract(response, pending, single_key, list_key))
+
+
+    def result(self, resource_ids):
+        return self.done[resource_ids] if isinstance(resource_ids, str) else dict(self.done)
+
+
+    def timeout(self) -> WaitTimeout:
+        pending = {resource_id: self.last_seen[resource_id] for resource_id in self.pending}
+        statuses = {resource_id: (resource or {}).get(self.status_key) for resource_id, resource in pending.items()}
+        return WaitTimeout("Timed out waiting for {}".format(statuses), pending, dict(self.done), self.last_error)
+
+
+def extract(response: dict, pending: List[str], single_key: str, list_key: str) -> Tuple[Dict[str, dict], List[str]]:
+    """
+    Read a poll response (show_* or list_* envelope).
+
+    A resource missing from a list response counts as gone only when the list is complete (no next link);
+    a show_* 404 (HTTP status) counts as gone.
+
+    Returns:
+        tuple: ({id: resource} found, [ids] gone). ({}, []) when the request failed.
+    """
+    if response['status'] != 'success':
+        if len(pending) == 1 and _is_not_found(response):
+            return {}, list(pending)
+        return {}, []
+    data = response['data'] or {}
+    if single_key in data:
+        resource = data[single_key]
+        return {resource['id']: resource}, []
+    found = {resource['id']: resource for resource in data.get(list_key, []) if resource.get('id') in pending}
+    complete = not any(link.get("rel") == "next" for link in data.get(list_key + "_links") or [])
+    gone = [resource_id for resource_id in pending if resource_id not in found] if complete else []
+    return found, gone
+
+
+def _is_not_found(response: dict) -> bool:
+    # エラーメッセージの文字列ではなく HTTP ステータスで判定する
+    status_code = getattr(response, "status_code", None)
+    if status_code is None and isinstance(response, dict):
+        status_code = response.get("status_code")
+    return status_code == 404
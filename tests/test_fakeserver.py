@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import time
+
+import requests
+
+from fjcloud_py.auth import AuthManager
+from fjcloud_py.fakeserver import FakeCloud
+from fjcloud_py.token_cache import TokenCache
+
+
+def get(cloud: FakeCloud, path: str, **headers) -> requests.Response:
+    client = AuthManager(cloud.credential(), endpoint_overrides=cloud.endpoints, token_cache=TokenCache())
+    return requests.get(cloud.url + path, headers=dict(headers, **{"X-Auth-Token": client.token}))
+
+
+def test_network_is_not_rewritten_on_read():
+    with FakeCloud() as cloud:
+        network = cloud.seed("networks", 1)[0]
+        path = "/networking/v2.0/networks/" + network["id"]
+        first = get(cloud, path)
+        time.sleep(0.01)
+        second = get(cloud, path)
+        assert first.json()["network"]["updated_at"] == second.json()["network"]["updated_at"]
+        assert first.headers["ETag"] == second.headers["ETag"]
+        assert get(cloud, path, **{"If-None-Match": first.headers["ETag"]}).status_code == 304
+
+
+def test_changed_since_skips_networks_only_read():
+    with FakeCloud() as cloud:
+        cloud.seed("networks", 3)
+        get(cloud, "/networking/v2.0/networks")
+        time.sleep(1.1)
+        since = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        get(cloud, "/networking/v2.0/networks")
+        assert get(cloud, "/networking/v2.0/networks?changed_since=" + since).json()["networks"] == []
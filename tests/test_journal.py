@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import asyncio
+import socket
+
+import pytest
+import requests
+
+from fjcloud_py.aio import AsyncReplayTransport
+from fjcloud_py.auth import AuthManager
+from fjcloud_py.fakeserver import FakeCloud
+from fjcloud_py.journal import JournalWriter, ReplayTransport, read_journal
+from fjcloud_py.token_cache import TokenCache
+from fjcloud_py.transport import Transport
+from fjcloud_py.utils import Utilities
+
+
+def closed_port_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return "http://127.0.0.1:{}/".format(sock.getsockname()[1])
+
+
+def test_stream_is_recorded_as_it_is_read(tmp_path):
+    path = str(tmp_path / "journal.jsonl.gz")
+    with FakeCloud() as cloud:
+        cloud.seed("networks", 3)
+        writer = JournalWriter(path)
+        recorded = []
+        record = writer.record
+
+        def recording(method, *args, **kwargs):
+            recorded.append(method)
+            record(method, *args, **kwargs)
+
+        writer.record = recording
+        transport = Transport(journal=writer)
+        client = AuthManager(cloud.credential(), transport=transport, endpoint_overrides=cloud.endpoints,
+                             token_cache=TokenCache())
+        url = cloud.url + "/networking/v2.0/networks"
+        response = transport.request("GET", url, headers={"X-Auth-Token": client.token}, stream=True)
+        assert recorded == ["POST"]
+        assert not response._content_consumed
+        names = [network["name"] for network in response.json()["networks"]]
+        response.close()
+        writer.close()
+        assert recorded == ["POST", "GET"]
+
+    replay = ReplayTransport(path, timing="fast")
+    replayed = Utilities.stream(url, "networks", headers={"X-Auth-Token": "t"}, transport=replay)
+    assert [network["name"] for network in replayed] == names
+
+
+def test_exceptions_are_recorded_and_replayed(tmp_path):
+    path = str(tmp_path / "journal.jsonl.gz")
+    refused = closed_port_url()
+    with FakeCloud(latency=0.5) as cloud:
+        slow = cloud.url + "/networking/v2.0/networks"
+        with JournalWriter(path) as writer:
+            transport = Transport(journal=writer)
+            with pytest.raises(requests.exceptions.ConnectionError):
+                transport.request("GET", refused, timeout=1)
+            with pytest.raises(requests.exceptions.ReadTimeout):
+                transport.request("GET", slow, timeout=0.05)
+
+    assert [entry["error"]["kind"] for entry in read_journal(path)] == ["connection", "timeout"]
+    replay = ReplayTransport(path, timing="fast")
+    with pytest.raises(requests.exceptions.ConnectionError):
+        replay.request("GET", refused)
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        replay.request("GET", slow)
+
+    async def replay_async():
+        transport = AsyncReplayTransport(path, timing="fast")
+        with pytest.raises(aiohttp.ClientConnectionError):
+            async with transport.request("GET", refused):
+                pass
+        with pytest.raises(asyncio.TimeoutError):
+            async with transport.request("GET", slow):
+                pass
+
+    aiohttp = pytest.importorskip("aiohttp")
+    asyncio.run(replay_async())
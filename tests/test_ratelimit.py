@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from fjcloud_py.ratelimit import RateLimit, RateLimiter
+
+
+COMPUTE = "https://compute.jp-east-1.cloud.global.fujitsu.com/v2.1/servers"
+
+
+def test_wildcard_rule_keeps_a_bucket_per_endpoint_and_method():
+    limiter = RateLimiter({("*", "*"): RateLimit(rate=1, burst=1)})
+    assert limiter.reserve("GET", COMPUTE) == 0.0
+    assert limiter.reserve("POST", COMPUTE) == 0.0
+    assert limiter.reserve("GET", "https://networking.jp-east-1.cloud.global.fujitsu.com/v2.0/networks") == 0.0
+    assert limiter.reserve("GET", COMPUTE) > 0.0
+
+
+def test_regions_are_limited_separately():
+    limiter = RateLimiter({("compute", "GET"): RateLimit(rate=1, burst=1)})
+    assert limiter.reserve("GET", COMPUTE) == 0.0
+    assert limiter.reserve("GET", COMPUTE.replace("jp-east-1", "jp-west-2")) == 0.0
+    assert limiter.reserve("GET", COMPUTE) > 0.0
@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
+import json
+import time
+
+import fjcloud_py.result
+from fjcloud_py.result import Result
+from fjcloud_py.singleflight import AsyncSingleFlight, SingleFlight
+
+
+CALLERS = 4
+BODY = json.dumps({"network": {"id": "n1", "name": "net-1"}}).encode()
+
+
+def count_decodes(monkeypatch) -> list:
+    decodes = []
+    decode_body = fjcloud_py.result.decode_body
+
+    def counting(content):
+        decodes.append(content)
+        return decode_body(content)
+
+    monkeypatch.setattr(fjcloud_py.result, "decode_body", counting)
+    return decodes
+
+
+def test_followers_cannot_see_each_others_modifications(monkeypatch):
+    decodes = count_decodes(monkeypatch)
+    flight = SingleFlight()
+    requests = []
+
+    def fetch():
+        requests.append(1)
+        # 全員が合流するまでリーダーの応答を返さない
+        deadline = time.monotonic() + 5
+        while flight._calls["key"].followers < CALLERS - 1 and time.monotonic() < deadline:
+            time.sleep(0.001)
+        return Result("success", content=BODY, status_code=200)
+
+    with ThreadPoolExecutor(CALLERS) as executor:
+        out = list(executor.map(lambda _: flight.do("key", fetch), range(CALLERS)))
+
+    assert len(requests) == 1
+    assert len(decodes) == 1
+    out[0]["data"]["network"]["name"] = "changed"
+    assert [result["data"]["network"]["name"] for result in out[1:]] == ["net-1"] * (CALLERS - 1)
+
+
+def test_async_followers_cannot_see_each_others_modifications(monkeypatch):
+    decodes = count_decodes(monkeypatch)
+    flight = AsyncSingleFlight()
+    requests = []
+
+    async def fetch():
+        requests.append(1)
+        await asyncio.sleep(0.01)
+        return Result("success", content=BODY, status_code=200)
+
+    async def main():
+        return await asyncio.gather(*[flight.do("key", fetch) for _ in range(CALLERS)])
+
+    out = asyncio.run(main())
+
+    assert len(requests) == 1
+    assert len(decodes) == 1
+    out[0]["data"]["network"]["name"] = "changed"
+    assert [result["data"]["network"]["name"] for result in out[1:]] == ["net-1"] * (CALLERS - 1)
+
+
+def test_unshared_result_is_returned_as_is():
+    flight = SingleFlight()
+    result = Result("success", content=BODY, status_code=200)
+    assert flight.do("key", lambda: result) is result
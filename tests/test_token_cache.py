@@ -0,0 +1,20 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import requests
+
+from fjcloud_py.auth import AuthManager
+from fjcloud_py.fakeserver import FakeCloud
+from fjcloud_py.token_cache import TokenCache
+
+
+def test_token_is_not_shared_between_identity_endpoints():
+    token_cache = TokenCache()
+    with FakeCloud() as first, FakeCloud() as second:
+        tokens = {}
+        for cloud in (first, second):
+            client = AuthManager(cloud.credential(), endpoint_overrides=cloud.endpoints, token_cache=token_cache)
+            tokens[cloud.url] = client.token
+            response = requests.get(cloud.url + "/networking/v2.0/networks", headers={"X-Auth-Token": client.token})
+            assert response.status_code == 200
+        assert tokens[first.url] != tokens[second.url]
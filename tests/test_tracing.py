@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from fjcloud_py.tracing import REQUEST_ID_HEADER, Tracer
+
+
+URL = "https://networking.jp-east-1.cloud.global.fujitsu.com/v2.0/networks"
+
+
+def test_every_request_of_a_trace_sends_its_own_request_id():
+    tracer = Tracer()
+    with tracer.span("provision") as parent:
+        requests = [tracer.start_request("GET", URL) for _ in range(3)]
+
+    request_ids = [headers[REQUEST_ID_HEADER] for _, headers in requests]
+    assert len(set(request_ids)) == 3
+    for span, headers in requests:
+        assert span.trace_id == parent.trace_id
+        assert span.attributes["openstack.global_request_id"] == headers[REQUEST_ID_HEADER]
+        # 先頭 16 桁はトレース ID と同じ
+        assert headers[REQUEST_ID_HEADER][4:22].replace("-", "") == "{:032x}".format(parent.trace_id)[:16]
@@ -0,0 +1,23 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+import pytest
+
+from fjcloud_py.auth import AuthManager
+from fjcloud_py.blockstorage import BlockstorageAPI
+from fjcloud_py.compute import ComputeAPI
+from fjcloud_py.fakeserver import FakeCloud
+from fjcloud_py.token_cache import TokenCache
+from fjcloud_py.utils import DiscoveryError
+from fjcloud_py.version_cache import ApiVersionCache
+
+
+@pytest.mark.parametrize("api_class, service", [(ComputeAPI, "compute"), (BlockstorageAPI, "blockstorage")])
+def test_failed_discovery_raises_and_caches_nothing(api_class, service):
+    with FakeCloud() as cloud:
+        endpoints = dict(cloud.endpoints, **{service: cloud.url + "/missing"})
+        client = AuthManager(cloud.credential(), endpoint_overrides=endpoints, token_cache=TokenCache())
+        version_cache = ApiVersionCache()
+        with pytest.raises(DiscoveryError, match="Could not retrieve the {} API version".format(service)):
+            api_class(client, version_cache=version_cache)
+        assert version_cache.get(service, client.region, endpoints[service]) is None
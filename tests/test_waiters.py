@@ -0,0 +1,18 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from fjcloud_py.result import Result
+from fjcloud_py.waiters import extract
+
+
+def error(status_code: int, body: bytes) -> Result:
+    return Result("error", content=body, status_code=status_code)
+
+
+def test_show_404_counts_as_gone_whatever_the_body():
+    assert extract(error(404, b"Not here"), ["a"], "server", "servers") == ({}, ["a"])
+
+
+def test_other_errors_mentioning_not_found_are_not_gone():
+    body = b'{"badRequest": {"code": 400, "message": "Invalid field NotFoundPolicy"}}'
+    assert extract(error(400, body), ["a"], "server", "servers") == ({}, [])